@@ -182,6 +182,31 @@ MenuBar {
                 onTriggered: mainMenuBar.toolChanged("addPolygon")
             }
         }
+        
+        MenuSeparator {}
+        
+        MenuItem {
+            text: "Otimizar Fonte Vetorial..."
+            onTriggered: {
+                if (typeof mapBackend !== 'undefined') {
+                    // Converte para FlatGeobuf com índice espacial (em segundo plano)
+                    var filePath = mapBackend.open_vector_dialog()
+                    if (filePath) {
+                        mapBackend.optimize_vector_source(filePath)
+                    }
+                }
+            }
+        }
+        
+        MenuItem {
+            text: "Estatísticas do Cache"
+            onTriggered: {
+                if (typeof mapBackend !== 'undefined') {
+                    // O backend já exibe as estatísticas pelo sinal status_message
+                    mapBackend.cache_stats()
+                }
+            }
+        }
     }
     
     // Menu Ajuda
@@ -59,40 +59,53 @@ ApplicationWindow {
         }
         
         onLayerAdded: (filePath, layerType) => {
-            if (filePath && layerType) {
+            if (filePath && layerType && typeof mapBackend !== 'undefined') {
+                // O carregamento é assíncrono: a camada entra na lista em onLayer_ready
                 if (layerType === "vector") {
-                    var success = mapBackend.add_vector_layer(filePath)
-                    if (success) {
-                        var fileName = filePath.substring(Math.max(filePath.lastIndexOf('/'), filePath.lastIndexOf('\\')) + 1)
-                        fileName = fileName.substring(0, fileName.lastIndexOf('.'))
-                        // Adicionar à lista de camadas
-                        sidePanel.layersPanel.layerListModel.append({
-                            layerName: fileName,
-                            layerType: "vector",
-                            visible: true
-                        })
-                        sidePanel.tabBar.currentIndex = 0
-                        sidePanel.collapsed = false
-                    }
+                    mapBackend.add_vector_layer(filePath)
                 } else if (layerType === "raster") {
-                    success = mapBackend.add_raster_layer(filePath)
-                    if (success) {
-                        fileName = filePath.substring(Math.max(filePath.lastIndexOf('/'), filePath.lastIndexOf('\\')) + 1)
-                        fileName = fileName.substring(0, fileName.lastIndexOf('.'))
-                        // Adicionar à lista de camadas
-                        sidePanel.layersPanel.layerListModel.append({
-                            layerName: fileName,
-                            layerType: "raster",
-                            visible: true
-                        })
-                        sidePanel.tabBar.currentIndex = 0
-                        sidePanel.collapsed = false
-                    }
+                    mapBackend.add_raster_layer(filePath)
                 }
             }
         }
     }
     
+    // Sinais do carregamento em segundo plano
+    Connections {
+        target: typeof mapBackend !== 'undefined' ? mapBackend : null
+        
+        function onLayer_loading_progress(layerName, percent) {
+            if (overviewsProgressDialog.visible && layerName === overviewsProgressDialog.layerName) {
+                overviewsProgressDialog.percent = percent
+                return
+            }
+            appStatusBar.showMessage("Carregando " + layerName + ": " + percent + "%")
+        }
+        
+        function onLayer_ready(layerName, layerType) {
+            // Adicionar à lista de camadas
+            sidePanel.layersPanel.layerListModel.append({
+                layerName: layerName,
+                layerType: layerType,
+                visible: true
+            })
+            sidePanel.tabBar.currentIndex = 0
+            sidePanel.collapsed = false
+            appStatusBar.showMessage("Camada adicionada: " + layerName)
+        }
+        
+        function onOverviews_suggested(layerName) {
+            overviewsDialog.layerName = layerName
+            overviewsDialog.open()
+        }
+        
+        function onOverviews_finished(layerName) {
+            if (layerName === overviewsProgressDialog.layerName) {
+                overviewsProgressDialog.close()
+            }
+        }
+    }
+    
     // Área principal
     SplitView {
         anchors.fill: parent
@@ -172,6 +185,69 @@ ApplicationWindow {
         id: appStatusBar
     }
     
+    // Diálogo: raster grande sem overviews
+    Dialog {
+        id: overviewsDialog
+        property string layerName: ""
+        title: "Gerar overviews"
+        modal: true
+        width: 420
+        anchors.centerIn: parent
+        
+        contentItem: Label {
+            text: "O raster \"" + overviewsDialog.layerName + "\" é grande e não possui overviews.\n" +
+                  "Gerar a pirâmide (.ovr) em segundo plano para acelerar vistas afastadas?"
+            wrapMode: Text.WordWrap
+        }
+        
+        standardButtons: Dialog.Yes | Dialog.No
+        
+        onAccepted: {
+            if (typeof mapBackend !== 'undefined' && mapBackend.build_raster_overviews(layerName)) {
+                overviewsProgressDialog.layerName = layerName
+                overviewsProgressDialog.percent = 0
+                overviewsProgressDialog.open()
+            }
+        }
+    }
+    
+    // Geração de overviews em andamento (pode ser cancelada)
+    Dialog {
+        id: overviewsProgressDialog
+        property string layerName: ""
+        property int percent: 0
+        title: "Gerando overviews"
+        modal: false
+        closePolicy: Popup.NoAutoClose
+        width: 420
+        anchors.centerIn: parent
+        
+        contentItem: ColumnLayout {
+            spacing: 10
+            
+            Label {
+                text: "Gerando a pirâmide de \"" + overviewsProgressDialog.layerName + "\"..."
+                wrapMode: Text.WordWrap
+                Layout.fillWidth: true
+            }
+            
+            ProgressBar {
+                from: 0
+                to: 100
+                value: overviewsProgressDialog.percent
+                Layout.fillWidth: true
+            }
+        }
+        
+        standardButtons: Dialog.Cancel
+        
+        onRejected: {
+            if (typeof mapBackend !== 'undefined') {
+                mapBackend.cancel_raster_overviews(layerName)
+            }
+        }
+    }
+    
     // Diálogo Sobre
     Dialog {
         id: aboutDialog
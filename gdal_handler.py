@@ -28,6 +28,13 @@ except ImportError:
 import numpy as np
 from typing import List, Dict, Tuple, Optional, Any
 
+# Drivers OGR de escrita por extensão
+VECTOR_DRIVERS = {
+    '.gpkg': 'GPKG',
+    '.fgb': 'FlatGeobuf',
+    '.shp': 'ESRI Shapefile',
+}
+
 # Habilitar exceções GDAL
 if GDAL_AVAILABLE:
     gdal.UseExceptions()
@@ -130,6 +137,219 @@ class GDALHandler:
         datasource = None
         return features
     
+    def read_vector_arrays(self, filepath: str, layer=None,
+                           bbox: Optional[Tuple[float, float, float, float]] = None,
+                           columns: Optional[List[str]] = None, keep_z: bool = True,
+                           as_geodataframe: bool = False):
+        """
+        Lê uma camada vetorial inteira em arrays NumPy (pontos, linhas e polígonos)
+        
+        Usa a interface Arrow do OGR (lotes colunares de WKB e atributos, sem
+        um objeto Python por feature) quando disponível. As geometrias são
+        decodificadas em bloco em um PackedGeometry: para pontos de
+        levantamento, geometry.coords e geometry.z já são as colunas x, y, z.
+        
+        Args:
+            filepath: Caminho do arquivo (SHP, GPKG, FGB, GeoJSON, ...)
+            layer: Nome ou índice da camada (None = primeira)
+            bbox: Filtro espacial (minx, miny, maxx, maxy)
+            columns: Campos a ler (None = todos, [] = nenhum)
+            keep_z: Se True, preserva a coordenada Z (NaN em geometrias 2D)
+            as_geodataframe: Se True, retorna um GeoDataFrame criado a partir
+                             do WKB em bloco
+            
+        Returns:
+            Dicionário com 'fids' (int64), 'geometry' (PackedGeometry),
+            'attributes' (array estruturado, uma linha por feature), 'nulls'
+            ({campo: máscara} dos campos com nulos; NaN em floats, 0 em
+            inteiros e None em textos) e 'srs'; ou um GeoDataFrame
+        """
+        if not GDAL_AVAILABLE:
+            raise ImportError("GDAL não está disponível")
+        
+        from map_system.arrow_stream import arrow_stream_available
+        from map_system.geometry_store import PackedGeometryBuilder
+        
+        datasource = ogr.Open(filepath, 0)
+        if datasource is None:
+            raise ValueError(f"Não foi possível abrir: {filepath}")
+        
+        if layer is None:
+            ogr_layer = datasource.GetLayer(0)
+        elif isinstance(layer, int):
+            ogr_layer = datasource.GetLayerByIndex(layer)
+        else:
+            ogr_layer = datasource.GetLayerByName(layer)
+        if ogr_layer is None:
+            raise ValueError(f"Camada não encontrada em {filepath}: {layer}")
+        
+        layer_defn = ogr_layer.GetLayerDefn()
+        field_defns = [layer_defn.GetFieldDefn(i) for i in range(layer_defn.GetFieldCount())]
+        field_names = [field_defn.GetName() for field_defn in field_defns]
+        if columns is None:
+            columns = field_names
+        unknown = [name for name in columns if name not in field_names]
+        if unknown:
+            raise ValueError(f"Campos inexistentes em {filepath}: {', '.join(unknown)}")
+        
+        srs = ogr_layer.GetSpatialRef()
+        srs = srs.Clone() if srs is not None else None
+        builder = PackedGeometryBuilder(keep_z=keep_z)
+        wkb_chunks = [] if as_geodataframe else None
+        
+        try:
+            if bbox is not None:
+                ogr_layer.SetSpatialFilterRect(*bbox)
+            
+            result = None
+            if arrow_stream_available(ogr_layer):
+                try:
+                    result = self._read_vector_arrow(ogr_layer, columns, builder, wkb_chunks)
+                except Exception as e:
+                    print(f"Aviso: Leitura Arrow falhou, usando leitura por feature: {e}")
+                    builder = PackedGeometryBuilder(keep_z=keep_z)
+                    wkb_chunks = [] if as_geodataframe else None
+            if result is None:
+                result = self._read_vector_features(ogr_layer, field_defns, columns,
+                                                    builder, wkb_chunks)
+        finally:
+            ogr_layer.SetSpatialFilter(None)
+            datasource = None
+        
+        fids, values, nulls = result
+        geometry = builder.finish()
+        
+        if as_geodataframe:
+            import pandas as pd
+            wkbs = np.concatenate(wkb_chunks) if wkb_chunks else np.empty(0, dtype=object)
+            geoseries = gpd.GeoSeries.from_wkb(wkbs, crs=srs.ExportToWkt() if srs else None)
+            return gpd.GeoDataFrame({name: values[name] for name in columns},
+                                    geometry=geoseries.values,
+                                    index=pd.Index(fids, name='fid'))
+        
+        attributes = np.empty(len(fids), dtype=[(name, values[name].dtype) for name in columns])
+        for name in columns:
+            attributes[name] = values[name]
+        
+        return {
+            'fids': fids,
+            'geometry': geometry,
+            'attributes': attributes,
+            'nulls': {name: mask for name, mask in nulls.items() if mask.any()},
+            'srs': srs,
+        }
+    
+    def _read_vector_arrow(self, ogr_layer, columns: List[str], builder,
+                           wkb_chunks: Optional[list]):
+        """Lê FIDs, WKB e campos em lotes colunares (GDAL >= 3.6)"""
+        from map_system.arrow_stream import (iter_arrow_batches, fid_column_name,
+                                             geometry_column_name)
+        
+        fid_column = fid_column_name(ogr_layer)
+        geometry_column = geometry_column_name(ogr_layer)
+        fid_chunks = []
+        value_chunks = {name: [] for name in columns}
+        null_chunks = {name: [] for name in columns}
+        
+        for batch in iter_arrow_batches(ogr_layer, columns=columns):
+            fids = np.asarray(batch[fid_column], dtype=np.int64)
+            wkbs = batch[geometry_column]
+            builder.add_wkb_batch(fids, wkbs)
+            fid_chunks.append(fids)
+            if wkb_chunks is not None:
+                wkb_chunks.append(np.asarray(wkbs, dtype=object))
+            
+            for name in columns:
+                array = batch[name]
+                mask = np.ma.getmaskarray(array)
+                data = np.asarray(np.ma.getdata(array))
+                if data.dtype == object:
+                    mask = mask | np.equal(data, None)
+                    # Textos podem vir como bytes UTF-8
+                    data = np.array([None if null else
+                                     (v.decode('utf-8', 'replace') if isinstance(v, bytes) else v)
+                                     for v, null in zip(data.tolist(), mask.tolist())],
+                                    dtype=object)
+                elif data.dtype.kind == 'f' and mask.any():
+                    data = data.copy()
+                    data[mask] = np.nan
+                elif mask.any():
+                    data = np.where(mask, 0, data).astype(data.dtype)
+                value_chunks[name].append(data)
+                null_chunks[name].append(mask)
+        
+        def joined(chunks, dtype=object):
+            return np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+        
+        return (joined(fid_chunks, np.int64),
+                {name: joined(value_chunks[name]) for name in columns},
+                {name: joined(null_chunks[name], bool) for name in columns})
+    
+    def _read_vector_features(self, ogr_layer, field_defns: list, columns: List[str],
+                              builder, wkb_chunks: Optional[list]):
+        """Lê feature a feature com GetNextFeature(), acumulando colunas em listas"""
+        numeric = {
+            ogr.OFTInteger: np.int32,
+            ogr.OFTInteger64: np.int64,
+            ogr.OFTReal: np.float64,
+        }
+        field_names = [field_defn.GetName() for field_defn in field_defns]
+        indices = {name: field_names.index(name) for name in columns}
+        dtypes = {name: numeric.get(field_defns[indices[name]].GetType(), object)
+                  for name in columns}
+        
+        fids = []
+        wkbs = []
+        values = {name: [] for name in columns}
+        nulls = {name: [] for name in columns}
+        
+        try:
+            ogr_layer.SetIgnoredFields([name for name in field_names if name not in columns])
+            ogr_layer.ResetReading()
+            feature = ogr_layer.GetNextFeature()
+            while feature:
+                fid = feature.GetFID()
+                geom = feature.GetGeometryRef()
+                wkb = None
+                if geom is None:
+                    builder.add_empty(fid)
+                else:
+                    if geom.HasCurveGeometry():
+                        geom = geom.GetLinearGeometry()
+                    wkb = geom.ExportToWkb(ogr.wkbNDR)
+                    builder.add_wkb(fid, wkb)
+                fids.append(fid)
+                if wkb_chunks is not None:
+                    wkbs.append(wkb)
+                
+                for name in columns:
+                    i = indices[name]
+                    null = not feature.IsFieldSetAndNotNull(i)
+                    nulls[name].append(null)
+                    if dtypes[name] is object:
+                        values[name].append(None if null else feature.GetFieldAsString(i))
+                    elif dtypes[name] is np.float64:
+                        values[name].append(np.nan if null else feature.GetFieldAsDouble(i))
+                    else:
+                        values[name].append(0 if null else feature.GetFieldAsInteger64(i))
+                feature = ogr_layer.GetNextFeature()
+        finally:
+            ogr_layer.SetIgnoredFields([])
+            ogr_layer.ResetReading()
+        
+        if wkb_chunks is not None:
+            chunk = np.empty(len(wkbs), dtype=object)
+            chunk[:] = wkbs
+            wkb_chunks.append(chunk)
+        
+        columns_out = {}
+        for name in columns:
+            column = np.empty(len(fids), dtype=dtypes[name])
+            column[:] = values[name]
+            columns_out[name] = column
+        return (np.asarray(fids, dtype=np.int64), columns_out,
+                {name: np.asarray(nulls[name], dtype=bool) for name in columns})
+    
     # ==========================================
     # ESCRITA DE VETORES
     # ==========================================
@@ -189,6 +409,222 @@ class GDALHandler:
         datasource = None
         return True
     
+    def write_vector_arrays(self, filepath: str, geometry, attributes=None, srs=None,
+                            nulls: Optional[Dict[str, np.ndarray]] = None,
+                            layer_name: Optional[str] = None, driver_name: Optional[str] = None,
+                            batch_size: int = 100000, progress_callback=None) -> bool:
+        """
+        Grava uma camada vetorial inteira (qualquer tipo de geometria e esquema)
+        
+        O formato vem da extensão (.gpkg, .fgb, .shp) ou de driver_name. Em
+        formatos com transação (GeoPackage) as features são gravadas em lotes
+        de batch_size dentro de StartTransaction/CommitTransaction; um único
+        objeto Feature é reutilizado em todas as linhas.
+        
+        Args:
+            filepath: Caminho do arquivo de saída (substituído se existir)
+            geometry: GeoDataFrame, PackedGeometry ou sequência de WKB
+                      (ver map_system.geometry_store.points_to_wkb)
+            attributes: Array estruturado, dict de arrays ou DataFrame (None =
+                        colunas do GeoDataFrame, ou nenhuma)
+            srs: osr.SpatialReference, código EPSG ou definição em texto
+                 (None = CRS do GeoDataFrame, se houver)
+            nulls: Máscaras de nulos por campo (ex: saída de read_vector_arrays);
+                   None e NaN também são gravados como nulo
+            layer_name: Nome da camada (None = nome do arquivo)
+            driver_name: Driver OGR (None = deduzido da extensão)
+            batch_size: Features por transação
+            progress_callback: Função chamada com (gravadas, total) a cada lote
+            
+        Returns:
+            True se sucesso
+        """
+        if not GDAL_AVAILABLE:
+            raise ImportError("GDAL não está disponível")
+        
+        from map_system.geometry_store import PackedGeometry, wkb_geometry_types
+        
+        # Geometrias em WKB e atributos como colunas NumPy
+        if isinstance(geometry, gpd.GeoDataFrame):
+            if attributes is None:
+                attributes = geometry.drop(columns=geometry.geometry.name)
+            if srs is None and geometry.crs is not None:
+                srs = geometry.crs.to_wkt()
+            wkbs = [None if w is None else bytes(w) for w in geometry.geometry.to_wkb().tolist()]
+        elif isinstance(geometry, PackedGeometry):
+            wkbs = geometry.to_wkb()
+        else:
+            wkbs = list(geometry)
+        columns = self._attribute_columns(attributes, len(wkbs))
+        
+        driver_name = driver_name or VECTOR_DRIVERS.get(Path(filepath).suffix.lower())
+        if driver_name is None:
+            raise ValueError(f"Formato vetorial não reconhecido: {filepath}")
+        driver = ogr.GetDriverByName(driver_name)
+        if driver is None:
+            raise ValueError(f"Driver OGR indisponível: {driver_name}")
+        
+        flat_types, has_z = wkb_geometry_types(wkbs)
+        layer_type = self._layer_geometry_type(flat_types, has_z, driver_name)
+        
+        if srs is not None and not isinstance(srs, osr.SpatialReference):
+            definition = srs
+            srs = osr.SpatialReference()
+            if isinstance(definition, int):
+                srs.ImportFromEPSG(definition)
+            else:
+                srs.SetFromUserInput(str(definition))
+        
+        if Path(filepath).exists():
+            driver.DeleteDataSource(filepath)
+        datasource = driver.CreateDataSource(filepath)
+        if datasource is None:
+            raise ValueError(f"Não foi possível criar: {filepath}")
+        
+        layer = None
+        in_transaction = False
+        try:
+            options = ['ENCODING=UTF-8'] if driver_name == 'ESRI Shapefile' else []
+            layer = datasource.CreateLayer(layer_name or Path(filepath).stem, srs,
+                                           layer_type, options=options)
+            if layer is None:
+                raise ValueError(f"Não foi possível criar a camada em {filepath}")
+            
+            # Valores como listas Python (None = nulo): sem conversão por célula no laço
+            values = []
+            for name, column in columns.items():
+                field_type, subtype, column = self._ogr_field(column)
+                field_defn = ogr.FieldDefn(name, field_type)
+                field_defn.SetSubType(subtype)
+                if layer.CreateField(field_defn) != ogr.OGRERR_NONE:
+                    raise ValueError(f"Não foi possível criar o campo {name}")
+                
+                null_mask = np.zeros(len(column), dtype=bool)
+                if nulls is not None and name in nulls:
+                    null_mask |= np.asarray(nulls[name], dtype=bool)
+                if column.dtype.kind == 'f':
+                    null_mask |= np.isnan(column)
+                column_values = column.tolist()
+                for row in np.flatnonzero(null_mask).tolist():
+                    column_values[row] = None
+                values.append(column_values)
+            
+            total = len(wkbs)
+            batch_size = max(1, int(batch_size))
+            transactions = layer.TestCapability(ogr.OLCTransactions)
+            
+            feature = ogr.Feature(layer.GetLayerDefn())
+            for start in range(0, total, batch_size):
+                if transactions:
+                    layer.StartTransaction()
+                    in_transaction = True
+                
+                for row in range(start, min(total, start + batch_size)):
+                    wkb = wkbs[row]
+                    if wkb is None:
+                        feature.SetGeometry(None)
+                    else:
+                        feature.SetGeometryDirectly(ogr.CreateGeometryFromWkb(wkb))
+                    for i, column_values in enumerate(values):
+                        value = column_values[row]
+                        if value is None:
+                            feature.SetFieldNull(i)
+                        else:
+                            feature.SetField(i, value)
+                    feature.SetFID(ogr.NullFID)
+                    layer.CreateFeature(feature)
+                
+                if transactions:
+                    layer.CommitTransaction()
+                    in_transaction = False
+                if progress_callback:
+                    progress_callback(min(total, start + batch_size), total)
+            
+            datasource = None
+            return True
+            
+        except Exception as e:
+            print(f"Erro ao gravar {filepath}: {e}")
+            if in_transaction:
+                try:
+                    layer.RollbackTransaction()
+                except Exception as rollback_error:
+                    print(f"Aviso: Falha ao desfazer a transação em {filepath}: {rollback_error}")
+            layer = None
+            datasource = None
+            # Não deixa um arquivo pela metade no lugar
+            if Path(filepath).exists():
+                driver.DeleteDataSource(filepath)
+            return False
+    
+    @staticmethod
+    def _attribute_columns(attributes, count: int) -> Dict[str, np.ndarray]:
+        """Converte atributos (array estruturado, dict ou DataFrame) em colunas"""
+        if attributes is None:
+            return {}
+        if isinstance(attributes, np.ndarray):
+            names = attributes.dtype.names or ()
+            columns = {name: attributes[name] for name in names}
+        elif hasattr(attributes, 'columns'):
+            columns = {str(name): attributes[name].to_numpy() for name in attributes.columns}
+        else:
+            columns = {str(name): np.asarray(column) for name, column in attributes.items()}
+        
+        for name, column in columns.items():
+            if len(column) != count:
+                raise ValueError(f"Campo {name} tem {len(column)} valores para {count} geometrias")
+        return columns
+    
+    @staticmethod
+    def _ogr_field(column: np.ndarray):
+        """
+        Escolhe o tipo de campo OGR de uma coluna
+        
+        Returns:
+            Tupla (tipo, subtipo, coluna convertida para gravação)
+        """
+        kind = column.dtype.kind
+        if kind == 'b':
+            return ogr.OFTInteger, ogr.OFSTBoolean, column.astype(np.int32)
+        if kind in 'iu':
+            if column.dtype.itemsize < 4 or (kind == 'i' and column.dtype.itemsize == 4):
+                return ogr.OFTInteger, ogr.OFSTNone, column
+            return ogr.OFTInteger64, ogr.OFSTNone, column
+        if kind == 'f':
+            return ogr.OFTReal, ogr.OFSTNone, column
+        if kind == 'M':
+            # Texto ISO sem o 'T' (aceito pelo OGR); NaT vira nulo
+            text = np.datetime_as_string(column, unit='s')
+            converted = np.empty(len(column), dtype=object)
+            converted[:] = [None if value == 'NaT' else value.replace('T', ' ')
+                            for value in text.tolist()]
+            return ogr.OFTDateTime, ogr.OFSTNone, converted
+        if kind in 'SU':
+            return ogr.OFTString, ogr.OFSTNone, column.astype(object)
+        converted = np.empty(len(column), dtype=object)
+        converted[:] = [None if value is None else str(value) for value in column.tolist()]
+        return ogr.OFTString, ogr.OFSTNone, converted
+    
+    @staticmethod
+    def _layer_geometry_type(flat_types: np.ndarray, has_z: np.ndarray, driver_name: str) -> int:
+        """Tipo OGR da camada a partir dos tipos das geometrias"""
+        present = set(np.unique(flat_types[flat_types != 0]).tolist())
+        if not present:
+            layer_type = ogr.wkbNone
+        elif len(present) == 1:
+            layer_type = present.pop()
+        elif len(present) == 2 and max(present) - min(present) == 3 and min(present) <= 3:
+            # Simples + multi do mesmo tipo (ex: Polygon e MultiPolygon)
+            layer_type = max(present)
+        elif driver_name == 'ESRI Shapefile':
+            raise ValueError("Shapefile não aceita tipos de geometria mistos")
+        else:
+            layer_type = ogr.wkbUnknown
+        
+        if layer_type != ogr.wkbNone and has_z[flat_types != 0].any():
+            layer_type = ogr.GT_SetZ(layer_type)
+        return layer_type
+    
     def export_to_dxf(self, filepath: str, geometries: List[Dict], layer_name: str = 'topografia') -> bool:
         """
         Exporta para DXF usando GDAL
@@ -261,7 +697,7 @@ class GDALHandler:
     
     def extract_elevation_at_point(self, raster_path: str, x: float, y: float) -> Optional[float]:
         """
-        Extrai elevação de um ponto no raster
+        Extrai elevação de um ponto no raster (para muitos pontos, use sample_raster)
         
         Args:
             raster_path: Caminho para o raster (MDT)
@@ -298,6 +734,40 @@ class GDALHandler:
         dataset = None
         return float(data[0, 0]) if data is not None else None
     
+    def sample_raster(self, raster_path: str, xs, ys, method: str = 'nearest',
+                      band: int = 1) -> np.ndarray:
+        """
+        Amostra um raster em muitos pontos de uma vez
+        
+        O dataset é aberto uma única vez, os pontos são agrupados pelo bloco
+        do raster que os contém, cada bloco é lido uma vez e a interpolação é
+        vetorizada (ver map_system.raster_sampling).
+        
+        Args:
+            raster_path: Caminho para o raster (MDT)
+            xs, ys: Coordenadas dos pontos (no CRS do raster)
+            method: 'nearest', 'bilinear' ou 'cubic'
+            band: Índice da banda (1-based)
+            
+        Returns:
+            Array float64 com um valor por ponto (NaN fora do raster ou em nodata)
+        """
+        if not GDAL_AVAILABLE:
+            raise ImportError("GDAL não está disponível")
+        
+        from map_system.raster_sampling import sample_band
+        
+        dataset = gdal.Open(raster_path)
+        if dataset is None:
+            raise ValueError(f"Não foi possível abrir raster: {raster_path}")
+        
+        try:
+            raster_band = dataset.GetRasterBand(band)
+            return sample_band(raster_band, dataset.GetGeoTransform(), xs, ys,
+                               method, raster_band.GetNoDataValue())
+        finally:
+            dataset = None
+    
     def create_contour_lines(self, raster_path: str, output_shp: str, interval: float = 1.0) -> bool:
         """
         Gera curvas de nível a partir de MDT
@@ -341,6 +811,38 @@ class GDALHandler:
         
         return True
     
+    def create_terrain_product(self, raster_path: str, output_path: str,
+                               product: str = 'hillshade', tile_size: int = 1024,
+                               workers: Optional[int] = None,
+                               progress_callback=None, **params) -> bool:
+        """
+        Gera sombreamento, declividade ou orientação de um MDT em GeoTIFF,
+        por blocos e em paralelo (o MDT nunca é carregado inteiro na memória)
+        
+        Args:
+            raster_path: Caminho para o MDT
+            output_path: Caminho do GeoTIFF de saída
+            product: 'hillshade', 'slope' ou 'aspect'
+            tile_size: Lado dos blocos em pixels
+            workers: Número de threads (None = número de CPUs)
+            progress_callback: Função chamada com (blocos gravados, total)
+            **params: z_factor, azimuth, altitude, percent
+            
+        Returns:
+            True se sucesso
+        """
+        if not GDAL_AVAILABLE:
+            raise ImportError("GDAL não está disponível")
+        
+        from map_system.terrain import TerrainEngine
+        
+        engine = TerrainEngine(raster_path, tile_size=tile_size, workers=workers)
+        try:
+            return engine.write_geotiff(product, output_path,
+                                        progress_callback=progress_callback, **params)
+        finally:
+            engine.close()
+    
     # ==========================================
     # TRANSFORMAÇÕES DE COORDENADAS
     # ==========================================
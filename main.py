@@ -26,6 +26,9 @@ from PyQt6.QtQuick import QQuickImageProvider
 from map_system import VectorLayer, RasterLayer
 from map_system.layer_manager import LayerManager
 from map_system.qml_renderer import QtSimpleRenderer, RenderContext
+from map_system.cache_manager import get_cache_manager
+from map_system.layer_loader import LayerLoader
+from map_system.raster_warp import needs_reprojection
 
 
 class MapImageProvider(QQuickImageProvider):
@@ -73,6 +76,10 @@ class MapBridgeMain(QObject):
     status_message = pyqtSignal(str)
     map_updated = pyqtSignal()
     image_updated = pyqtSignal()
+    layer_loading_progress = pyqtSignal(str, int)  # nome, percentual
+    layer_ready = pyqtSignal(str, str)  # nome, tipo ("vector" ou "raster")
+    overviews_suggested = pyqtSignal(str)  # nome do raster grande sem overviews
+    overviews_finished = pyqtSignal(str)  # geração de overviews concluída, falha ou cancelada
     
     def __init__(self, image_provider):
         super().__init__()
@@ -85,45 +92,40 @@ class MapBridgeMain(QObject):
         self._height = 800
         self._update_counter = 0
         
+        # Abertura e decodificação das camadas rodam em um pool de threads;
+        # o frame anterior continua na tela até a camada nova estar pronta
+        self.layer_loader = LayerLoader(parent=self)
+        self.layer_loader.layer_loading_progress.connect(self._on_layer_loading_progress)
+        self.layer_loader.layer_loaded.connect(self._on_layer_loaded)
+        self.layer_loader.layer_failed.connect(self._on_layer_failed)
+        self.layer_loader.sublayers_listed.connect(self._on_sublayers_listed)
+        self.layer_loader.sublayers_failed.connect(self._on_layer_failed)
+        self.layer_loader.source_optimized.connect(self._on_source_optimized)
+        self.layer_loader.source_optimize_failed.connect(self._on_layer_failed)
+        self.layer_loader.overviews_built.connect(self._on_overviews_built)
+        self.layer_loader.overviews_failed.connect(self._on_overviews_failed)
+        # Camadas recarregadas em segundo plano (fonte otimizada, overviews novas):
+        # substituem as atuais; valor = mensagem de status ao concluir
+        self._replacing = {}
+        # CRS do mapa: o da primeira camada carregada (rasters em outro CRS são reprojetados)
+        self._project_crs = None
+        
         print("MapBridge inicializado com Qt Renderer")
     
     @pyqtSlot(str, result=bool)
     def add_vector_layer(self, file_path: str) -> bool:
-        """Adiciona camada vetorial"""
+        """Adiciona camada vetorial (tabelas listadas e carregadas em segundo plano)"""
         try:
             file_path = file_path.replace("file:///", "").replace("file://", "")
             
-            print(f"[DEBUG] Carregando camada vetorial: {file_path}")
-            
-            name = Path(file_path).stem
-            layer = VectorLayer(name, file_path)
+            print(f"[DEBUG] Agendando carregamento da camada vetorial: {file_path}")
             
-            print(f"[DEBUG] Chamando layer.load()...")
-            if not layer.load():
-                print(f"[ERRO] Não foi possível carregar: {file_path}")
+            # Abrir o arquivo para listar as tabelas já pode ser lento (KML/DXF)
+            if not self.layer_loader.list_sublayers(file_path):
+                self.status_message.emit(f"Arquivo já está sendo aberto: {Path(file_path).name}")
                 return False
             
-            print(f"[DEBUG] Camada carregada, adicionando ao layer_manager...")
-            self.layer_manager.add_layer(layer)
-            
-            print(f"[DEBUG] Verificando extent: {layer.extent}")
-            if self.layer_manager.layer_count() == 1 and layer.extent:
-                print(f"[DEBUG] Primeira camada, ajustando zoom para extent: {layer.extent}")
-                self._zoom_to_extent(layer.extent)
-                print(f"[DEBUG] Novo extent após zoom: {self._extent}")
-            
-            print(f"[DEBUG] Emitindo sinais...")
-            self.layer_count_changed.emit()
-            self.map_updated.emit()
-            
-            print(f"[OK] Camada adicionada: {name} ({layer.get_feature_count()} features)")
-            self.status_message.emit(f"Camada adicionada: {name}")
-            
-            # Renderiza o mapa
-            print(f"[DEBUG] Chamando render_map()...")
-            self.render_map()
-            print(f"[DEBUG] render_map() concluído")
-            
+            self.status_message.emit(f"Abrindo {Path(file_path).name}...")
             return True
             
         except Exception as e:
@@ -133,6 +135,38 @@ class MapBridgeMain(QObject):
             traceback.print_exc()
             return False
     
+    def _on_sublayers_listed(self, file_path: str, sublayers: list):
+        """Tabelas do arquivo listadas: agenda uma camada por tabela com geometria"""
+        stem = Path(file_path).stem
+        
+        # Arquivos com várias tabelas (GeoPackage, DXF, KML) viram uma camada
+        # por sublayer, todas compartilhando o mesmo datasource do pool
+        sublayers = [info for info in sublayers if info['geometry_type'] != ogr.wkbNone]
+        if len(sublayers) > 1:
+            layers = [VectorLayer(f"{stem} - {info['name']}", file_path,
+                                  disk_cache=True, sublayer=info['name'])
+                      for info in sublayers]
+        elif sublayers:
+            # Nomeia a tabela: a primeira do arquivo pode não ter geometria
+            layers = [VectorLayer(stem, file_path, disk_cache=True,
+                                  sublayer=sublayers[0]['name'])]
+        else:
+            layers = [VectorLayer(stem, file_path, disk_cache=True)]
+        
+        scheduled = []
+        for layer in layers:
+            name = layer.name
+            if self.layer_manager.get_layer(name) or self.layer_loader.is_loading(name):
+                self.status_message.emit(f"Camada já adicionada: {name}")
+                continue
+            if self.layer_loader.load(layer):
+                scheduled.append(name)
+        
+        if len(scheduled) == 1:
+            self.status_message.emit(f"Carregando camada: {scheduled[0]}...")
+        elif scheduled:
+            self.status_message.emit(f"Carregando {len(scheduled)} camadas de {stem}...")
+    
     @pyqtSlot(result=str)
     def open_vector_dialog(self) -> str:
         """Abre dialog para selecionar arquivo vetorial usando Tkinter"""
@@ -148,6 +182,8 @@ class MapBridgeMain(QObject):
                 filetypes=[
                     ("Shapefiles", "*.shp"),
                     ("GeoJSON", "*.geojson *.json"),
+                    ("FlatGeobuf", "*.fgb"),
+                    ("GeoPackage", "*.gpkg"),
                     ("Todos os arquivos", "*.*")
                 ]
             )
@@ -184,30 +220,23 @@ class MapBridgeMain(QObject):
     
     @pyqtSlot(str, result=bool)
     def add_raster_layer(self, file_path: str) -> bool:
-        """Adiciona camada raster"""
+        """Adiciona camada raster (carregada em segundo plano)"""
         try:
             file_path = file_path.replace("file:///", "").replace("file://", "")
             
-            print(f"Carregando camada raster: {file_path}")
+            print(f"Agendando carregamento da camada raster: {file_path}")
             
             name = Path(file_path).stem
-            layer = RasterLayer(name, file_path)
-            
-            if not layer.load():
-                print(f"Erro ao carregar: {file_path}")
+            if self.layer_manager.get_layer(name) or self.layer_loader.is_loading(name):
+                self.status_message.emit(f"Camada já adicionada: {name}")
                 return False
             
-            self.layer_manager.add_layer(layer)
-            
-            if self.layer_manager.layer_count() == 1 and layer.extent:
-                self._zoom_to_extent(layer.extent)
-            
-            self.layer_count_changed.emit()
-            self.map_updated.emit()
-            
-            print(f"[OK] Raster adicionado: {name}")
-            self.status_message.emit(f"Raster adicionado: {name}")
+            layer = RasterLayer(name, file_path, disk_cache=True,
+                                target_crs=self._project_crs)
+            if not self.layer_loader.load(layer):
+                return False
             
+            self.status_message.emit(f"Carregando raster: {name}...")
             return True
             
         except Exception as e:
@@ -215,6 +244,200 @@ class MapBridgeMain(QObject):
             self.status_message.emit(f"Erro: {str(e)}")
             return False
     
+    def _on_layer_loading_progress(self, layer_name: str, percent: int):
+        """Repassa o progresso de carregamento para o QML"""
+        self.layer_loading_progress.emit(layer_name, percent)
+        self.status_message.emit(f"Carregando {layer_name}: {percent}%")
+    
+    def _on_layer_loaded(self, layer):
+        """Camada carregada e preparada no pool: adiciona e renderiza (thread da GUI)"""
+        if layer.name in self._replacing:
+            # Já está na lista do QML: apenas troca a fonte
+            message = self._replacing.pop(layer.name)
+            current = self.layer_manager.get_layer(layer.name)
+            if isinstance(layer, RasterLayer) and isinstance(current, RasterLayer):
+                layer.copy_display_settings(current)
+            if self.layer_manager.replace_layer(layer):
+                self.status_message.emit(message)
+                self.render_map()
+                self.map_updated.emit()
+                return
+        
+        if not self.layer_manager.add_layer(layer):
+            # Nome já em uso (ex: adicionada duas vezes durante o carregamento):
+            # libera o que prepare() deixou no cache e devolve o handle ao pool
+            print(f"[ERRO] Não foi possível adicionar a camada: {layer.name}")
+            self.status_message.emit(f"Erro ao adicionar camada: {layer.name}")
+            get_cache_manager().invalidate_owner(layer.cache_id)
+            layer.close()
+            return
+        
+        if self._project_crs is None and layer.crs:
+            self._project_crs = layer.crs
+        if self._project_crs is not None:
+            # Rasters enfileirados antes de o CRS do mapa ser conhecido
+            self._reproject_pending_rasters()
+        
+        if self.layer_manager.layer_count() == 1 and layer.extent:
+            print(f"[DEBUG] Primeira camada, ajustando zoom para extent: {layer.extent}")
+            self._zoom_to_extent(layer.extent)
+        
+        self.layer_count_changed.emit()
+        self.map_updated.emit()
+        
+        layer_type = layer.get_type().value
+        if layer_type == "vector":
+            print(f"[OK] Camada adicionada: {layer.name} ({layer.get_feature_count()} features)")
+        else:
+            print(f"[OK] Raster adicionado: {layer.name}")
+        self.status_message.emit(f"Camada adicionada: {layer.name}")
+        
+        self.render_map()
+        self.layer_ready.emit(layer.name, layer_type)
+        
+        if isinstance(layer, RasterLayer) and layer.needs_overviews():
+            # Vistas afastadas leriam a resolução nativa: oferece gerar a pirâmide
+            self.overviews_suggested.emit(layer.name)
+    
+    def _reproject_pending_rasters(self):
+        """
+        Reabre no pool, reprojetados para o CRS do mapa, os rasters carregados
+        sem ele (target_crs None) cujo CRS é diferente; substituem os atuais.
+        """
+        for layer in self.layer_manager.get_all_layers():
+            if (not isinstance(layer, RasterLayer) or layer.target_crs is not None
+                    or layer.name in self._replacing
+                    or not needs_reprojection(layer.crs, self._project_crs)):
+                continue
+            
+            replacement = RasterLayer(layer.name, layer.source, disk_cache=layer.disk_cache,
+                                      target_crs=self._project_crs)
+            self._replacing[layer.name] = f"Camada {layer.name} reprojetada para o CRS do mapa"
+            if not self.layer_loader.load(replacement):
+                self._replacing.pop(layer.name, None)
+    
+    def _on_layer_failed(self, layer_name: str, message: str):
+        """Falha no carregamento em segundo plano"""
+        self._replacing.pop(layer_name, None)
+        print(f"[ERRO] Não foi possível carregar {layer_name}: {message}")
+        self.status_message.emit(f"Erro ao carregar {layer_name}: {message}")
+    
+    @pyqtSlot(str, result=bool)
+    def optimize_vector_source(self, file_path: str) -> bool:
+        """
+        Converte uma fonte vetorial (ex: shapefile) para FlatGeobuf indexado
+        em segundo plano. Camadas já carregadas dessa fonte passam a usá-lo.
+        """
+        file_path = file_path.replace("file:///", "").replace("file://", "")
+        if not file_path:
+            return False
+        
+        if not self.layer_loader.optimize_source(file_path, 'fgb'):
+            self.status_message.emit(f"Otimização já em andamento: {Path(file_path).name}")
+            return False
+        
+        self.status_message.emit(f"Otimizando fonte: {Path(file_path).name}...")
+        return True
+    
+    def _on_source_optimized(self, source: str, output: str):
+        """Conversão concluída: recarrega as camadas da fonte ou adiciona a nova"""
+        source_path = Path(source).resolve()
+        layers = [layer for layer in self.layer_manager.get_all_layers()
+                  if isinstance(layer, VectorLayer) and Path(layer.source).resolve() == source_path]
+        
+        if not layers:
+            self.add_vector_layer(output)
+            return
+        
+        if Path(output).resolve() == source_path:
+            self.status_message.emit(f"Fonte já possui índice espacial: {Path(source).name}")
+            return
+        
+        for layer in layers:
+            # O arquivo otimizado tem índice espacial nativo (detectado em load()):
+            # vistas aproximadas passam a ler só a extensão visível
+            replacement = VectorLayer(layer.name, output, streaming=layer.streaming,
+                                      disk_cache=True, sublayer=layer.sublayer)
+            self._replacing[layer.name] = f"Camada {layer.name} usando fonte otimizada"
+            if not self.layer_loader.load(replacement):
+                self._replacing.pop(layer.name, None)
+    
+    @pyqtSlot(str, result=bool)
+    def build_raster_overviews(self, layer_name: str) -> bool:
+        """Gera overviews (.ovr externo) para um raster em segundo plano"""
+        layer = self.layer_manager.get_layer(layer_name)
+        if not isinstance(layer, RasterLayer):
+            return False
+        
+        if not self.layer_loader.build_overviews(layer):
+            self.status_message.emit(f"Overviews já em construção: {layer_name}")
+            return False
+        
+        self.status_message.emit(f"Gerando overviews: {layer_name}...")
+        return True
+    
+    @pyqtSlot(str, result=bool)
+    def cancel_raster_overviews(self, layer_name: str) -> bool:
+        """Cancela a geração de overviews de um raster"""
+        return self.layer_loader.cancel_overviews(layer_name)
+    
+    def _on_overviews_built(self, layer):
+        """Overviews geradas: reabre o raster no pool para usá-las (substitui a camada)"""
+        self.overviews_finished.emit(layer.name)
+        if self.layer_manager.get_layer(layer.name) is not layer:
+            return  # Camada removida durante a geração
+        
+        replacement = RasterLayer(layer.name, layer.source, disk_cache=layer.disk_cache,
+                                  target_crs=layer.target_crs)
+        self._replacing[layer.name] = f"Overviews geradas: {layer.name}"
+        if not self.layer_loader.load(replacement):
+            self._replacing.pop(layer.name, None)
+            self.status_message.emit(f"Erro ao recarregar {layer.name}")
+            return
+        self.status_message.emit(f"Recarregando {layer.name} com overviews...")
+    
+    def _on_overviews_failed(self, layer_name: str, message: str):
+        """Geração de overviews falhou ou foi cancelada"""
+        self.overviews_finished.emit(layer_name)
+        print(f"[DEBUG] Overviews de {layer_name}: {message}")
+        self.status_message.emit(f"Overviews de {layer_name}: {message}")
+    
+    @pyqtSlot(str, str, result=bool)
+    def set_raster_color_ramp(self, layer_name: str, ramp_name: str) -> bool:
+        """Define a rampa de cores de um raster ('' = tons de cinza)"""
+        layer = self.layer_manager.get_layer(layer_name)
+        if not isinstance(layer, RasterLayer):
+            return False
+        
+        layer.color_ramp = ramp_name or None
+        self.status_message.emit(f"Rampa de cores de {layer_name}: {ramp_name or 'tons de cinza'}")
+        self.render_map()
+        return True
+    
+    @pyqtSlot(str, int, int, int, result=bool)
+    def set_raster_rgb_bands(self, layer_name: str, red: int, green: int, blue: int) -> bool:
+        """Define a composição RGB de um raster (0, 0, 0 = banda única com rampa)"""
+        layer = self.layer_manager.get_layer(layer_name)
+        if not isinstance(layer, RasterLayer):
+            return False
+        
+        layer.rgb_bands = (red, green, blue) if red and green and blue else ()
+        self.status_message.emit(f"Composição de {layer_name}: {layer.rgb_bands or 'banda única'}")
+        self.render_map()
+        return True
+    
+    @pyqtSlot(str, str, result=bool)
+    def set_raster_terrain(self, layer_name: str, product: str) -> bool:
+        """Exibe sombreamento/declividade/orientação de um MDT ('' = valores da banda)"""
+        layer = self.layer_manager.get_layer(layer_name)
+        if not isinstance(layer, RasterLayer):
+            return False
+        
+        layer.set_terrain_product(product or None)
+        self.status_message.emit(f"Exibição de {layer_name}: {layer.terrain_product or 'valores da banda'}")
+        self.render_map()
+        return True
+    
     @pyqtSlot(str, result=bool)
     def remove_layer(self, layer_name: str) -> bool:
         """Remove camada"""
@@ -343,6 +566,34 @@ class MapBridgeMain(QObject):
             import traceback
             traceback.print_exc()
     
+    @pyqtSlot(result=str)
+    def cache_stats(self) -> str:
+        """Retorna (e exibe na barra de status) as estatísticas do cache de memória"""
+        stats = get_cache_manager().stats()
+        message = (f"Cache: {stats['used_mb']:.0f}/{stats['budget_mb']:.0f} MB, "
+                   f"{stats['entries']} entradas, acertos {stats['hits']}, "
+                   f"faltas {stats['misses']}, despejos {stats['evictions']} "
+                   f"({stats['hit_rate']:.0%})")
+        if stats['oversized']:
+            message += (f", {stats['oversized']} acima do orçamento "
+                        f"({stats['oversized_mb']:.0f} MB)")
+        # Os blocos raster dividem o mesmo orçamento; mostra o aproveitamento
+        rasters = [layer.block_cache_stats() for layer in self.layer_manager.get_all_layers()
+                   if isinstance(layer, RasterLayer)]
+        if rasters:
+            hits = sum(item['hits'] for item in rasters)
+            misses = sum(item['misses'] for item in rasters)
+            message += (f" | Blocos raster: acertos {hits}, faltas {misses} "
+                        f"({hits / max(1, hits + misses):.0%})")
+        self.status_message.emit(message)
+        return message
+    
+    @pyqtSlot(float)
+    def set_cache_budget(self, budget_mb: float):
+        """Define o orçamento de memória do cache (MB)"""
+        get_cache_manager().budget_mb = budget_mb
+        self.status_message.emit(f"Orçamento do cache: {budget_mb:.0f} MB")
+    
     @pyqtProperty(int, notify=image_updated)
     def update_counter(self):
         """Contador de atualizações para forçar refresh da imagem"""
@@ -1,41 +1,119 @@
 """
 Sistema de Mapa Python - Arquitetura modular similar ao QGIS
+
+Os nomes do pacote são importados sob demanda (PEP 562): importar um
+submódulo (ex: os workers da decodificação paralela, iniciados com 'spawn')
+não carrega Qt, PIL e as demais dependências do pacote inteiro.
 """
 
+import importlib
+
 __version__ = "1.0.0"
 
-from .layer import Layer, VectorLayer, RasterLayer
-from .renderer import Renderer, SimpleRenderer, VectorRenderer, RenderContext
-from .map_canvas import MapCanvas
-from .coordinate_transform import CoordinateTransform, CRSManager
-from .layer_manager import LayerManager
-
-try:
-    from .qml_bridge import MapCanvasQML, MapImageProvider
-    from .qml_bridge_interactive import MapCanvasQMLInteractive, MapImageProviderInteractive
-    QML_AVAILABLE = True
-except ImportError:
-    QML_AVAILABLE = False
-    MapCanvasQML = None
-    MapImageProvider = None
-    MapCanvasQMLInteractive = None
-    MapImageProviderInteractive = None
-
-try:
-    from .map_canvas_interactive import MapCanvasInteractive
-    from .map_tool import (MapTool, PanTool, ZoomInTool, ZoomOutTool, 
-                          IdentifyTool, AddPointTool, AddLineTool, AddPolygonTool,
-                          MapToolManager, MapToolType, MouseEvent, Geometry)
-    INTERACTIVE_AVAILABLE = True
-except ImportError:
-    INTERACTIVE_AVAILABLE = False
-    MapCanvasInteractive = None
-    MapToolManager = None
+# Nome exportado -> submódulo que o define
+_EXPORTS = {
+    'Layer': 'layer',
+    'VectorLayer': 'layer',
+    'RasterLayer': 'layer',
+    'PackedGeometry': 'geometry_store',
+    'PackedGeometryBuilder': 'geometry_store',
+    'STRTree': 'spatial_index',
+    'GeneralizationPyramid': 'generalization',
+    'AttributeTable': 'attribute_store',
+    'SidecarCache': 'sidecar_cache',
+    'DatasetPool': 'datasource_pool',
+    'get_dataset_pool': 'datasource_pool',
+    'list_vector_sublayers': 'datasource_pool',
+    'optimize_vector_source': 'source_optimizer',
+    'Renderer': 'renderer',
+    'SimpleRenderer': 'renderer',
+    'VectorRenderer': 'renderer',
+    'RenderContext': 'renderer',
+    'MapCanvas': 'map_canvas',
+    'CoordinateTransform': 'coordinate_transform',
+    'CRSManager': 'coordinate_transform',
+    'LayerManager': 'layer_manager',
+    'CacheManager': 'cache_manager',
+    'get_cache_manager': 'cache_manager',
+    'get_block_cache': 'raster_blocks',
+    'ColorRamp': 'color_ramp',
+    'get_color_ramp': 'color_ramp',
+    'color_ramp_names': 'color_ramp',
+}
+
+# Grupos opcionais: flag de disponibilidade -> {nome: submódulo}.
+# Se algum submódulo do grupo não puder ser importado, a flag é False e os
+# nomes do grupo são None
+_OPTIONAL = {
+    'QML_AVAILABLE': {
+        'MapCanvasQML': 'qml_bridge',
+        'MapImageProvider': 'qml_bridge',
+        'MapCanvasQMLInteractive': 'qml_bridge_interactive',
+        'MapImageProviderInteractive': 'qml_bridge_interactive',
+    },
+    'INTERACTIVE_AVAILABLE': {
+        'MapCanvasInteractive': 'map_canvas_interactive',
+        'MapTool': 'map_tool',
+        'PanTool': 'map_tool',
+        'ZoomInTool': 'map_tool',
+        'ZoomOutTool': 'map_tool',
+        'IdentifyTool': 'map_tool',
+        'AddPointTool': 'map_tool',
+        'AddLineTool': 'map_tool',
+        'AddPolygonTool': 'map_tool',
+        'MapToolManager': 'map_tool',
+        'MapToolType': 'map_tool',
+        'MouseEvent': 'map_tool',
+        'Geometry': 'map_tool',
+    },
+}
+
+
+def _load_optional(flag: str):
+    """Importa um grupo opcional e define seus nomes (ou None) e a flag"""
+    names = _OPTIONAL[flag]
+    try:
+        values = {name: getattr(importlib.import_module('.' + module, __name__), name)
+                  for name, module in names.items()}
+        available = True
+    except ImportError:
+        values = dict.fromkeys(names)
+        available = False
+    globals().update(values)
+    globals()[flag] = available
+
+
+def __getattr__(name: str):
+    """Importa o submódulo que define o nome no primeiro acesso"""
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module('.' + _EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    for flag, names in _OPTIONAL.items():
+        if name == flag or name in names:
+            _load_optional(flag)
+            return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 __all__ = [
     'Layer',
     'VectorLayer',
     'RasterLayer',
+    'PackedGeometry',
+    'PackedGeometryBuilder',
+    'STRTree',
+    'GeneralizationPyramid',
+    'AttributeTable',
+    'SidecarCache',
+    'DatasetPool',
+    'get_dataset_pool',
+    'list_vector_sublayers',
+    'optimize_vector_source',
     'Renderer',
     'SimpleRenderer',
     'VectorRenderer',
@@ -44,6 +122,12 @@ __all__ = [
     'CoordinateTransform',
     'CRSManager',
     'LayerManager',
+    'CacheManager',
+    'get_cache_manager',
+    'get_block_cache',
+    'ColorRamp',
+    'get_color_ramp',
+    'color_ramp_names',
     'MapCanvasQML',
     'MapImageProvider',
     'MapCanvasQMLInteractive',
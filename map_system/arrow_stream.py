@@ -0,0 +1,75 @@
+"""
+Leitura em lote via interface Arrow do OGR (GDAL >= 3.6)
+
+Layer.GetArrowStreamAsNumPy() entrega as features em lotes colunares (FIDs,
+WKB e campos como arrays NumPy), sem criar um objeto Python por feature.
+Quando a interface não existe (GDAL antigo) ou falha, os chamadores usam
+o caminho tradicional com GetNextFeature().
+"""
+
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+# Features por lote (equilíbrio entre memória temporária e chamadas Python)
+ARROW_BATCH_SIZE = 65536
+
+
+def arrow_stream_available(ogr_layer) -> bool:
+    """Retorna se a camada OGR oferece GetArrowStreamAsNumPy"""
+    return hasattr(ogr_layer, 'GetArrowStreamAsNumPy')
+
+
+def fid_column_name(ogr_layer) -> str:
+    """Retorna o nome da coluna de FID nos lotes Arrow"""
+    return ogr_layer.GetFIDColumn() or 'OGC_FID'
+
+
+def geometry_column_name(ogr_layer) -> str:
+    """Retorna o nome da coluna de geometria (WKB) nos lotes Arrow"""
+    return ogr_layer.GetGeometryColumn() or 'wkb_geometry'
+
+
+def iter_arrow_batches(ogr_layer, columns: Optional[List[str]] = None,
+                       with_geometry: bool = True,
+                       batch_size: int = ARROW_BATCH_SIZE) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Itera a camada em lotes colunares.
+
+    Campos fora de `columns` (e a geometria, se with_geometry=False) são
+    marcados como ignorados para que o driver nem os decodifique. O chamador
+    deve manter o lock da camada durante toda a iteração.
+
+    Args:
+        ogr_layer: Camada OGR aberta
+        columns: Campos a incluir (None = todos, [] = nenhum)
+        with_geometry: Se True, inclui a coluna de geometria em WKB
+        batch_size: Máximo de features por lote
+
+    Yields:
+        Dicionário {coluna: array}; campos com nulos vêm como np.ma.MaskedArray
+    """
+    layer_defn = ogr_layer.GetLayerDefn()
+    field_names = [layer_defn.GetFieldDefn(i).GetName()
+                   for i in range(layer_defn.GetFieldCount())]
+    if columns is None:
+        ignored = []
+    else:
+        ignored = [name for name in field_names if name not in columns]
+    if not with_geometry:
+        ignored = ignored + ['OGR_GEOMETRY']
+
+    stream = None
+    try:
+        ogr_layer.SetIgnoredFields(ignored)
+        ogr_layer.ResetReading()
+        stream = ogr_layer.GetArrowStreamAsNumPy(
+            options=['INCLUDE_FID=YES', f'MAX_FEATURES_IN_BATCH={int(batch_size)}'])
+        for batch in stream:
+            yield batch
+    finally:
+        # O stream precisa ser liberado antes de qualquer outro uso da camada
+        stream = None
+        ogr_layer.SetIgnoredFields([])
+        ogr_layer.ResetReading()
@@ -0,0 +1,425 @@
+"""
+Módulo de Atributos Colunares - Tabela de atributos em arrays NumPy
+
+Cada campo OGR vira um array tipado (int32/int64/float64). Os campos numéricos
+são decodificados juntos na primeira consulta, em uma passada que ignora
+geometria e textos; campos de texto (e datas) só são lidos quando acessados.
+A posição de cada valor é a mesma da feature em VectorLayer.packed_geometry,
+então filtros produzem índices diretamente utilizáveis pelos renderizadores.
+Poucas linhas (ex: identificar uma feature no mapa) são lidas por FID, sem
+decodificar colunas inteiras, enquanto as colunas ainda não estão em cache.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .arrow_stream import arrow_stream_available, iter_arrow_batches, fid_column_name
+
+
+# Seleções de até tantas linhas são lidas por FID (GetFeature) quando alguma
+# das colunas pedidas ainda não está em cache
+DIRECT_READ_MAX_ROWS = 100
+
+
+def _numeric_dtypes() -> Dict[int, np.dtype]:
+    """Mapeia tipos de campo OGR numéricos para dtypes NumPy"""
+    from osgeo import ogr
+    return {
+        ogr.OFTInteger: np.dtype(np.int32),
+        ogr.OFTInteger64: np.dtype(np.int64),
+        ogr.OFTReal: np.dtype(np.float64),
+    }
+
+
+class AttributeTable:
+    """
+    Tabela de atributos colunar de uma camada OGR.
+    Similar à QgsVectorLayerCache do QGIS, porém orientada a colunas.
+    """
+
+    def __init__(self, ogr_layer, lock: Optional[threading.RLock] = None,
+                 cache=None, cache_key: tuple = ('attributes',),
+                 fid_source: Optional[Callable[[], Optional[np.ndarray]]] = None):
+        """
+        Inicializa a tabela (nenhum valor é lido aqui).
+
+        Args:
+            ogr_layer: Camada OGR aberta
+            lock: Lock que serializa o acesso à camada OGR
+            cache: CacheManager onde as colunas são guardadas (None = dict local)
+            cache_key: Prefixo das chaves no cache; o nome da coluna é acrescentado
+            fid_source: Função que devolve os FIDs na ordem das linhas sem ler
+                        a tabela (ex: PackedGeometry.fids já em memória) ou None
+        """
+        self._layer = ogr_layer
+        self._lock = lock or threading.RLock()
+        self._cache = cache
+        self._cache_key = tuple(cache_key)
+        self._local: Dict[str, Any] = {}
+        self._fid_source = fid_source
+
+        numeric = _numeric_dtypes()
+        layer_defn = ogr_layer.GetLayerDefn()
+        self._fields = []
+        self._dtypes: Dict[str, np.dtype] = {}
+        for i in range(layer_defn.GetFieldCount()):
+            field_defn = layer_defn.GetFieldDefn(i)
+            name = field_defn.GetName()
+            self._fields.append(name)
+            self._dtypes[name] = numeric.get(field_defn.GetType(), np.dtype(object))
+
+    @property
+    def field_names(self) -> List[str]:
+        """Retorna os nomes dos campos na ordem do OGR"""
+        return list(self._fields)
+
+    def field_dtype(self, name: str) -> np.dtype:
+        """Retorna o dtype NumPy do campo (object para textos e datas)"""
+        return self._dtypes[name]
+
+    @property
+    def fids(self) -> np.ndarray:
+        """Retorna os FIDs na ordem das linhas"""
+        entry = self._lookup('__fid__')
+        if entry is None and self._fid_source is not None:
+            fids = self._fid_source()
+            if fids is not None:
+                return fids
+        if entry is None:
+            # Usa as colunas recém-lidas: o cache pode já tê-las despejado
+            entry = self._read_numeric()['__fid__']
+        return entry[0]
+
+    def __len__(self) -> int:
+        return len(self.fids)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Retorna a coluna inteira de um campo.
+
+        Valores nulos são NaN em colunas float, None em colunas de texto e 0 em
+        colunas inteiras (use null_mask para distingui-los).
+
+        Args:
+            name: Nome do campo
+
+        Returns:
+            Array NumPy somente leitura com um valor por feature
+        """
+        return self._column_entry(name)[0]
+
+    def null_mask(self, name: str) -> np.ndarray:
+        """Retorna a máscara booleana de valores nulos de um campo"""
+        values, nulls = self._column_entry(name)
+        if values.dtype == object:
+            return np.equal(values, None)
+        if nulls is None:
+            return np.zeros(len(values), dtype=bool)
+        return nulls
+
+    def filter(self, name: str, predicate: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """
+        Filtra as features avaliando um predicado vetorizado sobre uma coluna.
+
+        Args:
+            name: Nome do campo
+            predicate: Função que recebe a coluna e devolve uma máscara booleana
+                       (ex: lambda cota: cota > 100)
+
+        Returns:
+            Índices (posições) das features selecionadas
+        """
+        mask = np.asarray(predicate(self.column(name)), dtype=bool)
+        return np.flatnonzero(mask & ~self.null_mask(name))
+
+    def rows(self, start: int, stop: int, columns: Optional[List[str]] = None) -> List[dict]:
+        """
+        Monta dicionários apenas para um intervalo de linhas (tabela de atributos).
+
+        Args:
+            start: Primeira linha (inclusive)
+            stop: Última linha (exclusive)
+            columns: Campos desejados (None = todos)
+
+        Returns:
+            Lista de dicionários {campo: valor} com a chave extra 'fid'
+        """
+        return self._rows(slice(start, stop), columns)
+
+    def rows_by_fid(self, fid_start: int, fid_stop: int,
+                    columns: Optional[List[str]] = None) -> List[dict]:
+        """
+        Retorna as linhas cujo FID está em [fid_start, fid_stop).
+
+        Args:
+            fid_start: FID inicial (inclusive)
+            fid_stop: FID final (exclusive)
+            columns: Campos desejados (None = todos)
+
+        Returns:
+            Lista de dicionários {campo: valor} com a chave extra 'fid'
+        """
+        fids = self.fids
+        if len(fids) and np.all(fids[1:] >= fids[:-1]):
+            start = int(np.searchsorted(fids, fid_start, side='left'))
+            stop = int(np.searchsorted(fids, fid_stop, side='left'))
+            return self.rows(start, stop, columns)
+
+        # FIDs fora de ordem: seleciona por máscara e lê todas as linhas de uma vez
+        indices = np.flatnonzero((fids >= fid_start) & (fids < fid_stop))
+        return self._rows(indices, columns)
+
+    def row(self, index: int) -> dict:
+        """Retorna os atributos de uma única feature (por posição)"""
+        return self.rows(index, index + 1)[0]
+
+    def _rows(self, selector, columns: Optional[List[str]]) -> List[dict]:
+        """Monta os dicionários das linhas selecionadas (slice ou array de posições)"""
+        columns = self._fields if columns is None else columns
+        fids = self.fids[selector]
+        if len(fids) <= DIRECT_READ_MAX_ROWS and not all(self._is_cached(name) for name in columns):
+            # Poucas linhas: lê só essas features em vez das colunas inteiras
+            rows = self._read_rows(fids, columns)
+            if rows is not None:
+                return rows
+        selected = {name: self._python_values(name, selector) for name in columns}
+
+        result = []
+        for i, fid in enumerate(fids.tolist()):
+            row = {name: values[i] for name, values in selected.items()}
+            row['fid'] = fid
+            result.append(row)
+        return result
+
+    def _read_rows(self, fids: np.ndarray, columns: List[str]) -> Optional[List[dict]]:
+        """
+        Lê as linhas por FID com GetFeature(), apenas com os campos pedidos.
+
+        Returns:
+            Lista de dicionários (nulos viram None) ou None se alguma feature
+            não pôde ser lida por FID (o chamador lê as colunas inteiras)
+        """
+        missing = [name for name in columns if name not in self._dtypes]
+        if missing:
+            raise KeyError(f"Campo inexistente: {missing[0]}")
+        field_index = {name: self._fields.index(name) for name in columns}
+        ignored = [name for name in self._fields if name not in field_index] + ['OGR_GEOMETRY']
+
+        result = []
+        with self._lock:
+            try:
+                self._layer.SetIgnoredFields(ignored)
+                for fid in fids.tolist():
+                    feature = self._layer.GetFeature(fid)
+                    if feature is None:
+                        return None
+                    row = {}
+                    for name, i in field_index.items():
+                        if not feature.IsFieldSetAndNotNull(i):
+                            row[name] = None
+                        elif self._dtypes[name] == object:
+                            row[name] = feature.GetFieldAsString(i)
+                        elif self._dtypes[name].kind == 'f':
+                            row[name] = feature.GetFieldAsDouble(i)
+                        else:
+                            row[name] = feature.GetFieldAsInteger64(i)
+                    row['fid'] = fid
+                    result.append(row)
+            except Exception as e:
+                print(f"Aviso: Leitura por FID falhou, lendo colunas inteiras: {e}")
+                return None
+            finally:
+                self._layer.SetIgnoredFields([])
+        return result
+
+    def _column_entry(self, name: str) -> tuple:
+        """Retorna (valores, máscara de nulos ou None), lendo a coluna se necessário"""
+        if name not in self._dtypes:
+            raise KeyError(f"Campo inexistente: {name}")
+
+        entry = self._lookup(name)
+        if entry is None:
+            # Usa a coluna recém-lida: o cache pode já tê-la despejado
+            if self._dtypes[name] == object:
+                entry = self._read_strings(name)
+            else:
+                entry = self._read_numeric()[name]
+        return entry
+
+    def _python_values(self, name: str, selector) -> list:
+        """Converte as linhas selecionadas da coluna em valores Python (nulos viram None)"""
+        values, nulls = self._column_entry(name)
+        result = values[selector].tolist()
+        if nulls is not None:
+            for i in np.flatnonzero(nulls[selector]).tolist():
+                result[i] = None
+        return result
+
+    def _read_numeric(self) -> Dict[str, tuple]:
+        """
+        Lê todos os campos numéricos (e os FIDs) em uma única passada.
+
+        Returns:
+            Dicionário {campo: (valores, nulos)} com a chave extra '__fid__'
+        """
+        if arrow_stream_available(self._layer):
+            try:
+                return self._read_numeric_arrow()
+            except Exception as e:
+                print(f"Aviso: Leitura Arrow de atributos falhou, usando leitura por feature: {e}")
+        return self._read_numeric_features()
+
+    def _read_numeric_arrow(self) -> Dict[str, tuple]:
+        """Lê os campos numéricos em lotes colunares (sem objetos por feature)"""
+        numeric = [name for name in self._fields if self._dtypes[name] != object]
+
+        fid_chunks = []
+        value_chunks = {name: [] for name in numeric}
+        null_chunks = {name: [] for name in numeric}
+        with self._lock:
+            fid_column = fid_column_name(self._layer)
+            for batch in iter_arrow_batches(self._layer, columns=numeric, with_geometry=False):
+                fid_chunks.append(np.asarray(batch[fid_column], dtype=np.int64))
+                for name in numeric:
+                    array = batch[name]
+                    null_chunks[name].append(np.ma.getmaskarray(array))
+                    value_chunks[name].append(
+                        np.asarray(np.ma.getdata(array)).astype(self._dtypes[name]))
+
+        def joined(chunks, dtype):
+            return np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+        return self._store_numeric(
+            joined(fid_chunks, np.int64),
+            {name: joined(value_chunks[name], self._dtypes[name]) for name in numeric},
+            {name: joined(null_chunks[name], bool) for name in numeric})
+
+    def _read_numeric_features(self) -> Dict[str, tuple]:
+        """Lê os campos numéricos feature a feature com GetNextFeature()"""
+        numeric = [name for name in self._fields if self._dtypes[name] != object]
+        ignored = [name for name in self._fields if name not in numeric] + ['OGR_GEOMETRY']
+        field_index = {name: self._fields.index(name) for name in numeric}
+
+        with self._lock:
+            count = self._layer.GetFeatureCount()
+            fids = np.empty(count, dtype=np.int64)
+            values = {name: np.zeros(count, dtype=self._dtypes[name]) for name in numeric}
+            nulls = {name: np.zeros(count, dtype=bool) for name in numeric}
+
+            try:
+                self._layer.SetIgnoredFields(ignored)
+                self._layer.ResetReading()
+                row = 0
+                feature = self._layer.GetNextFeature()
+                while feature:
+                    if row == count:
+                        # GetFeatureCount pode ser aproximado em alguns drivers
+                        fids, values, nulls = _grow(fids, values, nulls)
+                        count = len(fids)
+                    fids[row] = feature.GetFID()
+                    for name in numeric:
+                        i = field_index[name]
+                        if not feature.IsFieldSetAndNotNull(i):
+                            nulls[name][row] = True
+                        elif self._dtypes[name].kind == 'f':
+                            values[name][row] = feature.GetFieldAsDouble(i)
+                        else:
+                            values[name][row] = feature.GetFieldAsInteger64(i)
+                    row += 1
+                    feature = self._layer.GetNextFeature()
+            finally:
+                self._layer.SetIgnoredFields([])
+                self._layer.ResetReading()
+
+        return self._store_numeric(fids[:row],
+                            {name: values[name][:row] for name in numeric},
+                            {name: nulls[name][:row] for name in numeric})
+
+    def _store_numeric(self, fids: np.ndarray, values: dict, nulls: dict) -> Dict[str, tuple]:
+        """Guarda FIDs e colunas numéricas (NaN nos nulos das colunas float)"""
+        entries = {'__fid__': self._store('__fid__', fids)}
+        for name, column in values.items():
+            null_mask = nulls[name]
+            if null_mask.any():
+                if column.dtype.kind == 'f':
+                    column[null_mask] = np.nan
+                entries[name] = self._store(name, column, null_mask)
+            else:
+                entries[name] = self._store(name, column)
+        return entries
+
+    def _read_strings(self, name: str) -> tuple:
+        """Lê um único campo de texto/data (os demais campos são ignorados)"""
+        ignored = [other for other in self._fields if other != name] + ['OGR_GEOMETRY']
+        i = self._fields.index(name)
+
+        with self._lock:
+            values = []
+            try:
+                self._layer.SetIgnoredFields(ignored)
+                self._layer.ResetReading()
+                feature = self._layer.GetNextFeature()
+                while feature:
+                    values.append(feature.GetFieldAsString(i)
+                                  if feature.IsFieldSetAndNotNull(i) else None)
+                    feature = self._layer.GetNextFeature()
+            finally:
+                self._layer.SetIgnoredFields([])
+                self._layer.ResetReading()
+
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        return self._store(name, column)
+
+    def _is_cached(self, name: str) -> bool:
+        """Indica se a coluna está em cache (sem contar como acesso)"""
+        if self._cache is None:
+            return name in self._local
+        return self._cache.peek(self._cache_key + (name,)) is not None
+
+    def _lookup(self, name: str) -> Optional[tuple]:
+        """Procura a entrada (valores, nulos) de uma coluna no cache (ou no dict local)"""
+        if self._cache is None:
+            return self._local.get(name)
+        return self._cache.get(self._cache_key + (name,))
+
+    def _store(self, name: str, values: np.ndarray,
+               nulls: Optional[np.ndarray] = None) -> tuple:
+        """
+        Guarda uma coluna somente leitura no cache (ou no dict local).
+        Valores e máscara de nulos formam uma única entrada para serem
+        despejados juntos.
+
+        Returns:
+            A entrada (valores, nulos) guardada
+        """
+        values.flags.writeable = False
+        if nulls is not None:
+            nulls.flags.writeable = False
+        entry = (values, nulls)
+        if self._cache is None:
+            self._local[name] = entry
+            return entry
+        nbytes = values.nbytes + (nulls.nbytes if nulls is not None else 0)
+        if values.dtype == object:
+            # Referências + objetos str (estimativa)
+            nbytes += sum(len(v) + 50 for v in values if v is not None)
+        self._cache.put(self._cache_key + (name,), entry, nbytes)
+        return entry
+
+
+def _grow(fids: np.ndarray, values: dict, nulls: dict):
+    """Dobra a capacidade dos buffers de leitura (novas posições zeradas)"""
+    size = max(16, len(fids) * 2)
+
+    def grown(array: np.ndarray) -> np.ndarray:
+        result = np.zeros(size, dtype=array.dtype)
+        result[:len(array)] = array
+        return result
+
+    fids = grown(fids)
+    values = {name: grown(array) for name, array in values.items()}
+    nulls = {name: grown(array) for name, array in nulls.items()}
+    return fids, values, nulls
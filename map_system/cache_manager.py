@@ -0,0 +1,323 @@
+"""
+Módulo de Cache - Gerenciador de memória global com despejo LRU
+
+Um único CacheManager por processo guarda os dados caros de recalcular
+(geometrias decodificadas, índices espaciais, imagens renderizadas por camada
+e blocos raster) sob um orçamento em MB. Quando o orçamento é excedido, as
+entradas usadas há mais tempo são descartadas e recalculadas sob demanda.
+
+As chaves são tuplas (tipo, dono, ...), onde "dono" é o identificador de
+cache de uma camada ou canvas, permitindo invalidar tudo de um dono de uma vez.
+
+Entradas maiores que o orçamento inteiro não entram no LRU: ficam retidas à
+parte (com um aviso) até serem removidas ou o dono ser invalidado, em vez de
+serem recalculadas a cada uso.
+"""
+
+import itertools
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+
+DEFAULT_BUDGET_MB = 1024
+
+_owner_ids = itertools.count(1)
+
+
+def new_owner_id() -> int:
+    """Retorna um identificador único para agrupar entradas do cache"""
+    return next(_owner_ids)
+
+
+def estimate_nbytes(value: Any) -> int:
+    """
+    Estima o tamanho em bytes de um valor armazenado no cache.
+
+    Args:
+        value: Array NumPy, objeto com atributo nbytes, imagem PIL/Qt ou tupla
+
+    Returns:
+        Tamanho aproximado em bytes
+    """
+    if value is None:
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(estimate_nbytes(item) for item in value)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    # QImage
+    if hasattr(value, 'sizeInBytes'):
+        return int(value.sizeInBytes())
+    # PIL Image
+    if hasattr(value, 'getbands') and hasattr(value, 'size'):
+        width, height = value.size
+        return width * height * len(value.getbands())
+    return sys.getsizeof(value)
+
+
+class CacheManager:
+    """
+    Cache LRU com orçamento de memória em bytes.
+    Seguro para uso a partir de várias threads.
+    """
+
+    def __init__(self, budget_mb: float = DEFAULT_BUDGET_MB):
+        """
+        Inicializa o cache.
+
+        Args:
+            budget_mb: Orçamento máximo de memória em MB
+        """
+        self._budget_bytes = int(budget_mb * 1024 * 1024)
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        # Entradas maiores que o orçamento (fora do LRU, não despejadas)
+        self._oversized: Dict[Hashable, tuple] = {}
+        # Criações em andamento em get_or_create (uma por chave)
+        self._pending: Dict[Hashable, '_PendingValue'] = {}
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def budget_mb(self) -> float:
+        """Retorna o orçamento em MB"""
+        return self._budget_bytes / (1024 * 1024)
+
+    @budget_mb.setter
+    def budget_mb(self, value: float):
+        """Define o orçamento em MB (despeja entradas se necessário)"""
+        with self._lock:
+            self._budget_bytes = int(value * 1024 * 1024)
+            self._evict()
+
+    @property
+    def total_bytes(self) -> int:
+        """Retorna o total de bytes em uso (incluindo entradas acima do orçamento)"""
+        with self._lock:
+            return self._total_bytes + self._oversized_bytes()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Obtém uma entrada e a marca como usada recentemente.
+
+        Args:
+            key: Chave da entrada
+            default: Valor retornado se a chave não existir
+
+        Returns:
+            Valor armazenado ou default
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            self._hits += 1
+            return entry[0]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Obtém uma entrada sem alterar a ordem LRU nem as estatísticas"""
+        with self._lock:
+            entry = self._entries.get(key) or self._oversized.get(key)
+            return default if entry is None else entry[0]
+
+    def put(self, key: Hashable, value: Any, nbytes: Optional[int] = None) -> bool:
+        """
+        Armazena uma entrada, despejando as menos usadas se necessário.
+
+        Uma entrada maior que o orçamento é retida fora do LRU (excedendo o
+        orçamento) até remove()/invalidate_owner()/clear().
+
+        Args:
+            key: Chave da entrada
+            value: Valor a armazenar
+            nbytes: Tamanho em bytes (None = estimado automaticamente)
+
+        Returns:
+            True se armazenado no LRU, False se retido acima do orçamento
+        """
+        if nbytes is None:
+            nbytes = estimate_nbytes(value)
+
+        with self._lock:
+            self._remove(key)
+            if nbytes > self._budget_bytes:
+                print(f"Aviso: Entrada de cache {key!r} ({nbytes / (1024 * 1024):.0f} MB) "
+                      f"excede o orçamento de {self.budget_mb:.0f} MB; mantida fora do LRU")
+                self._oversized[key] = (value, nbytes)
+                return False
+
+            self._entries[key] = (value, nbytes)
+            self._total_bytes += nbytes
+            self._evict()
+            return True
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any],
+                      nbytes: Optional[int] = None) -> Any:
+        """
+        Obtém uma entrada ou a cria com factory() em caso de falta.
+
+        A criação é única por chave: threads que pedem a mesma chave enquanto
+        ela está sendo criada esperam e recebem o mesmo valor.
+
+        Args:
+            key: Chave da entrada
+            factory: Função sem argumentos que produz o valor
+            nbytes: Tamanho em bytes (None = estimado automaticamente)
+
+        Returns:
+            Valor do cache ou recém-criado (None não é armazenado)
+        """
+        while True:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self._hits += 1
+                    return entry[0]
+                pending = self._pending.get(key)
+                if pending is None or pending.thread == threading.get_ident():
+                    self._misses += 1
+                    pending = self._pending[key] = _PendingValue()
+                    break
+            # Outra thread está criando o valor
+            pending.done.wait()
+            if pending.value is not None:
+                return pending.value
+            # A criação falhou ou retornou None: tenta de novo
+
+        try:
+            value = factory()
+            if value is not None:
+                self.put(key, value, nbytes)
+            pending.value = value
+            return value
+        finally:
+            with self._lock:
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+            pending.done.set()
+
+    def remove(self, key: Hashable) -> bool:
+        """Remove uma entrada. Retorna True se existia"""
+        with self._lock:
+            return self._remove(key)
+
+    def invalidate_owner(self, owner: int) -> int:
+        """
+        Remove todas as entradas de um dono (camada ou canvas).
+
+        Args:
+            owner: Identificador retornado por new_owner_id()
+
+        Returns:
+            Número de entradas removidas
+        """
+        with self._lock:
+            keys = [key for key in itertools.chain(self._entries, self._oversized)
+                    if isinstance(key, tuple) and len(key) > 1 and key[1] == owner]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        """Remove todas as entradas (as estatísticas são mantidas)"""
+        with self._lock:
+            self._entries.clear()
+            self._oversized.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna as estatísticas do cache.
+
+        Returns:
+            Dicionário com entries, used_mb, oversized (entradas acima do
+            orçamento), oversized_mb, budget_mb, hits, misses, evictions e hit_rate
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'used_mb': self._total_bytes / (1024 * 1024),
+                'oversized': len(self._oversized),
+                'oversized_mb': self._oversized_bytes() / (1024 * 1024),
+                'budget_mb': self.budget_mb,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+            }
+
+    def print_stats(self):
+        """Imprime as estatísticas do cache para debug"""
+        stats = self.stats()
+        print("\n=== Cache ===")
+        print(f"  Entradas: {stats['entries']}")
+        print(f"  Memória: {stats['used_mb']:.1f} / {stats['budget_mb']:.0f} MB")
+        if stats['oversized']:
+            print(f"  Acima do orçamento: {stats['oversized']} entradas, "
+                  f"{stats['oversized_mb']:.1f} MB")
+        print(f"  Acertos: {stats['hits']}  Faltas: {stats['misses']}  "
+              f"Despejos: {stats['evictions']}  Taxa de acerto: {stats['hit_rate']:.1%}")
+        print("=============\n")
+
+    def _lookup(self, key: Hashable) -> Optional[tuple]:
+        """Busca uma entrada e a marca como recente (chamar com o lock)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        return self._oversized.get(key)
+
+    def _oversized_bytes(self) -> int:
+        """Total de bytes das entradas acima do orçamento (chamar com o lock)"""
+        return sum(nbytes for _, nbytes in self._oversized.values())
+
+    def _remove(self, key: Hashable) -> bool:
+        """Remove uma entrada (chamar com o lock adquirido)"""
+        if self._oversized.pop(key, None) is not None:
+            return True
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._total_bytes -= entry[1]
+        return True
+
+    def _evict(self):
+        """Despeja entradas LRU até caber no orçamento (chamar com o lock)"""
+        while self._total_bytes > self._budget_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self._total_bytes -= nbytes
+            self._evictions += 1
+
+
+class _PendingValue:
+    """Criação em andamento de uma chave em get_or_create"""
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.done = threading.Event()
+        self.value = None
+
+
+_cache_manager: Optional[CacheManager] = None
+_cache_manager_lock = threading.Lock()
+
+
+def get_cache_manager() -> CacheManager:
+    """Retorna o CacheManager global do processo (criado na primeira chamada)"""
+    global _cache_manager
+    if _cache_manager is None:
+        with _cache_manager_lock:
+            if _cache_manager is None:
+                _cache_manager = CacheManager()
+    return _cache_manager
@@ -0,0 +1,217 @@
+"""
+Rampas de Cores - Renderização raster por tabela de consulta (LUT)
+
+Os valores da banda são quantizados em uma LUT RGBA de 256 ou 4096 entradas
+e convertidos em pixels com um único np.take, escrito direto no buffer RGBA
+de saída. Para bandas de 8/16 bits a LUT cobre todos os valores possíveis do
+tipo, e os próprios dados servem de índice (sem nenhum array temporário).
+Pixels nodata/NaN recebem a última entrada da LUT, transparente.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+LUT_SIZE = 256
+LUT_SIZE_FINE = 4096
+
+# Tipos cujos valores possíveis cabem em uma LUT completa
+_FULL_LUT_DTYPES = ('u1', 'i1', 'u2', 'i2')
+
+Color = Tuple[int, int, int, int]
+
+
+class ColorRamp:
+    """
+    Rampa de cores definida por paradas (posição 0-1, cor RGBA).
+    Similar ao QgsGradientColorRamp do QGIS.
+    """
+
+    def __init__(self, name: str, stops: Sequence[Tuple[float, Color]]):
+        """
+        Inicializa a rampa.
+
+        Args:
+            name: Nome da rampa
+            stops: Paradas (posição, (r, g, b, a)) em ordem crescente de posição
+        """
+        if len(stops) < 2:
+            raise ValueError("Uma rampa de cores precisa de pelo menos duas paradas")
+        self.name = name
+        self._positions = np.array([position for position, _ in stops], dtype=np.float64)
+        self._colors = np.array([color for _, color in stops], dtype=np.float64)
+        self._luts: Dict[int, np.ndarray] = {}
+        self._full_luts: Dict[tuple, np.ndarray] = {}
+
+    def lut(self, size: int = LUT_SIZE) -> np.ndarray:
+        """
+        Retorna a LUT com `size` cores mais uma entrada transparente no final.
+
+        Args:
+            size: Número de cores da rampa (256 ou 4096)
+
+        Returns:
+            Array (size + 1, 4) uint8 (somente leitura, reutilizado)
+        """
+        lut = self._luts.get(size)
+        if lut is None:
+            samples = np.linspace(0.0, 1.0, size)
+            lut = np.zeros((size + 1, 4), dtype=np.uint8)
+            for channel in range(4):
+                lut[:size, channel] = np.round(
+                    np.interp(samples, self._positions, self._colors[:, channel]))
+            lut.flags.writeable = False
+            self._luts[size] = lut
+        return lut
+
+    def full_lut(self, dtype: np.dtype, value_range: Tuple[float, float],
+                 nodata: Optional[float]) -> np.ndarray:
+        """
+        Retorna uma LUT indexada diretamente pelos dados de 8/16 bits.
+
+        Os inteiros com sinal são indexados pela sua representação sem sinal
+        (data.view(uint)), por isso a tabela segue essa ordem.
+
+        Args:
+            dtype: Tipo da banda (u1, i1, u2 ou i2)
+            value_range: (mínimo, máximo) do realce
+            nodata: Valor nodata (transparente)
+
+        Returns:
+            Array (2^bits, 4) uint8
+        """
+        dtype = np.dtype(dtype)
+        key = (dtype.str, value_range, nodata)
+        lut = self._full_luts.get(key)
+        if lut is not None:
+            return lut
+
+        unsigned = np.dtype(f'u{dtype.itemsize}')
+        values = np.arange(2 ** (8 * dtype.itemsize), dtype=np.int64).astype(unsigned).view(dtype)
+        colors = self.lut(LUT_SIZE_FINE if dtype.itemsize > 1 else LUT_SIZE)
+        lut = np.take(colors, quantize(values, value_range, len(colors) - 1, nodata), axis=0)
+        lut.flags.writeable = False
+
+        # Poucas combinações por camada (uma por realce); limita a memória
+        if len(self._full_luts) >= 8:
+            self._full_luts.clear()
+        self._full_luts[key] = lut
+        return lut
+
+    def apply(self, data: np.ndarray, value_range: Tuple[float, float],
+              nodata: Optional[float] = None,
+              out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Converte uma banda em pixels RGBA.
+
+        Args:
+            data: Array 2D da banda
+            value_range: (mínimo, máximo) mapeados para o início e o fim da rampa
+            nodata: Valor nodata (transparente)
+            out: Buffer (altura, largura, 4) uint8 de saída (None = novo)
+
+        Returns:
+            O buffer RGBA preenchido
+        """
+        if out is None:
+            out = np.empty(data.shape + (4,), dtype=np.uint8)
+
+        if data.dtype.isnative and data.dtype.str[1:] in _FULL_LUT_DTYPES:
+            lut = self.full_lut(data.dtype, value_range, nodata)
+            unsigned = np.dtype(f'u{data.dtype.itemsize}')
+            np.take(lut, data.view(unsigned), axis=0, out=out)
+            return out
+
+        colors = self.lut(LUT_SIZE_FINE)
+        np.take(colors, quantize(data, value_range, len(colors) - 1, nodata), axis=0, out=out)
+        return out
+
+
+def valid_mask(data: np.ndarray, nodata: Optional[float]) -> np.ndarray:
+    """
+    Retorna a máscara dos pixels com valor (nem nodata nem NaN).
+
+    Args:
+        data: Array da banda
+        nodata: Valor nodata da banda (None se não houver)
+
+    Returns:
+        Array booleano com o formato de data
+    """
+    mask = np.ones(data.shape, dtype=bool)
+    if data.dtype.kind == 'f':
+        mask &= ~np.isnan(data)
+    if nodata is not None and not np.isnan(nodata):
+        mask &= data != nodata
+    return mask
+
+
+def quantize(data: np.ndarray, value_range: Tuple[float, float], levels: int,
+             nodata: Optional[float] = None) -> np.ndarray:
+    """
+    Converte valores em índices 0..levels-1 da LUT; nodata/NaN recebem `levels`.
+
+    Args:
+        data: Array de valores
+        value_range: (mínimo, máximo) do realce
+        levels: Número de cores da LUT
+        nodata: Valor nodata
+
+    Returns:
+        Array de índices uint16 com o formato de data
+    """
+    vmin, vmax = value_range
+    scale = (levels - 1) / (vmax - vmin) if vmax > vmin else 0.0
+
+    # Um único temporário float32, reutilizado em todas as operações
+    scaled = np.subtract(data, vmin, dtype=np.float32)
+    scaled *= scale
+    scaled += 0.5
+    np.clip(scaled, 0, levels - 1, out=scaled)
+    valid = valid_mask(data, nodata)
+    scaled[~valid] = levels
+    return scaled.astype(np.uint16)
+
+
+# Rampas disponíveis (posição, RGBA)
+COLOR_RAMPS: Dict[str, ColorRamp] = {
+    'grayscale': ColorRamp('grayscale', [
+        (0.0, (0, 0, 0, 255)),
+        (1.0, (255, 255, 255, 255)),
+    ]),
+    # Hipsométrica: verde (baixadas) -> amarelo -> marrom -> branco (picos)
+    'terrain': ColorRamp('terrain', [
+        (0.00, (51, 102, 51, 255)),
+        (0.15, (102, 153, 76, 255)),
+        (0.35, (204, 204, 127, 255)),
+        (0.55, (191, 153, 102, 255)),
+        (0.75, (140, 102, 76, 255)),
+        (0.90, (191, 178, 165, 255)),
+        (1.00, (255, 255, 255, 255)),
+    ]),
+    'viridis': ColorRamp('viridis', [
+        (0.00, (68, 1, 84, 255)),
+        (0.25, (59, 82, 139, 255)),
+        (0.50, (33, 145, 140, 255)),
+        (0.75, (94, 201, 98, 255)),
+        (1.00, (253, 231, 37, 255)),
+    ]),
+    'spectral': ColorRamp('spectral', [
+        (0.00, (215, 25, 28, 255)),
+        (0.25, (253, 174, 97, 255)),
+        (0.50, (255, 255, 191, 255)),
+        (0.75, (171, 221, 164, 255)),
+        (1.00, (43, 131, 186, 255)),
+    ]),
+}
+
+
+def get_color_ramp(name: str) -> Optional[ColorRamp]:
+    """Retorna uma rampa pelo nome (None se não existir)"""
+    return COLOR_RAMPS.get(name)
+
+
+def color_ramp_names() -> List[str]:
+    """Retorna os nomes das rampas disponíveis"""
+    return list(COLOR_RAMPS)
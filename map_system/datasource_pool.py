@@ -0,0 +1,253 @@
+"""
+Pool de Datasets - Handles GDAL/OGR compartilhados com contagem de referências
+
+Várias camadas de um mesmo arquivo (sublayers de um GeoPackage, DXF ou KML)
+compartilham um único ogr.DataSource / gdal.Dataset. Cada handle tem um lock
+próprio, já que objetos GDAL não podem ser usados por duas threads ao mesmo
+tempo. Handles sem referências continuam abertos (reabrir é barato) até que
+o limite de arquivos abertos seja atingido; então os ociosos há mais tempo
+são fechados.
+
+Iterações em streaming (VectorLayer.iter_features) usam um segundo handle do
+arquivo (CURSOR), também contado no limite: filtros e posição de leitura entre
+lotes não interferem nas leituras das camadas pelo handle VECTOR.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+DEFAULT_MAX_OPEN = 64
+
+VECTOR = 'vector'
+RASTER = 'raster'
+CURSOR = 'cursor'
+
+
+class DatasetHandle:
+    """Dataset aberto e compartilhado por uma ou mais camadas"""
+
+    def __init__(self, path: str, kind: str, dataset):
+        """
+        Inicializa o handle.
+
+        Args:
+            path: Caminho absoluto do arquivo
+            kind: VECTOR, CURSOR ou RASTER
+            dataset: ogr.DataSource ou gdal.Dataset aberto
+        """
+        self.path = path
+        self.kind = kind
+        self.dataset = dataset
+        # Serializa o acesso ao dataset (e a todas as suas sublayers)
+        self.lock = threading.RLock()
+        self.refcount = 0
+        # Handles CURSOR: iteração que posicionou por último cada sublayer
+        self.readers: Dict[str, object] = {}
+
+
+class DatasetPool:
+    """
+    Pool de datasets abertos com limite de arquivos.
+    Similar ao QgsOgrConnPool do QGIS.
+    """
+
+    def __init__(self, max_open: int = DEFAULT_MAX_OPEN):
+        """
+        Inicializa o pool.
+
+        Args:
+            max_open: Número máximo de datasets abertos (handles em uso nunca
+                      são fechados, então o limite pode ser excedido
+                      temporariamente)
+        """
+        self._max_open = max(1, int(max_open))
+        self._handles: 'OrderedDict[Tuple[str, str], DatasetHandle]' = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def max_open(self) -> int:
+        """Retorna o limite de datasets abertos"""
+        return self._max_open
+
+    @max_open.setter
+    def max_open(self, value: int):
+        """Define o limite (fecha handles ociosos se necessário)"""
+        with self._lock:
+            self._max_open = max(1, int(value))
+            self._close_idle(self._max_open)
+
+    @property
+    def open_count(self) -> int:
+        """Retorna quantos datasets estão abertos"""
+        return len(self._handles)
+
+    def acquire(self, path: str, kind: str = VECTOR) -> Optional[DatasetHandle]:
+        """
+        Obtém um handle para o arquivo, abrindo-o se necessário.
+        Cada acquire() deve ser seguido de um release().
+
+        Args:
+            path: Caminho do arquivo
+            kind: VECTOR (ogr.Open), CURSOR (ogr.Open, handle separado para
+                  iterações) ou RASTER (gdal.Open somente leitura)
+
+        Returns:
+            DatasetHandle ou None se o arquivo não pôde ser aberto
+        """
+        key = (os.path.abspath(str(path)), kind)
+        handle = self._acquire_open(key)
+        if handle is not None:
+            return handle
+
+        # Abre fora do lock: abrir um arquivo grande não bloqueia os demais
+        dataset = _open_dataset(key[0], kind)
+        if dataset is None:
+            return None
+
+        with self._lock:
+            existing = self._acquire_open(key)
+            if existing is not None:
+                # Outra thread abriu o mesmo arquivo enquanto isso
+                return existing
+
+            handle = DatasetHandle(key[0], kind, dataset)
+            handle.refcount = 1
+            self._handles[key] = handle
+            print(f"[DEBUG] Dataset aberto no pool: {key[0]} ({len(self._handles)} abertos)")
+            self._close_idle(self._max_open)
+            return handle
+
+    def _acquire_open(self, key: Tuple[str, str]) -> Optional[DatasetHandle]:
+        """Incrementa a referência de um handle já aberto (None se não existir)"""
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None:
+                self._handles.move_to_end(key)
+                handle.refcount += 1
+            return handle
+
+    def release(self, handle: DatasetHandle):
+        """
+        Devolve um handle obtido com acquire().
+
+        Args:
+            handle: Handle a devolver
+        """
+        with self._lock:
+            if handle.refcount > 0:
+                handle.refcount -= 1
+            if handle.refcount == 0 and self._handles.get((handle.path, handle.kind)) is not handle:
+                # Handle descartado com discard(): fecha com a última referência
+                with handle.lock:
+                    handle.dataset = None
+            self._close_idle(self._max_open)
+
+    def discard(self, path: str, kind: str = VECTOR) -> bool:
+        """
+        Tira um arquivo do pool para que o próximo acquire() o reabra
+        (ex: após gravar overviews). Quem já tem o handle continua usando-o.
+
+        Args:
+            path: Caminho do arquivo
+            kind: VECTOR, CURSOR ou RASTER
+
+        Returns:
+            True se o arquivo estava no pool
+        """
+        key = (os.path.abspath(str(path)), kind)
+        with self._lock:
+            handle = self._handles.pop(key, None)
+            if handle is None:
+                return False
+            if handle.refcount == 0:
+                with handle.lock:
+                    handle.dataset = None
+            return True
+
+    def close_idle(self) -> int:
+        """
+        Fecha todos os datasets sem referências.
+
+        Returns:
+            Número de datasets fechados
+        """
+        with self._lock:
+            return self._close_idle(0)
+
+    def _close_idle(self, limit: int) -> int:
+        """Fecha handles ociosos (mais antigos primeiro) até restarem `limit` (chamar com lock)"""
+        closed = 0
+        for key in list(self._handles):
+            if len(self._handles) <= limit:
+                break
+            handle = self._handles[key]
+            if handle.refcount > 0:
+                continue
+            with handle.lock:
+                handle.dataset = None
+            del self._handles[key]
+            closed += 1
+        return closed
+
+
+def _open_dataset(path: str, kind: str):
+    """Abre um dataset vetorial ou raster (None em caso de erro)"""
+    try:
+        if kind == RASTER:
+            from osgeo import gdal
+            return gdal.Open(path, gdal.GA_ReadOnly)
+        from osgeo import ogr
+        return ogr.Open(path)
+    except Exception as e:
+        print(f"Erro ao abrir dataset {path}: {e}")
+        return None
+
+
+def list_vector_sublayers(path: str) -> List[Dict]:
+    """
+    Lista as camadas (tabelas) de um arquivo vetorial.
+
+    Args:
+        path: Caminho do arquivo (GeoPackage, DXF, KML, ...)
+
+    Returns:
+        Lista de dicionários {'index', 'name', 'geometry_type', 'feature_count'};
+        vazia se o arquivo não puder ser aberto
+    """
+    pool = get_dataset_pool()
+    handle = pool.acquire(path, VECTOR)
+    if handle is None:
+        return []
+
+    try:
+        sublayers = []
+        with handle.lock:
+            for i in range(handle.dataset.GetLayerCount()):
+                layer = handle.dataset.GetLayer(i)
+                sublayers.append({
+                    'index': i,
+                    'name': layer.GetName(),
+                    'geometry_type': layer.GetGeomType(),
+                    # Contagem rápida apenas (-1 se o driver precisar varrer o arquivo)
+                    'feature_count': layer.GetFeatureCount(force=0),
+                })
+        return sublayers
+    finally:
+        pool.release(handle)
+
+
+_dataset_pool: Optional[DatasetPool] = None
+_dataset_pool_lock = threading.Lock()
+
+
+def get_dataset_pool() -> DatasetPool:
+    """Retorna o DatasetPool global do processo (criado na primeira chamada)"""
+    global _dataset_pool
+    if _dataset_pool is None:
+        with _dataset_pool_lock:
+            if _dataset_pool is None:
+                _dataset_pool = DatasetPool()
+    return _dataset_pool
@@ -0,0 +1,74 @@
+"""
+Worker da Decodificação Paralela - Código executado nos processos do pool
+
+Os processos são iniciados com 'spawn' e importam apenas este módulo (e o
+armazenamento colunar): NumPy e OGR, sem Qt, PIL ou o restante do pacote.
+O bloco de memória compartilhada criado aqui pertence ao processo principal,
+que o anexa e remove com unlink(); por isso o worker o retira do
+resource_tracker (bpo-38119), que do contrário o apagaria ou avisaria de um
+"vazamento" ao encerrar o worker.
+"""
+
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .geometry_store import PackedGeometry
+
+
+ARRAY_NAMES = ('coords', 'ring_offsets', 'part_offsets',
+               'feature_offsets', 'geom_types', 'fids', 'z')
+
+
+def decode_chunk(source: str, sublayer, start: int, count: int, keep_z: bool) -> tuple:
+    """
+    Executado no worker: decodifica um bloco e o copia para memória compartilhada.
+
+    Returns:
+        Descritor (nome do bloco, [(array, dtype, shape, offset), ...])
+    """
+    from osgeo import ogr
+    ogr.UseExceptions()
+
+    datasource = ogr.Open(source)
+    if isinstance(sublayer, str):
+        layer = datasource.GetLayerByName(sublayer)
+    else:
+        layer = datasource.GetLayer(sublayer or 0)
+
+    # Apenas a geometria é necessária
+    layer_defn = layer.GetLayerDefn()
+    layer.SetIgnoredFields([layer_defn.GetFieldDefn(i).GetName()
+                            for i in range(layer_defn.GetFieldCount())])
+
+    packed = PackedGeometry.from_ogr_range(layer, start, count, keep_z=keep_z)
+    layer = None
+    datasource = None
+    return to_shared_memory(packed)
+
+
+def to_shared_memory(packed: PackedGeometry) -> tuple:
+    """Copia os arrays para um único bloco de memória compartilhada"""
+    arrays = [(name, getattr(packed, name)) for name in ARRAY_NAMES
+              if getattr(packed, name) is not None]
+
+    layout = []
+    offset = 0
+    for name, array in arrays:
+        # Alinha cada array em 8 bytes
+        offset = (offset + 7) & ~7
+        layout.append((name, array.dtype.str, array.shape, offset))
+        offset += array.nbytes
+
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    # O processo principal é o dono do bloco (ele chama unlink())
+    resource_tracker.unregister(block._name, 'shared_memory')
+    try:
+        for (name, array), (_, dtype, shape, array_offset) in zip(arrays, layout):
+            target = np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=array_offset)
+            target[...] = array
+        target = None
+        return block.name, layout
+    finally:
+        # O bloco continua existindo até o processo principal chamar unlink()
+        block.close()
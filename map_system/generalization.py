@@ -0,0 +1,178 @@
+"""
+Módulo de Generalização - Pirâmide de geometrias simplificadas por escala
+
+Cada nível k da pirâmide usa tolerância 2^k (em unidades do mapa). O
+renderizador escolhe o maior nível cuja tolerância não ultrapassa o tamanho
+de um pixel, de forma que vértices que cairiam no mesmo pixel são removidos
+antes do desenho. Os níveis são construídos sob demanda e mantidos em cache
+(normalmente o CacheManager global).
+"""
+
+import math
+from typing import Dict, Optional
+
+import numpy as np
+
+from .geometry_store import PackedGeometry, POLYGON_TYPES
+
+
+# Se a simplificação mantiver mais que esta fração dos vértices, o nível
+# reutiliza a geometria original (não compensa a memória extra)
+MIN_REDUCTION_RATIO = 0.9
+
+
+def simplify_packed(packed: PackedGeometry, tolerance: float) -> PackedGeometry:
+    """
+    Simplifica todas as geometrias por agrupamento em grade (vetorizado).
+
+    Vértices consecutivos de um mesmo anel que caem na mesma célula de
+    tamanho `tolerance` são descartados. O primeiro e o último vértice de cada
+    anel são sempre mantidos, e anéis de polígono mantêm ao menos 4 vértices.
+    A estrutura de features/partes não muda, então índices e FIDs continuam
+    válidos (inclusive para o índice espacial).
+
+    Args:
+        packed: Geometrias originais
+        tolerance: Tamanho da célula em unidades do mapa
+
+    Returns:
+        Novo PackedGeometry ou o próprio `packed` se a redução for pequena
+    """
+    coords = packed.coords
+    total = len(coords)
+    ring_count = len(packed.ring_offsets) - 1
+    if total == 0 or ring_count == 0 or tolerance <= 0:
+        return packed
+
+    ring_starts = packed.ring_offsets[:-1]
+    ring_ends = packed.ring_offsets[1:] - 1
+
+    cells = np.floor(coords / tolerance)
+    keep = np.empty(total, dtype=bool)
+    keep[0] = True
+    np.any(cells[1:] != cells[:-1], axis=1, out=keep[1:])
+    keep[ring_starts] = True
+    keep[ring_ends] = True
+
+    # Anéis de polígono precisam de ao menos 4 vértices para continuar visíveis
+    ring_lengths = np.diff(packed.ring_offsets)
+    kept_per_ring = np.add.reduceat(keep, ring_starts)
+    short = (kept_per_ring < 4) & (ring_lengths >= 4) & _polygon_ring_mask(packed)
+    if short.any():
+        keep[ring_starts[short] + ring_lengths[short] // 3] = True
+        keep[ring_starts[short] + (2 * ring_lengths[short]) // 3] = True
+        kept_per_ring = np.add.reduceat(keep, ring_starts)
+
+    if kept_per_ring.sum() >= total * MIN_REDUCTION_RATIO:
+        return packed
+
+    ring_offsets = np.zeros(ring_count + 1, dtype=np.int64)
+    np.cumsum(kept_per_ring, out=ring_offsets[1:])
+
+    return PackedGeometry(
+        coords=np.ascontiguousarray(coords[keep]),
+        ring_offsets=ring_offsets,
+        part_offsets=packed.part_offsets,
+        feature_offsets=packed.feature_offsets,
+        geom_types=packed.geom_types,
+        fids=packed.fids,
+        z=packed.z[keep] if packed.z is not None else None,
+    )
+
+
+def _polygon_ring_mask(packed: PackedGeometry) -> np.ndarray:
+    """Retorna uma máscara por anel indicando se pertence a um polígono"""
+    rings_per_feature = np.diff(packed.part_offsets[packed.feature_offsets])
+    is_polygon = np.isin(packed.geom_types, POLYGON_TYPES)
+    return np.repeat(is_polygon, rings_per_feature)
+
+
+class GeneralizationPyramid:
+    """
+    Níveis de generalização de uma camada.
+    O nível k tem tolerância 2^k unidades do mapa.
+    """
+
+    # Quantos níveis mais finos são procurados para derivar um novo nível
+    MAX_CASCADE = 8
+
+    def __init__(self, packed: PackedGeometry, cache=None, cache_key: tuple = ('generalization',)):
+        """
+        Inicializa a pirâmide.
+
+        Args:
+            packed: Geometrias originais (resolução completa)
+            cache: CacheManager onde os níveis são guardados (None = dict local)
+            cache_key: Prefixo das chaves no cache; o nível é acrescentado ao final
+        """
+        self._packed = packed
+        self._cache = cache
+        self._cache_key = tuple(cache_key)
+        self._levels: Dict[int, PackedGeometry] = {}
+
+    @staticmethod
+    def level_for_scale(scale: float) -> int:
+        """
+        Calcula o nível da pirâmide para uma escala de renderização.
+
+        Args:
+            scale: Pixels por unidade do mapa (RenderContext.scale_x)
+
+        Returns:
+            Maior k tal que 2^k <= tamanho do pixel em unidades do mapa
+        """
+        return math.floor(math.log2(1.0 / scale))
+
+    def get(self, scale: float) -> PackedGeometry:
+        """
+        Retorna as geometrias generalizadas adequadas à escala.
+
+        Args:
+            scale: Pixels por unidade do mapa
+
+        Returns:
+            PackedGeometry do nível correspondente (construído se necessário)
+        """
+        if scale <= 0 or not math.isfinite(scale):
+            return self._packed
+
+        level = self.level_for_scale(scale)
+        cached = self._lookup(level, peek=False)
+        if cached is not None:
+            return cached
+
+        # As grades são aninhadas (2^k contém 2^(k-1)), então o nível pode
+        # ser derivado do nível mais fino já calculado, que é menor
+        source = self._packed
+        for finer in range(level - 1, level - 1 - self.MAX_CASCADE, -1):
+            candidate = self._lookup(finer, peek=True)
+            if candidate is not None:
+                source = candidate
+                break
+
+        simplified = simplify_packed(source, 2.0 ** level)
+        # Um nível igual à sua origem não ocupa memória extra
+        self._store(level, simplified, 0 if simplified is source else simplified.coords.nbytes)
+
+        if simplified is not source:
+            print(f"[DEBUG] Nível de generalização {level} construído: "
+                  f"{len(simplified.coords)}/{len(self._packed.coords)} vértices")
+        return simplified
+
+    def clear(self):
+        """Descarta os níveis guardados localmente"""
+        self._levels.clear()
+
+    def _lookup(self, level: int, peek: bool) -> Optional[PackedGeometry]:
+        """Procura um nível no cache (ou no dict local)"""
+        if self._cache is None:
+            return self._levels.get(level)
+        key = self._cache_key + (level,)
+        return self._cache.peek(key) if peek else self._cache.get(key)
+
+    def _store(self, level: int, geometry: PackedGeometry, nbytes: int):
+        """Guarda um nível no cache (ou no dict local)"""
+        if self._cache is None:
+            self._levels[level] = geometry
+        else:
+            self._cache.put(self._cache_key + (level,), geometry, nbytes)
@@ -0,0 +1,699 @@
+"""
+Módulo de Armazenamento Colunar de Geometrias - Representação compacta em NumPy
+
+Em vez de manter um ogr.Geometry clonado por feature, as geometrias da camada
+são empacotadas em arrays planos (similar ao layout GeoArrow):
+
+    coords          float64 (n_coords, 2)   coordenadas x, y de todos os vértices
+    ring_offsets    int64   (n_rings + 1)   início de cada anel em coords
+    part_offsets    int64   (n_parts + 1)   início de cada parte em ring_offsets
+    feature_offsets int64   (n_features + 1) início de cada feature em part_offsets
+    geom_types      uint8   (n_features)    código do tipo de geometria
+    fids            int64   (n_features)    FID OGR de cada feature
+
+Pontos e linhas possuem um único "anel" por parte; polígonos possuem o anel
+externo seguido dos internos. As geometrias são decodificadas diretamente de
+WKB, portanto renderizadores e ferramentas não precisam tocar objetos OGR.
+"""
+
+import struct
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from .arrow_stream import (arrow_stream_available, iter_arrow_batches,
+                           fid_column_name, geometry_column_name)
+
+
+# Códigos de tipo de geometria (iguais aos tipos "flat" do OGR)
+GEOM_NONE = 0
+GEOM_POINT = 1
+GEOM_LINESTRING = 2
+GEOM_POLYGON = 3
+GEOM_MULTIPOINT = 4
+GEOM_MULTILINESTRING = 5
+GEOM_MULTIPOLYGON = 6
+
+POINT_TYPES = (GEOM_POINT, GEOM_MULTIPOINT)
+LINE_TYPES = (GEOM_LINESTRING, GEOM_MULTILINESTRING)
+POLYGON_TYPES = (GEOM_POLYGON, GEOM_MULTIPOLYGON)
+
+_WKB_25D_FLAG = 0x80000000
+_WKB_M_FLAG = 0x40000000
+
+
+class PackedGeometry:
+    """
+    Geometrias de uma camada empacotadas em arrays NumPy contíguos.
+    Construída em uma única passada por PackedGeometryBuilder.
+    """
+
+    def __init__(self,
+                 coords: np.ndarray,
+                 ring_offsets: np.ndarray,
+                 part_offsets: np.ndarray,
+                 feature_offsets: np.ndarray,
+                 geom_types: np.ndarray,
+                 fids: np.ndarray,
+                 z: Optional[np.ndarray] = None):
+        """
+        Inicializa o armazenamento a partir de arrays já construídos.
+
+        Args:
+            coords: Coordenadas (n_coords, 2) em float64
+            ring_offsets: Offsets dos anéis em coords
+            part_offsets: Offsets das partes em ring_offsets
+            feature_offsets: Offsets das features em part_offsets
+            geom_types: Código do tipo de geometria por feature
+            fids: FID OGR por feature
+            z: Coordenada Z por vértice (opcional)
+        """
+        self.coords = coords
+        self.ring_offsets = ring_offsets
+        self.part_offsets = part_offsets
+        self.feature_offsets = feature_offsets
+        self.geom_types = geom_types
+        self.fids = fids
+        self.z = z
+
+    def __len__(self) -> int:
+        return len(self.geom_types)
+
+    @property
+    def feature_count(self) -> int:
+        """Retorna o número de features"""
+        return len(self.geom_types)
+
+    @property
+    def nbytes(self) -> int:
+        """Retorna o total de bytes ocupados pelos arrays"""
+        total = (self.coords.nbytes + self.ring_offsets.nbytes +
+                 self.part_offsets.nbytes + self.feature_offsets.nbytes +
+                 self.geom_types.nbytes + self.fids.nbytes)
+        if self.z is not None:
+            total += self.z.nbytes
+        return total
+
+    def feature_parts(self, index: int) -> List[List[np.ndarray]]:
+        """
+        Retorna as partes de uma feature como listas de anéis.
+
+        Args:
+            index: Índice da feature (posição, não FID)
+
+        Returns:
+            Lista de partes; cada parte é uma lista de arrays (n, 2) que são
+            views sobre coords (sem cópia)
+        """
+        parts = []
+        ring_offsets = self.ring_offsets
+        part_offsets = self.part_offsets
+        for part in range(self.feature_offsets[index], self.feature_offsets[index + 1]):
+            rings = []
+            for ring in range(part_offsets[part], part_offsets[part + 1]):
+                rings.append(self.coords[ring_offsets[ring]:ring_offsets[ring + 1]])
+            parts.append(rings)
+        return parts
+
+    def feature_coords(self, index: int) -> np.ndarray:
+        """
+        Retorna todos os vértices de uma feature (view sobre coords).
+
+        Args:
+            index: Índice da feature
+
+        Returns:
+            Array (n, 2) com os vértices da feature
+        """
+        first_part = self.feature_offsets[index]
+        last_part = self.feature_offsets[index + 1]
+        start = self.ring_offsets[self.part_offsets[first_part]]
+        stop = self.ring_offsets[self.part_offsets[last_part]]
+        return self.coords[start:stop]
+
+    def to_wkb(self) -> List[Optional[bytes]]:
+        """
+        Codifica as features em WKB ISO little-endian (inverso do builder).
+
+        Camadas formadas só por pontos são codificadas de uma vez
+        (points_to_wkb); as demais, feature a feature.
+
+        Returns:
+            Lista com um WKB por feature (None para GEOM_NONE)
+        """
+        count = len(self.geom_types)
+        if count and len(self.coords) == count and (self.geom_types == GEOM_POINT).all():
+            z = self.z if self.z is not None and not np.isnan(self.z).all() else None
+            return points_to_wkb(self.coords[:, 0], self.coords[:, 1], z)
+        return [self._feature_wkb(i) for i in range(count)]
+
+    def _feature_wkb(self, index: int) -> Optional[bytes]:
+        """Codifica uma feature em WKB ISO"""
+        geom_type = int(self.geom_types[index])
+        if geom_type == GEOM_NONE:
+            return None
+
+        ring_offsets, part_offsets = self.ring_offsets, self.part_offsets
+        first_part = int(self.feature_offsets[index])
+        last_part = int(self.feature_offsets[index + 1])
+        start = ring_offsets[part_offsets[first_part]]
+        stop = ring_offsets[part_offsets[last_part]]
+        has_z = self.z is not None and not np.isnan(self.z[start:stop]).all()
+        z_code = 1000 if has_z else 0
+
+        def vertices(ring: int) -> bytes:
+            begin, end = ring_offsets[ring], ring_offsets[ring + 1]
+            values = self.coords[begin:end]
+            if has_z:
+                values = np.column_stack([values, self.z[begin:end]])
+            return np.ascontiguousarray(values, dtype='<f8').tobytes()
+
+        def single(kind: int, part: int) -> bytes:
+            rings = range(part_offsets[part], part_offsets[part + 1])
+            header = struct.pack('<BI', 1, kind + z_code)
+            if kind == GEOM_POINT:
+                return header + vertices(rings[0])
+            if kind == GEOM_LINESTRING:
+                ring = rings[0]
+                return header + struct.pack('<I', ring_offsets[ring + 1] - ring_offsets[ring]) + vertices(ring)
+            return header + struct.pack('<I', len(rings)) + b''.join(
+                struct.pack('<I', ring_offsets[ring + 1] - ring_offsets[ring]) + vertices(ring)
+                for ring in rings)
+
+        if geom_type in (GEOM_MULTIPOINT, GEOM_MULTILINESTRING, GEOM_MULTIPOLYGON):
+            return (struct.pack('<BII', 1, geom_type + z_code, last_part - first_part) +
+                    b''.join(single(geom_type - 3, part) for part in range(first_part, last_part)))
+        return single(geom_type, first_part)
+
+    @classmethod
+    def concatenate(cls, parts: List['PackedGeometry']) -> 'PackedGeometry':
+        """
+        Junta vários PackedGeometry (ex: blocos decodificados em paralelo)
+        preservando a ordem das features.
+
+        Args:
+            parts: Blocos na ordem desejada
+
+        Returns:
+            PackedGeometry único
+        """
+        parts = list(parts)
+        if not parts:
+            return PackedGeometryBuilder().finish()
+        if len(parts) == 1:
+            return parts[0]
+
+        def joined_offsets(name: str) -> np.ndarray:
+            lengths = [np.diff(getattr(part, name)) for part in parts]
+            offsets = np.zeros(sum(len(l) for l in lengths) + 1, dtype=np.int64)
+            if len(offsets) > 1:
+                np.cumsum(np.concatenate(lengths), out=offsets[1:])
+            return offsets
+
+        keep_z = all(part.z is not None for part in parts)
+        return cls(
+            coords=np.concatenate([part.coords for part in parts]),
+            ring_offsets=joined_offsets('ring_offsets'),
+            part_offsets=joined_offsets('part_offsets'),
+            feature_offsets=joined_offsets('feature_offsets'),
+            geom_types=np.concatenate([part.geom_types for part in parts]),
+            fids=np.concatenate([part.fids for part in parts]),
+            z=np.concatenate([part.z for part in parts]) if keep_z else None,
+        )
+
+    @classmethod
+    def from_ogr_layer(cls, ogr_layer,
+                       keep_z: bool = False,
+                       progress_callback: Optional[Callable[[int, int], None]] = None
+                       ) -> 'PackedGeometry':
+        """
+        Constrói o armazenamento lendo todas as features de uma camada OGR.
+        Usa a interface Arrow do OGR quando disponível (lotes de WKB sem objetos
+        Python por feature) e GetNextFeature() caso contrário.
+
+        Args:
+            ogr_layer: Camada OGR aberta
+            keep_z: Se True, preserva a coordenada Z
+            progress_callback: Função chamada com (lidas, total) periodicamente
+
+        Returns:
+            PackedGeometry com todas as features da camada
+        """
+        total = ogr_layer.GetFeatureCount()
+
+        if arrow_stream_available(ogr_layer):
+            try:
+                return cls._from_arrow_stream(ogr_layer, keep_z, total, progress_callback)
+            except Exception as e:
+                print(f"Aviso: Leitura Arrow falhou, usando leitura por feature: {e}")
+
+        return cls._from_feature_loop(ogr_layer, keep_z, total, progress_callback)
+
+    @classmethod
+    def _from_arrow_stream(cls, ogr_layer, keep_z: bool, total: int,
+                           progress_callback) -> 'PackedGeometry':
+        """Lê FIDs e WKB em lotes colunares (atributos ignorados)"""
+        builder = PackedGeometryBuilder(keep_z=keep_z)
+        fid_column = fid_column_name(ogr_layer)
+        geometry_column = geometry_column_name(ogr_layer)
+
+        for batch in iter_arrow_batches(ogr_layer, columns=[]):
+            builder.add_wkb_batch(batch[fid_column], batch[geometry_column])
+            if progress_callback:
+                progress_callback(builder.feature_count, total)
+
+        return builder.finish()
+
+    @classmethod
+    def from_ogr_range(cls, ogr_layer, start: int, count: int,
+                       keep_z: bool = False) -> 'PackedGeometry':
+        """
+        Constrói o armazenamento a partir de um intervalo de features
+        (posições na ordem de leitura, não FIDs). Usado na decodificação
+        paralela, em que cada processo lê um bloco.
+
+        Args:
+            ogr_layer: Camada OGR aberta
+            start: Posição da primeira feature
+            count: Número máximo de features a ler
+            keep_z: Se True, preserva a coordenada Z
+
+        Returns:
+            PackedGeometry com as features do intervalo
+        """
+        ogr_layer.ResetReading()
+        if start > 0:
+            ogr_layer.SetNextByIndex(start)
+        return cls._from_feature_loop(ogr_layer, keep_z, count, None,
+                                      reset=False, max_features=count)
+
+    @classmethod
+    def _from_feature_loop(cls, ogr_layer, keep_z: bool, total: int,
+                           progress_callback, reset: bool = True,
+                           max_features: Optional[int] = None) -> 'PackedGeometry':
+        """Lê feature a feature com GetNextFeature()"""
+        from osgeo import ogr
+
+        builder = PackedGeometryBuilder(keep_z=keep_z)
+
+        if reset:
+            ogr_layer.ResetReading()
+        feature = ogr_layer.GetNextFeature()
+        while feature:
+            geom = feature.GetGeometryRef()
+            if geom is None:
+                builder.add_empty(feature.GetFID())
+            else:
+                if geom.HasCurveGeometry():
+                    geom = geom.GetLinearGeometry()
+                builder.add_wkb(feature.GetFID(), geom.ExportToWkb(ogr.wkbNDR))
+
+            if progress_callback and builder.feature_count % 10000 == 0:
+                progress_callback(builder.feature_count, total)
+
+            if max_features is not None and builder.feature_count >= max_features:
+                break
+            feature = ogr_layer.GetNextFeature()
+
+        ogr_layer.ResetReading()
+        if progress_callback:
+            progress_callback(builder.feature_count, total)
+        return builder.finish()
+
+
+class PackedGeometryBuilder:
+    """
+    Acumula geometrias WKB e produz um PackedGeometry.
+    Os vértices de pontos são agrupados antes de virar array para evitar
+    um np.frombuffer por ponto.
+    """
+
+    def __init__(self, keep_z: bool = False):
+        """
+        Inicializa o construtor.
+
+        Args:
+            keep_z: Se True, preserva a coordenada Z (NaN para geometrias 2D)
+        """
+        self._keep_z = keep_z
+        self._reset()
+
+    def _reset(self):
+        """Limpa os buffers intermediários"""
+        self._coord_chunks: List[np.ndarray] = []
+        self._z_chunks: List[np.ndarray] = []
+        self._pending_xy: List[float] = []
+        self._pending_z: List[float] = []
+        self._ring_lengths: List[int] = []
+        self._part_ring_counts: List[int] = []
+        self._feature_part_counts: List[int] = []
+        self._geom_types: List[int] = []
+        self._fids: List[int] = []
+
+    @property
+    def feature_count(self) -> int:
+        """Retorna o número de features já adicionadas"""
+        return len(self._geom_types)
+
+    def add_empty(self, fid: int):
+        """Adiciona uma feature sem geometria (mantém o alinhamento por índice)"""
+        self._fids.append(fid)
+        self._geom_types.append(GEOM_NONE)
+        self._feature_part_counts.append(0)
+
+    def add_wkb(self, fid: int, wkb):
+        """
+        Decodifica uma geometria WKB (ISO ou 2.5D) e adiciona ao armazenamento.
+        Tipos não suportados (coleções, curvas) são registrados como GEOM_NONE.
+
+        Args:
+            fid: FID da feature
+            wkb: bytes/bytearray/memoryview com a geometria
+        """
+        buf = memoryview(wkb)
+        if len(buf) < 5:
+            self.add_empty(fid)
+            return
+
+        geom_type, _, _, _ = _read_header(buf, 0)
+        if geom_type not in (GEOM_POINT, GEOM_LINESTRING, GEOM_POLYGON,
+                             GEOM_MULTIPOINT, GEOM_MULTILINESTRING,
+                             GEOM_MULTIPOLYGON):
+            self.add_empty(fid)
+            return
+
+        # Anéis de uma parte incompleta já foram registrados antes do erro:
+        # a reversão volta aos tamanhos de antes da geometria
+        part_count_before = len(self._part_ring_counts)
+        ring_count_before = len(self._ring_lengths)
+        try:
+            if geom_type in (GEOM_MULTIPOINT, GEOM_MULTILINESTRING, GEOM_MULTIPOLYGON):
+                self._read_multi(buf)
+            else:
+                self._read_single(buf, 0)
+        except (struct.error, ValueError) as e:
+            print(f"Aviso: WKB inválido na feature {fid}: {e}")
+            self._rollback(part_count_before, ring_count_before)
+            self.add_empty(fid)
+            return
+
+        part_count = len(self._part_ring_counts) - part_count_before
+        self._fids.append(fid)
+        self._geom_types.append(geom_type if part_count else GEOM_NONE)
+        self._feature_part_counts.append(part_count)
+
+    def add_wkb_batch(self, fids, wkbs):
+        """
+        Adiciona um lote de geometrias WKB (ex: um lote Arrow).
+        Lotes formados apenas por pontos little-endian (2D, ou 3D como nos
+        levantamentos topográficos) são decodificados de uma vez; os demais
+        passam por add_wkb() geometria a geometria.
+        Curvas são linearizadas via OGR.
+
+        Args:
+            fids: Sequência de FIDs
+            wkbs: Sequência de bytes WKB (None para features sem geometria)
+        """
+        fids = np.asarray(fids, dtype=np.int64)
+        wkbs = list(wkbs)
+        if not wkbs:
+            return
+
+        sizes = {len(w) if w is not None else 0 for w in wkbs}
+        if len(sizes) == 1 and sizes <= {21, 29}:
+            size = sizes.pop()
+            point_types = ((GEOM_POINT,) if size == 21 else
+                           (1000 + GEOM_POINT, _WKB_25D_FLAG | GEOM_POINT))
+            blob = np.frombuffer(b''.join(wkbs), dtype=np.uint8).reshape(-1, size)
+            raw_types = blob[:, 1:5].copy().view('<u4').ravel()
+            if (blob[:, 0] == 1).all() and np.isin(raw_types, point_types).all():
+                values = blob[:, 5:].copy().view('<f8')
+                self._add_point_block(fids, values[:, :2],
+                                      values[:, 2] if size == 29 else None)
+                return
+
+        for fid, wkb in zip(fids.tolist(), wkbs):
+            if wkb is None:
+                self.add_empty(fid)
+            elif len(wkb) >= 5 and _read_header(memoryview(wkb), 0)[0] > GEOM_MULTIPOLYGON:
+                self.add_wkb(fid, _linearize_wkb(wkb))
+            else:
+                self.add_wkb(fid, wkb)
+
+    def _add_point_block(self, fids: np.ndarray, xy: np.ndarray,
+                         z: Optional[np.ndarray] = None):
+        """Adiciona um bloco (n, 2) de pontos simples; NaN indica POINT EMPTY"""
+        valid = ~np.isnan(xy[:, 0])
+        valid_count = int(valid.sum())
+
+        self._flush_points()
+        self._coord_chunks.append(xy[valid])
+        if self._keep_z:
+            self._z_chunks.append(z[valid] if z is not None else np.full(valid_count, np.nan))
+        self._ring_lengths.extend([1] * valid_count)
+        self._part_ring_counts.extend([1] * valid_count)
+        self._feature_part_counts.extend(valid.astype(np.int64).tolist())
+        self._geom_types.extend(np.where(valid, GEOM_POINT, GEOM_NONE).tolist())
+        self._fids.extend(fids.tolist())
+
+    def finish(self) -> PackedGeometry:
+        """
+        Concatena os buffers acumulados.
+
+        Returns:
+            PackedGeometry pronto para uso
+        """
+        self._flush_points()
+
+        if self._coord_chunks:
+            coords = np.ascontiguousarray(np.concatenate(self._coord_chunks), dtype=np.float64)
+        else:
+            coords = np.empty((0, 2), dtype=np.float64)
+
+        z = None
+        if self._keep_z:
+            z = np.concatenate(self._z_chunks) if self._z_chunks else np.empty(0, dtype=np.float64)
+
+        geometry = PackedGeometry(
+            coords=coords,
+            ring_offsets=_lengths_to_offsets(self._ring_lengths),
+            part_offsets=_lengths_to_offsets(self._part_ring_counts),
+            feature_offsets=_lengths_to_offsets(self._feature_part_counts),
+            geom_types=np.asarray(self._geom_types, dtype=np.uint8),
+            fids=np.asarray(self._fids, dtype=np.int64),
+            z=z,
+        )
+
+        # Libera os buffers intermediários
+        self._reset()
+        return geometry
+
+    def _read_multi(self, buf: memoryview):
+        """Lê uma multi-geometria adicionando uma parte por membro"""
+        _, _, _, order = _read_header(buf, 0)
+        count = struct.unpack_from(order + 'I', buf, 5)[0]
+        offset = 9
+        for _ in range(count):
+            offset = self._read_single(buf, offset)
+
+    def _read_single(self, buf: memoryview, offset: int) -> int:
+        """
+        Lê um Point, LineString ou Polygon a partir de offset.
+
+        Returns:
+            Offset logo após a geometria lida
+        """
+        geom_type, has_z, dims, order = _read_header(buf, offset)
+        offset += 5
+
+        if geom_type == GEOM_POINT:
+            values = struct.unpack_from(order + 'd' * dims, buf, offset)
+            offset += 8 * dims
+            if values[0] != values[0]:  # POINT EMPTY é codificado com NaN
+                return offset
+            self._pending_xy.append(values[0])
+            self._pending_xy.append(values[1])
+            if self._keep_z:
+                self._pending_z.append(values[2] if has_z else np.nan)
+            self._ring_lengths.append(1)
+            self._part_ring_counts.append(1)
+            return offset
+
+        if geom_type == GEOM_LINESTRING:
+            offset, count = self._read_ring(buf, offset, order, dims, has_z)
+            if count:
+                self._part_ring_counts.append(1)
+            return offset
+
+        if geom_type == GEOM_POLYGON:
+            ring_count = struct.unpack_from(order + 'I', buf, offset)[0]
+            offset += 4
+            rings = 0
+            for _ in range(ring_count):
+                offset, count = self._read_ring(buf, offset, order, dims, has_z)
+                if count:
+                    rings += 1
+            if rings:
+                self._part_ring_counts.append(rings)
+            return offset
+
+        raise ValueError(f"tipo de geometria {geom_type} inesperado dentro de multi-geometria")
+
+    def _read_ring(self, buf: memoryview, offset: int, order: str,
+                   dims: int, has_z: bool):
+        """Lê uma sequência de pontos (linha ou anel)"""
+        count = struct.unpack_from(order + 'I', buf, offset)[0]
+        offset += 4
+        if count == 0:
+            return offset, 0
+
+        dtype = np.dtype('<f8' if order == '<' else '>f8')
+        values = np.frombuffer(buf, dtype=dtype, count=count * dims, offset=offset)
+        values = values.reshape(count, dims)
+        offset += 8 * count * dims
+
+        self._flush_points()
+        self._coord_chunks.append(values[:, :2])
+        if self._keep_z:
+            self._z_chunks.append(values[:, 2] if has_z else np.full(count, np.nan))
+        self._ring_lengths.append(count)
+        return offset, count
+
+    def _flush_points(self):
+        """Converte os pontos pendentes em um bloco de coordenadas"""
+        if not self._pending_xy:
+            return
+        self._coord_chunks.append(np.asarray(self._pending_xy, dtype=np.float64).reshape(-1, 2))
+        self._pending_xy = []
+        if self._keep_z:
+            self._z_chunks.append(np.asarray(self._pending_z, dtype=np.float64))
+            self._pending_z = []
+
+    def _rollback(self, part_count: int, ring_count: int):
+        """
+        Descarta partes, anéis e coordenadas adicionados por uma geometria
+        inválida, inclusive os anéis de uma parte que não chegou a ser registrada.
+
+        Args:
+            part_count: Número de partes antes da geometria
+            ring_count: Número de anéis antes da geometria
+        """
+        self._flush_points()
+        del self._part_ring_counts[part_count:]
+        # Cada anel (ou ponto) tem ring_lengths[i] coordenadas
+        coord_count = sum(self._ring_lengths[ring_count:])
+        del self._ring_lengths[ring_count:]
+        _truncate_chunks(self._coord_chunks, coord_count)
+        if self._keep_z:
+            _truncate_chunks(self._z_chunks, coord_count)
+
+
+def points_to_wkb(x: np.ndarray, y: np.ndarray,
+                  z: Optional[np.ndarray] = None) -> List[bytes]:
+    """
+    Codifica pontos em WKB ISO little-endian de uma só vez.
+
+    Args:
+        x, y: Coordenadas dos pontos
+        z: Cotas (None = pontos 2D)
+
+    Returns:
+        Lista com um WKB (POINT ou POINT Z) por ponto
+    """
+    dims = 2 if z is None else 3
+    size = 5 + 8 * dims
+    count = len(x)
+
+    values = np.empty((count, dims), dtype='<f8')
+    values[:, 0] = x
+    values[:, 1] = y
+    if z is not None:
+        values[:, 2] = z
+
+    records = np.empty((count, size), dtype=np.uint8)
+    records[:, 0] = 1
+    records[:, 1:5] = np.frombuffer(struct.pack('<I', GEOM_POINT + (1000 if z is not None else 0)),
+                                    dtype=np.uint8)
+    records[:, 5:] = values.view(np.uint8).reshape(count, 8 * dims)
+    blob = records.tobytes()
+    return [blob[i:i + size] for i in range(0, len(blob), size)]
+
+
+def wkb_geometry_types(wkbs) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lê de uma vez o tipo de uma sequência de geometrias WKB (ISO ou 2.5D).
+
+    Args:
+        wkbs: Sequência de WKB (None = sem geometria)
+
+    Returns:
+        Tupla (tipos flat uint32, 0 para ausentes; máscara de geometrias com Z)
+    """
+    empty = b'\x01\x00\x00\x00\x00'
+    headers = np.frombuffer(b''.join(bytes(w[:5]) if w is not None and len(w) >= 5 else empty
+                                     for w in wkbs), dtype=np.uint8).reshape(-1, 5)
+    little = headers[:, 1:5].copy().view('<u4').ravel()
+    big = headers[:, 1:5].copy().view('>u4').ravel()
+    raw = np.where(headers[:, 0] == 1, little, big).astype(np.uint32)
+
+    has_z = (raw & _WKB_25D_FLAG) != 0
+    raw = raw & 0x0FFFFFFF
+    has_z |= np.isin(raw // 1000, (1, 3))
+    return raw % 1000, has_z
+
+
+def _read_header(buf: memoryview, offset: int):
+    """
+    Lê o cabeçalho WKB (ordem de bytes + tipo).
+
+    Returns:
+        Tupla (tipo flat, possui Z, dimensões, prefixo struct da ordem de bytes)
+    """
+    order = '<' if buf[offset] == 1 else '>'
+    raw_type = struct.unpack_from(order + 'I', buf, offset + 1)[0]
+
+    has_z = bool(raw_type & _WKB_25D_FLAG)
+    has_m = bool(raw_type & _WKB_M_FLAG)
+    raw_type &= 0x0FFFFFFF
+
+    # Tipos ISO: 1000 = Z, 2000 = M, 3000 = ZM
+    iso_dims = raw_type // 1000
+    if iso_dims in (1, 3):
+        has_z = True
+    if iso_dims in (2, 3):
+        has_m = True
+
+    dims = 2 + int(has_z) + int(has_m)
+    return raw_type % 1000, has_z, dims, order
+
+
+def _linearize_wkb(wkb) -> bytes:
+    """Converte curvas/coleções em WKB para geometrias lineares via OGR"""
+    from osgeo import ogr
+
+    geom = ogr.CreateGeometryFromWkb(bytes(wkb))
+    if geom is None:
+        return b''
+    if geom.HasCurveGeometry():
+        geom = geom.GetLinearGeometry()
+    return geom.ExportToWkb(ogr.wkbNDR)
+
+
+def _lengths_to_offsets(lengths: List[int]) -> np.ndarray:
+    """Converte uma lista de tamanhos em offsets acumulados iniciando em zero"""
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    if lengths:
+        np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _truncate_chunks(chunks: List[np.ndarray], count: int):
+    """Remove as últimas count linhas de uma lista de blocos"""
+    while count > 0 and chunks:
+        last = chunks[-1]
+        if len(last) <= count:
+            count -= len(last)
+            chunks.pop()
+        else:
+            chunks[-1] = last[:len(last) - count]
+            count = 0
@@ -3,9 +3,12 @@ Módulo de Camadas - Define as classes base para camadas vetoriais e raster
 """
 
 from abc import ABC, abstractmethod
-from typing import Optional, Tuple, List
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple, List, Iterator
 from enum import Enum
+import math
 import numpy as np
+import os
 import sys
 import threading
 
@@ -15,6 +18,36 @@ try:
 except ImportError:
     raise ImportError("GDAL não está instalado. Instale com: pip install gdal")
 
+from .geometry_store import PackedGeometry
+from .spatial_index import STRTree, compute_feature_bounds
+from .generalization import GeneralizationPyramid
+from .cache_manager import get_cache_manager, new_owner_id
+from .attribute_store import AttributeTable
+from .sidecar_cache import SidecarCache
+from .datasource_pool import get_dataset_pool, CURSOR, VECTOR, RASTER
+from .parallel_decode import decode_parallel, PARALLEL_DECODE_MIN_FEATURES
+from .source_optimizer import has_native_spatial_index
+from .raster_blocks import (BLOCK_READ_MAX_DOWNSAMPLE, BlockReader, ParallelBlockReader,
+                            choose_overview_level, overview_band, release_thread_datasets)
+from .overviews import (OVERVIEW_MIN_RASTER_SIZE, build_overviews,
+                        default_overview_levels)
+from .raster_stats import (BandStatistics, compute_band_statistics, compute_statistics,
+                           sample_array)
+from .raster_mmap import map_band
+from .raster_sampling import sample_band
+from .color_ramp import ColorRamp, get_color_ramp
+from .terrain import TERRAIN_PRODUCTS, TerrainEngine
+from .raster_warp import (create_warped_vrt, needs_reprojection, new_vrt_path,
+                          remove_warped_vrt)
+
+
+# Features lidas por vez em iter_features (o lock só é mantido durante a leitura)
+ITER_FEATURES_BATCH_SIZE = 1000
+
+# Fontes com índice espacial nativo: vistas que cobrem até esta fração da
+# extensão da camada são lidas da fonte (filtro espacial do OGR), não da memória
+NATIVE_INDEX_VIEW_FRACTION = 0.05
+
 
 class LayerType(Enum):
     """Tipos de camadas suportadas"""
@@ -22,6 +55,20 @@ class LayerType(Enum):
     RASTER = "raster"
 
 
+@dataclass
+class RasterWindow:
+    """
+    Janela raster lida para a extensão de um RenderContext.
+    
+    data cobre exatamente canvas_rect (x, y, largura, altura em pixels do canvas,
+    valores fracionários); o renderizador só precisa escalar e posicionar.
+    """
+    data: np.ndarray
+    canvas_rect: Tuple[float, float, float, float]
+    pixel_window: Tuple[int, int, int, int]
+    nodata: Optional[float] = None
+
+
 class Layer(ABC):
     """
     Classe base abstrata para todas as camadas.
@@ -43,6 +90,8 @@ class Layer(ABC):
         self._crs = None
         self._extent = None
         self._valid = False
+        # Identificador das entradas desta camada no CacheManager global
+        self._cache_id = new_owner_id()
         
     @property
     def name(self) -> str:
@@ -54,6 +103,11 @@ class Layer(ABC):
         """Define o nome da camada"""
         self._name = value
     
+    @property
+    def source(self) -> str:
+        """Retorna o caminho da fonte de dados"""
+        return self._source
+    
     @property
     def visible(self) -> bool:
         """Retorna se a camada está visível"""
@@ -84,6 +138,11 @@ class Layer(ABC):
         """Retorna a extensão da camada (minx, miny, maxx, maxy)"""
         return self._extent
     
+    @property
+    def cache_id(self) -> int:
+        """Retorna o identificador da camada no CacheManager"""
+        return self._cache_id
+    
     @property
     def is_valid(self) -> bool:
         """Retorna se a camada foi carregada com sucesso"""
@@ -98,6 +157,20 @@ class Layer(ABC):
     def load(self) -> bool:
         """Carrega os dados da camada"""
         pass
+    
+    def prepare(self, progress_callback=None):
+        """
+        Pré-calcula estruturas usadas no primeiro render.
+        Pode ser chamado fora da thread da GUI logo após load().
+        
+        Args:
+            progress_callback: Função chamada com (feito, total) periodicamente
+        """
+        pass
+    
+    def close(self):
+        """Libera o arquivo aberto pela camada (devolve o handle ao pool)"""
+        pass
 
 
 class VectorLayer(Layer):
@@ -106,19 +179,41 @@ class VectorLayer(Layer):
     Similar à QgsVectorLayer do QGIS.
     """
     
-    def __init__(self, name: str, source: str):
+    def __init__(self, name: str, source: str, streaming: bool = False,
+                 disk_cache: bool = False, sublayer=None):
         """
         Inicializa uma camada vetorial.
         
         Args:
             name: Nome da camada
             source: Caminho para o arquivo vetorial
+            streaming: Se True, renderiza lendo apenas as features da extensão
+                       visível a cada frame, sem manter geometrias em memória
+                       (sem pirâmide de generalização nem índice STR; indicado
+                       para FlatGeobuf/GeoPackage com índice espacial nativo
+                       vistos bem de perto)
+            disk_cache: Se True, salva as geometrias decodificadas em
+                        `<fonte>.mapcache/` e as mapeia na próxima abertura
+            sublayer: Nome ou índice da camada OGR dentro do arquivo
+                      (None = primeira camada)
         """
         super().__init__(name, source)
+        self._streaming = streaming
+        self._disk_cache = disk_cache
+        self._sublayer = sublayer
+        self._parallel_threshold = PARALLEL_DECODE_MIN_FEATURES
+        self._native_index = False
+        self._driver_name = None
+        self._handle = None
         self._datasource = None
         self._layer = None
         self._features = []
         self._geometry_type = None
+        self._sidecar: Optional[SidecarCache] = None
+        # Handles OGR não são thread-safe: serializa o acesso à camada
+        self._lock = threading.RLock()
+        # Tabela de atributos (criada no primeiro acesso, uma por abertura)
+        self._attributes: Optional[AttributeTable] = None
         
     def get_type(self) -> LayerType:
         """Retorna o tipo da camada"""
@@ -140,108 +235,150 @@ class VectorLayer(Layer):
             print(f"DEBUG: Caminho: '{source_path}'")
             sys.stdout.flush()
             
-            print("DEBUG: Chamando ogr.Open...")
-            sys.stdout.flush()
-            
-            # Abre o datasource
-            self._datasource = ogr.Open(source_path)
-            
-            print("DEBUG: ogr.Open retornou")
-            sys.stdout.flush()
+            # Abre o datasource pelo pool (sublayers do mesmo arquivo
+            # compartilham um único handle e o seu lock)
+            self.close()
+            self._handle = get_dataset_pool().acquire(source_path, VECTOR)
             
-            if self._datasource is None:
+            if self._handle is None:
                 print(f"ERRO: Nao foi possivel abrir datasource: {source_path}")
                 sys.stdout.flush()
                 return False
             
-            print(f"Datasource aberto com sucesso")
-            sys.stdout.flush()
-            
-            # Obtém a primeira camada
-            print("DEBUG: Obtendo layer...")
-            sys.stdout.flush()
-            self._layer = self._datasource.GetLayer(0)
-            print("DEBUG: Layer obtida")
-            sys.stdout.flush()
-            
-            if self._layer is None:
-                print(f"ERRO: Nao foi possivel obter camada do datasource")
-                return False
+            self._datasource = self._handle.dataset
+            self._lock = self._handle.lock
             
-            print(f"Camada obtida, feature count: {self._layer.GetFeatureCount()}")
-            sys.stdout.flush()
-            
-            # Obtém o CRS
-            try:
-                spatial_ref = self._layer.GetSpatialRef()
-                if spatial_ref:
-                    self._crs = spatial_ref.ExportToWkt()
-            except Exception as crs_error:
-                print(f"Aviso: Erro ao obter CRS: {crs_error}")
-                self._crs = None
-            
-            # Obtém a extensão
-            try:
-                extent = self._layer.GetExtent()
-                self._extent = (extent[0], extent[2], extent[1], extent[3])  # minx, miny, maxx, maxy
-                print(f"Extensao: {self._extent}")
-                sys.stdout.flush()
-            except Exception as extent_error:
-                print(f"ERRO: Nao foi possivel obter extensao: {extent_error}")
-                return False
-            
-            # Obtém o tipo de geometria
-            try:
-                layer_defn = self._layer.GetLayerDefn()
-                self._geometry_type = layer_defn.GetGeomType()
-                print(f"Tipo de geometria: {self._geometry_type}")
-            except Exception as geom_error:
-                print(f"Aviso: Erro ao obter tipo de geometria: {geom_error}")
-                self._geometry_type = None
-            
-            # OTIMIZAÇÃO QGIS: NÃO carrega todas as features em memória
-            # Mantém apenas a referência ao datasource
-            # Features serão carregadas sob demanda durante renderização
-            print(f"DEBUG: Layer possui {self._layer.GetFeatureCount()} features (não carregadas em memória)")
-            sys.stdout.flush()
-            
-            self._features = []  # Mantém vazio para compatibilidade
-            self._valid = True
-            
-            print(f"==> Camada vetorial carregada com SUCESSO: {self._name} ({self._layer.GetFeatureCount()} features)")
-            sys.stdout.flush()
-            
-            # IMPORTANTE: Mantém o datasource aberto para acesso sob demanda
-            # O datasource será fechado apenas quando a camada for destruída
-            
-            return True
+            # O datasource pode estar sendo lido por outra sublayer
+            with self._lock:
+                if self._open_sublayer():
+                    return True
+            self.close()
+            return False
             
         except Exception as e:
             print(f"ERRO CRITICO ao carregar camada vetorial {self._name}: {e}")
             import traceback
             traceback.print_exc()
             sys.stdout.flush()
+            self.close()
             self._valid = False
             return False
     
+    def _open_sublayer(self) -> bool:
+        """
+        Obtém a camada OGR e lê seus metadados (chamar com o lock do handle).
+        
+        Returns:
+            True se a camada foi obtida com sucesso
+        """
+        # Obtém a camada pedida (ou a primeira)
+        if isinstance(self._sublayer, str):
+            self._layer = self._datasource.GetLayerByName(self._sublayer)
+        else:
+            self._layer = self._datasource.GetLayer(self._sublayer or 0)
+        
+        if self._layer is None:
+            print(f"ERRO: Nao foi possivel obter camada {self._sublayer} do datasource")
+            return False
+        
+        # FlatGeobuf/GeoPackage: a extensão visível é filtrada pelo índice do arquivo
+        self._driver_name = self._datasource.GetDriver().GetName()
+        self._native_index = has_native_spatial_index(self._datasource, self._layer)
+        print(f"Driver: {self._driver_name}, índice espacial nativo: {self._native_index}, "
+              f"streaming: {self._streaming}")
+        
+        print(f"Camada obtida, feature count: {self._layer.GetFeatureCount()}")
+        sys.stdout.flush()
+        
+        # Obtém o CRS
+        try:
+            spatial_ref = self._layer.GetSpatialRef()
+            if spatial_ref:
+                self._crs = spatial_ref.ExportToWkt()
+        except Exception as crs_error:
+            print(f"Aviso: Erro ao obter CRS: {crs_error}")
+            self._crs = None
+        
+        # Obtém a extensão
+        try:
+            extent = self._layer.GetExtent()
+            self._extent = (extent[0], extent[2], extent[1], extent[3])  # minx, miny, maxx, maxy
+            print(f"Extensao: {self._extent}")
+            sys.stdout.flush()
+        except Exception as extent_error:
+            print(f"ERRO: Nao foi possivel obter extensao: {extent_error}")
+            return False
+        
+        # Obtém o tipo de geometria
+        try:
+            layer_defn = self._layer.GetLayerDefn()
+            self._geometry_type = layer_defn.GetGeomType()
+            print(f"Tipo de geometria: {self._geometry_type}")
+        except Exception as geom_error:
+            print(f"Aviso: Erro ao obter tipo de geometria: {geom_error}")
+            self._geometry_type = None
+        
+        # OTIMIZAÇÃO QGIS: NÃO carrega todas as features em memória
+        # Mantém apenas a referência ao datasource
+        # Features serão carregadas sob demanda durante renderização
+        print(f"DEBUG: Layer possui {self._layer.GetFeatureCount()} features (não carregadas em memória)")
+        sys.stdout.flush()
+        
+        self._features = []  # Mantém vazio para compatibilidade
+        self._sidecar = SidecarCache(self._source, self._layer.GetName())
+        self._valid = True
+        
+        print(f"==> Camada vetorial carregada com SUCESSO: {self._name} ({self._layer.GetFeatureCount()} features)")
+        sys.stdout.flush()
+        
+        # IMPORTANTE: Mantém o datasource aberto para acesso sob demanda
+        # O handle volta ao pool apenas em close() (remoção da camada)
+        
+        return True
+    
+    def close(self):
+        """Devolve o datasource ao pool (outras sublayers podem continuar usando)"""
+        self._attributes = None
+        if self._handle is None:
+            return
+        with self._lock:
+            self._layer = None
+            self._datasource = None
+        get_dataset_pool().release(self._handle)
+        self._handle = None
+        self._valid = False
+    
+    @property
+    def sublayer(self):
+        """Retorna o nome/índice da camada OGR dentro do arquivo"""
+        return self._sublayer
+    
     @property
     def features(self) -> List[dict]:
         """
         Retorna features sob demanda (iterador)
-        OTIMIZAÇÃO QGIS: Carrega apenas uma vez e mantém em cache
+        OTIMIZAÇÃO QGIS: Carrega apenas uma vez e mantém no CacheManager global
+        (pode ser despejada e recarregada se o orçamento de memória estourar)
         """
+        cache = get_cache_manager()
+        cache_key = ('features', self._cache_id)
+        
         # Se já foram carregadas, retorna do cache
-        if self._features:
-            return self._features
+        features = cache.get(cache_key)
+        if features is not None:
+            return features
         
-        # Carrega features sob demanda na primeira vez
+        # Carrega features sob demanda
         print(f"[DEBUG] Carregando features da camada {self._name}...")
         sys.stdout.flush()
-        self._features = self._iter_features()
-        print(f"[DEBUG] {len(self._features)} features carregadas")
+        features = self._iter_features()
+        print(f"[DEBUG] {len(features)} features carregadas")
         sys.stdout.flush()
         
-        return self._features
+        # Estimativa: tamanho WKB da geometria + overhead do dict Python
+        nbytes = sum(f['geometry'].WkbSize() + 400 for f in features)
+        cache.put(cache_key, features, nbytes)
+        return features
     
     def _iter_features(self):
         """Itera features sob demanda sem carregar tudo em memória"""
@@ -271,6 +408,352 @@ class VectorLayer(Layer):
         
         return features_list
     
+    @property
+    def streaming(self) -> bool:
+        """Retorna se a camada está em modo streaming (sem cache de geometrias)"""
+        return bool(self._streaming)
+    
+    @property
+    def driver_name(self) -> Optional[str]:
+        """Retorna o nome do driver OGR da fonte (ex: 'ESRI Shapefile', 'FlatGeobuf')"""
+        return self._driver_name
+    
+    @property
+    def has_native_spatial_index(self) -> bool:
+        """Retorna se a fonte filtra por extensão usando seu próprio índice espacial"""
+        return self._native_index
+    
+    @streaming.setter
+    def streaming(self, value: bool):
+        """Define o modo streaming"""
+        self._streaming = value
+    
+    def reads_from_source(self, extent: Tuple[float, float, float, float]) -> bool:
+        """
+        Indica se o render da extensão deve ler as features da fonte
+        (iter_features, que passa a extensão ao índice espacial do formato) em
+        vez das geometrias em memória: sempre em modo streaming e, em fontes
+        com índice nativo (FlatGeobuf, GeoPackage), quando a vista cobre até
+        NATIVE_INDEX_VIEW_FRACTION da extensão da camada.
+        
+        Args:
+            extent: Extensão visível (minx, miny, maxx, maxy)
+            
+        Returns:
+            True para renderizar com iter_features(extent)
+        """
+        if self._streaming:
+            return True
+        if not self._native_index or not self._extent:
+            return False
+        
+        minx, miny, maxx, maxy = self._extent
+        layer_area = (maxx - minx) * (maxy - miny)
+        if layer_area <= 0:
+            return False
+        visible_w = max(0.0, min(maxx, extent[2]) - max(minx, extent[0]))
+        visible_h = max(0.0, min(maxy, extent[3]) - max(miny, extent[1]))
+        return visible_w * visible_h <= NATIVE_INDEX_VIEW_FRACTION * layer_area
+    
+    def iter_features(self, extent: Optional[Tuple[float, float, float, float]] = None,
+                      columns: Optional[List[str]] = None,
+                      where: Optional[str] = None) -> Iterator[dict]:
+        """
+        Itera as features da camada sem mantê-las em memória.
+        
+        O filtro espacial (SetSpatialFilterRect) e o filtro de atributos são
+        aplicados pelo próprio OGR, que usa o índice espacial nativo do formato
+        quando existe (GeoPackage, FlatGeobuf, .qix do shapefile).
+        
+        Args:
+            extent: Extensão (minx, miny, maxx, maxy) ou None para todas
+            columns: Campos a ler (None = todos, [] = nenhum)
+            where: Filtro de atributos em SQL OGR (ex: "cota > 100")
+            
+        Yields:
+            Dicionário {'fid', 'geometry', 'properties'}. A geometria pertence à
+            feature e só é válida até a próxima iteração (use Clone() para reter)
+        """
+        if not self._layer:
+            return
+        
+        # Handle próprio das iterações, emprestado do pool (e contado no seu
+        # limite); devolvido quando o gerador termina ou é fechado
+        pool = get_dataset_pool()
+        handle = pool.acquire(str(self._source), CURSOR)
+        if handle is None:
+            return
+        try:
+            with handle.lock:
+                cursor = self._cursor_layer(handle)
+                if cursor is None:
+                    return
+                reader_key = cursor.GetName()
+                layer_defn = cursor.GetLayerDefn()
+                field_names = [layer_defn.GetFieldDefn(i).GetName()
+                               for i in range(layer_defn.GetFieldCount())]
+            if columns is None:
+                columns = field_names
+            else:
+                columns = [name for name in columns if name in field_names]
+            # Campos ignorados não são decodificados pelo driver
+            ignored = [name for name in field_names if name not in columns]
+            
+            # Cada lote é lido com o lock e entregue sem ele: interromper a
+            # iteração não prende o cursor nem bloqueia outras leituras
+            token = object()
+            consumed = 0
+            while True:
+                with handle.lock:
+                    cursor = self._cursor_layer(handle)
+                    if cursor is None:
+                        return
+                    if handle.readers.get(reader_key) is not token:
+                        # Primeiro lote, ou outra iteração usou o cursor: reaplica
+                        # os filtros e retoma da posição atual
+                        cursor.SetIgnoredFields(ignored)
+                        if extent is not None:
+                            cursor.SetSpatialFilterRect(*extent)
+                        else:
+                            cursor.SetSpatialFilter(None)
+                        cursor.SetAttributeFilter(where or None)
+                        cursor.ResetReading()
+                        if consumed:
+                            cursor.SetNextByIndex(consumed)
+                        handle.readers[reader_key] = token
+                    batch = []
+                    while len(batch) < ITER_FEATURES_BATCH_SIZE:
+                        feature = cursor.GetNextFeature()
+                        if feature is None:
+                            break
+                        batch.append(feature)
+                
+                for feature in batch:
+                    yield {
+                        'fid': feature.GetFID(),
+                        'geometry': feature.GetGeometryRef(),
+                        'properties': {name: feature.GetField(name) for name in columns}
+                    }
+                if len(batch) < ITER_FEATURES_BATCH_SIZE:
+                    return
+                consumed += len(batch)
+        finally:
+            pool.release(handle)
+    
+    def _cursor_layer(self, handle):
+        """
+        Camada OGR da sublayer no handle CURSOR (chamar com handle.lock).
+        
+        O handle CURSOR é separado do handle das camadas: filtros e posição
+        de leitura ficam entre lotes sem interferir nas outras leituras.
+        """
+        if handle.dataset is None:
+            return None
+        if isinstance(self._sublayer, str):
+            return handle.dataset.GetLayerByName(self._sublayer)
+        return handle.dataset.GetLayer(self._sublayer or 0)
+    
+    @property
+    def packed_geometry(self) -> Optional[PackedGeometry]:
+        """
+        Retorna as geometrias da camada em formato colunar (arrays NumPy).
+        Construído em uma única passada e mantido no CacheManager global.
+        """
+        if not self._layer:
+            return None
+        return get_cache_manager().get_or_create(('geometry', self._cache_id),
+                                                 self.build_packed_geometry)
+    
+    def build_packed_geometry(self, progress_callback=None) -> Optional[PackedGeometry]:
+        """
+        Decodifica todas as geometrias da camada para o armazenamento colunar.
+        Com disk_cache ativo, mapeia o cache em disco se estiver atualizado
+        ou o grava após decodificar.
+        
+        Args:
+            progress_callback: Função chamada com (lidas, total) periodicamente
+            
+        Returns:
+            PackedGeometry ou None se a camada não estiver carregada
+        """
+        if not self._layer:
+            return None
+        
+        sidecar = self.sidecar_cache
+        if sidecar is not None:
+            packed = sidecar.load_geometry()
+            if packed is not None:
+                print(f"[DEBUG] {len(packed)} geometrias mapeadas do cache em disco")
+                sys.stdout.flush()
+                return packed
+        
+        packed = None
+        with self._lock:
+            total = self._layer.GetFeatureCount()
+        if self._parallel_threshold and total >= self._parallel_threshold and os.path.isfile(self._source):
+            # Os workers abrem seus próprios handles: o lock não é necessário
+            packed = decode_parallel(self._source, self._sublayer, total,
+                                     progress_callback=progress_callback)
+        
+        if packed is None:
+            with self._lock:
+                packed = PackedGeometry.from_ogr_layer(self._layer, progress_callback=progress_callback)
+        
+        print(f"[DEBUG] {len(packed)} geometrias empacotadas ({packed.nbytes / 1e6:.1f} MB)")
+        sys.stdout.flush()
+        
+        if sidecar is not None:
+            sidecar.save_geometry(packed)
+        return packed
+    
+    @property
+    def parallel_threshold(self) -> int:
+        """Retorna o número de features a partir do qual a decodificação usa vários processos"""
+        return self._parallel_threshold
+    
+    @parallel_threshold.setter
+    def parallel_threshold(self, value: int):
+        """Define o limiar da decodificação paralela (0 = sempre no próprio processo)"""
+        self._parallel_threshold = int(value or 0)
+    
+    @property
+    def disk_cache(self) -> bool:
+        """Retorna se o cache de geometrias em disco está ativo"""
+        return self._disk_cache
+    
+    @disk_cache.setter
+    def disk_cache(self, value: bool):
+        """Ativa/desativa o cache de geometrias em disco"""
+        self._disk_cache = value
+    
+    @property
+    def sidecar_cache(self) -> Optional[SidecarCache]:
+        """Retorna o cache em disco da camada (None se desativado ou não carregada)"""
+        if not self._disk_cache or not self._layer:
+            return None
+        return self._sidecar
+    
+    def prepare(self, progress_callback=None):
+        """
+        Decodifica as geometrias e constrói o índice espacial antecipadamente,
+        para que o primeiro render não pague esse custo na thread da GUI.
+        
+        Args:
+            progress_callback: Função chamada com (lidas, total) durante a decodificação
+        """
+        if self._streaming or not self._layer:
+            return
+        
+        cache = get_cache_manager()
+        if cache.peek(('geometry', self._cache_id)) is None:
+            packed = self.build_packed_geometry(progress_callback)
+            cache.put(('geometry', self._cache_id), packed)
+        self.spatial_index
+    
+    def geometry_for_scale(self, scale: float) -> Optional[PackedGeometry]:
+        """
+        Retorna as geometrias generalizadas para a escala de renderização.
+        Os níveis (tolerância 2^k) são construídos sob demanda e mantidos em cache;
+        índices e FIDs são os mesmos de packed_geometry.
+        
+        Args:
+            scale: Pixels por unidade do mapa (RenderContext.scale_x)
+            
+        Returns:
+            PackedGeometry simplificado ou None se a camada não estiver carregada
+        """
+        packed = self.packed_geometry
+        if packed is None:
+            return None
+        pyramid = GeneralizationPyramid(packed, get_cache_manager(),
+                                        ('generalization', self._cache_id))
+        return pyramid.get(scale)
+    
+    @property
+    def feature_bounds(self) -> Optional[np.ndarray]:
+        """Retorna o array (n, 4) com o retângulo envolvente de cada feature"""
+        cache = get_cache_manager()
+        bounds = cache.get(('bounds', self._cache_id))
+        if bounds is None:
+            packed = self.packed_geometry
+            if packed is None:
+                return None
+            sidecar = self.sidecar_cache
+            if sidecar is not None:
+                bounds = sidecar.load_array('bounds')
+            if bounds is None or len(bounds) != len(packed):
+                bounds = compute_feature_bounds(packed)
+                if sidecar is not None:
+                    sidecar.save_array('bounds', bounds)
+            cache.put(('bounds', self._cache_id), bounds)
+        return bounds
+    
+    @property
+    def spatial_index(self) -> Optional[STRTree]:
+        """Retorna o índice espacial STR (construído em lote na primeira chamada)"""
+        cache = get_cache_manager()
+        index = cache.get(('index', self._cache_id))
+        if index is None:
+            bounds = self.feature_bounds
+            if bounds is None:
+                return None
+            index = STRTree(bounds)
+            cache.put(('index', self._cache_id), index)
+            print(f"[DEBUG] Índice espacial construído: {len(index)} features, "
+                  f"{index.depth} níveis")
+            sys.stdout.flush()
+        return index
+    
+    def query_bbox(self, extent: Tuple[float, float, float, float]) -> np.ndarray:
+        """
+        Retorna os índices das features que intersectam a extensão.
+        
+        Args:
+            extent: Extensão (minx, miny, maxx, maxy)
+            
+        Returns:
+            Array de índices (posições em packed_geometry) em ordem crescente
+        """
+        index = self.spatial_index
+        if index is None:
+            return np.empty(0, dtype=np.int64)
+        return index.query(extent)
+    
+    @property
+    def attributes(self) -> Optional[AttributeTable]:
+        """
+        Retorna a tabela de atributos colunar da camada.
+        As linhas estão na mesma ordem de packed_geometry, então os índices
+        de query_bbox() e AttributeTable.filter() são intercambiáveis.
+        """
+        if not self._layer:
+            return None
+        if self._attributes is None:
+            self._attributes = AttributeTable(self._layer, self._lock, get_cache_manager(),
+                                              ('attributes', self._cache_id),
+                                              fid_source=self._cached_fids)
+        return self._attributes
+    
+    def _cached_fids(self) -> Optional[np.ndarray]:
+        """FIDs das geometrias já decodificadas (None se não estão em memória)"""
+        packed = get_cache_manager().peek(('geometry', self._cache_id))
+        return packed.fids if packed is not None else None
+    
+    def get_attributes(self, index: int) -> dict:
+        """
+        Retorna os atributos de uma feature (ex: para identificar no mapa).
+        
+        Args:
+            index: Posição da feature (índice retornado por query_bbox)
+            
+        Returns:
+            Dicionário {campo: valor} com a chave extra 'fid'
+        """
+        table = self.attributes
+        if table is None:
+            return {}
+        return table.row(index)
+    
     @property
     def geometry_type(self) -> Optional[int]:
         """Retorna o tipo de geometria OGR"""
@@ -289,20 +772,45 @@ class RasterLayer(Layer):
     Similar à QgsRasterLayer do QGIS.
     """
     
-    def __init__(self, name: str, source: str):
+    def __init__(self, name: str, source: str, disk_cache: bool = False,
+                 target_crs: Optional[str] = None):
         """
         Inicializa uma camada raster.
         
         Args:
             name: Nome da camada
             source: Caminho para o arquivo raster
+            disk_cache: Se True, salva as estatísticas das bandas em
+                        `<fonte>.mapcache/` e as reutiliza na próxima abertura
+            target_crs: CRS do mapa; se diferente do CRS do raster, ele é
+                        reprojetado sob demanda (None = sem reprojeção)
         """
         super().__init__(name, source)
+        self._disk_cache = disk_cache
+        self._target_crs = target_crs
+        self._source_crs = None
+        self._warped_path: Optional[str] = None
+        self._mapped: Dict[int, Optional[np.ndarray]] = {}
+        self._statistics = {}
+        self._color_ramp: Optional[ColorRamp] = None
+        # Composição RGB escolhida pelo usuário (None = detectada pela
+        # interpretação de cor das bandas; () = banda única com rampa)
+        self._rgb_bands: Optional[Tuple[int, int, int]] = None
+        self._detected_rgb: Tuple[int, ...] = ()
+        self._alpha_band = 0
+        self._terrain_product: Optional[str] = None
+        self._terrain_params = {}
+        self._terrain_engine: Optional[TerrainEngine] = None
+        self._handle = None
         self._dataset = None
+        # Substituído pelo lock do handle do pool em load()
+        self._lock = threading.RLock()
         self._bands = []
         self._width = 0
         self._height = 0
         self._geotransform = None
+        self._blocks: Optional[BlockReader] = None
+        self._sidecar: Optional[SidecarCache] = None
         
     def get_type(self) -> LayerType:
         """Retorna o tipo da camada"""
@@ -316,12 +824,112 @@ class RasterLayer(Layer):
             True se carregado com sucesso, False caso contrário
         """
         try:
-            # Abre o dataset
-            self._dataset = gdal.Open(self._source, gdal.GA_ReadOnly)
-            if self._dataset is None:
+            # Abre o dataset pelo pool (compartilhado entre camadas do mesmo arquivo)
+            self.close()
+            self._handle = get_dataset_pool().acquire(self._source, RASTER)
+            if self._handle is None:
                 print(f"Erro ao abrir raster: {self._source}")
                 return False
+            self._dataset = self._handle.dataset
+            self._lock = self._handle.lock
+            self._statistics = {}
+            self._mapped = {}
+            self._sidecar = SidecarCache(self._source, 'raster')
+            
+            with self._lock:
+                self._source_crs = self._dataset.GetProjection() or None
+                if needs_reprojection(self._source_crs, self._target_crs):
+                    self._open_warped()
+                # Blocos ausentes são lidos em paralelo, um handle por thread
+                self._blocks = ParallelBlockReader(self._cache_id, self.dataset_path, self._lock)
+                if self._read_metadata():
+                    return True
+            self.close()
+            return False
             
+        except Exception as e:
+            print(f"Erro ao carregar camada raster {self._name}: {e}")
+            self.close()
+            self._valid = False
+            return False
+    
+    def close(self):
+        """
+        Devolve o dataset ao pool, descarta os blocos em cache e fecha os
+        handles abertos pelas threads do pool raster (LayerManager.remove_layer)
+        """
+        if self._terrain_engine is not None:
+            self._terrain_engine.close()
+            self._terrain_engine = None
+        if self._blocks is not None:
+            self._blocks.close()
+            self._blocks.invalidate()
+            self._blocks = None
+        self._mapped = {}
+        if self._handle is None:
+            return
+        # Sem leitor de blocos ou motor de terreno, ainda pode haver handles
+        # abertos por thread_dataset (ex: a camada foi reprojetada no meio)
+        release_thread_datasets(self.dataset_path)
+        with self._lock:
+            self._dataset = None
+            if self._warped_path is not None:
+                remove_warped_vrt(self._warped_path)
+                self._warped_path = None
+        get_dataset_pool().release(self._handle)
+        self._handle = None
+        self._valid = False
+    
+    def _open_warped(self):
+        """Troca o dataset por um VRT reprojetado para target_crs (chamar com o lock)"""
+        vrt_path = new_vrt_path()
+        warped = create_warped_vrt(self._handle.dataset, self._target_crs, vrt_path)
+        if warped is None:
+            print(f"Aviso: {self._name} será exibido sem reprojeção")
+            return
+        self._dataset = warped
+        self._warped_path = vrt_path
+        print(f"[DEBUG] Raster {self._name} reprojetado sob demanda ({warped.RasterXSize}x{warped.RasterYSize})")
+    
+    @property
+    def target_crs(self) -> Optional[str]:
+        """Retorna o CRS de exibição (None = CRS do próprio raster)"""
+        return self._target_crs
+    
+    def set_target_crs(self, crs: Optional[str]) -> bool:
+        """
+        Define o CRS de exibição e reabre a camada (reprojetando se necessário).
+        
+        Args:
+            crs: CRS do mapa (WKT, 'EPSG:xxxx', ...) ou None
+            
+        Returns:
+            True se a camada foi reaberta com sucesso
+        """
+        self._target_crs = crs
+        return self.load()
+    
+    @property
+    def source_crs(self) -> Optional[str]:
+        """Retorna o CRS original do arquivo"""
+        return self._source_crs
+    
+    @property
+    def is_reprojected(self) -> bool:
+        """Retorna se a camada é exibida através de um VRT reprojetado"""
+        return self._warped_path is not None
+    
+    @property
+    def dataset_path(self) -> str:
+        """
+        Caminho que outras threads podem abrir para ler os mesmos pixels
+        exibidos (o VRT reprojetado, se houver, ou o arquivo de origem).
+        """
+        return self._warped_path or self._source
+    
+    def _read_metadata(self) -> bool:
+        """Lê dimensões, CRS, extensão e bandas (chamar com o lock do handle)"""
+        try:
             # Obtém informações do raster
             self._width = self._dataset.RasterXSize
             self._height = self._dataset.RasterYSize
@@ -350,7 +958,9 @@ class RasterLayer(Layer):
                     'nodata': band.GetNoDataValue(),
                     'min': band.GetMinimum(),
                     'max': band.GetMaximum(),
+                    'color_interp': band.GetColorInterpretation(),
                 })
+            self._detect_composite()
             
             self._valid = True
             print(f"Camada raster carregada: {self._name} ({self._width}x{self._height}, {len(self._bands)} bandas)")
@@ -361,6 +971,99 @@ class RasterLayer(Layer):
             self._valid = False
             return False
     
+    def _detect_composite(self):
+        """Detecta bandas vermelho/verde/azul/alfa pela interpretação de cor"""
+        roles = {gdal.GCI_RedBand: 'red', gdal.GCI_GreenBand: 'green',
+                 gdal.GCI_BlueBand: 'blue', gdal.GCI_AlphaBand: 'alpha'}
+        found = {}
+        for band in self._bands:
+            role = roles.get(band['color_interp'])
+            if role and role not in found:
+                found[role] = band['index']
+        
+        if all(role in found for role in ('red', 'green', 'blue')):
+            self._detected_rgb = (found['red'], found['green'], found['blue'])
+        else:
+            self._detected_rgb = ()
+        self._alpha_band = found.get('alpha', 0)
+    
+    @property
+    def rgb_bands(self) -> Tuple[int, ...]:
+        """Retorna as bandas (vermelho, verde, azul) da composição ou () se banda única"""
+        if self._rgb_bands is not None:
+            return self._rgb_bands
+        return self._detected_rgb
+    
+    @rgb_bands.setter
+    def rgb_bands(self, bands):
+        """
+        Define a composição RGB: três índices de banda (1-based), () para
+        banda única com rampa de cores ou None para a detecção automática.
+        """
+        if bands:
+            bands = tuple(int(band) for band in bands)
+            if len(bands) != 3 or not all(1 <= band <= len(self._bands) for band in bands):
+                print(f"Aviso: Composição RGB inválida para {self._name}: {bands}")
+                return
+        self._rgb_bands = bands if bands is None else tuple(bands)
+    
+    @property
+    def terrain_product(self) -> Optional[str]:
+        """Retorna o produto de terreno exibido (None = valores da banda)"""
+        return self._terrain_product
+    
+    @property
+    def terrain_params(self) -> dict:
+        """Retorna os parâmetros do produto de terreno (z_factor, percent, ...)"""
+        return dict(self._terrain_params)
+    
+    def set_terrain_product(self, product: Optional[str], **params):
+        """
+        Exibe um produto de terreno calculado sob demanda a partir da banda 1.
+        
+        Args:
+            product: 'hillshade', 'slope', 'aspect' ou None para desativar
+            **params: z_factor, azimuth, altitude, percent (ver terrain)
+        """
+        if product is not None and product not in TERRAIN_PRODUCTS:
+            print(f"Aviso: Produto de terreno desconhecido: {product}")
+            return
+        self._terrain_product = product
+        self._terrain_params = dict(params)
+    
+    def copy_display_settings(self, other: 'RasterLayer'):
+        """
+        Copia a rampa de cores, a composição RGB e o produto de terreno de
+        outra camada (ex: o mesmo raster reaberto após gerar overviews).
+        Deve ser chamado depois de load().
+        
+        Args:
+            other: Camada de origem
+        """
+        self.color_ramp = other.color_ramp
+        self.rgb_bands = other._rgb_bands
+        self.set_terrain_product(other.terrain_product, **other.terrain_params)
+    
+    @property
+    def terrain_engine(self) -> TerrainEngine:
+        """Motor de terreno da camada (blocos no cache de blocos raster)"""
+        if self._terrain_engine is None:
+            self._terrain_engine = TerrainEngine(self.dataset_path, owner=self._cache_id)
+        return self._terrain_engine
+    
+    def _terrain_scale(self) -> float:
+        """Unidades horizontais por unidade de elevação (MDT em graus: metros por grau)"""
+        if self._crs:
+            srs = osr.SpatialReference()
+            if srs.ImportFromWkt(self._crs) == 0 and srs.IsGeographic():
+                return 111120.0
+        return 1.0
+    
+    @property
+    def alpha_band(self) -> int:
+        """Retorna o índice da banda alfa (0 se não houver)"""
+        return self._alpha_band
+    
     @property
     def width(self) -> int:
         """Retorna a largura do raster em pixels"""
@@ -376,6 +1079,88 @@ class RasterLayer(Layer):
         """Retorna o número de bandas"""
         return len(self._bands)
     
+    @property
+    def overview_count(self) -> int:
+        """Retorna o número de overviews da primeira banda"""
+        if self._dataset is None or not self._bands:
+            return 0
+        with self._lock:
+            return self._dataset.GetRasterBand(1).GetOverviewCount()
+    
+    def needs_overviews(self, min_size: int = OVERVIEW_MIN_RASTER_SIZE) -> bool:
+        """
+        Indica se o raster é grande e não tem overviews (vistas afastadas
+        teriam de ler a resolução nativa).
+        
+        Args:
+            min_size: Tamanho (maior lado, em pixels) a partir do qual sugerir
+            
+        Returns:
+            True se vale a pena chamar build_overviews()
+        """
+        return max(self._width, self._height) > min_size and self.overview_count == 0
+    
+    def build_overviews(self, levels: Optional[List[int]] = None,
+                        resampling: str = 'AVERAGE', external: bool = True,
+                        progress_callback=None, cancel_event=None) -> bool:
+        """
+        Gera overviews para o arquivo (bloqueante; ver LayerLoader.build_overviews
+        para executar em segundo plano).
+        
+        O dataset é retirado do pool; chame load() depois para passar a usar
+        as overviews.
+        
+        Args:
+            levels: Fatores de redução (None = potências de 2 até ~256 px)
+            resampling: Método de reamostragem do GDAL (ex: 'AVERAGE', 'NEAREST')
+            external: True grava um .ovr externo; False grava no próprio arquivo
+            progress_callback: Função chamada com (percentual, 100)
+            cancel_event: threading.Event que cancela a construção
+            
+        Returns:
+            True se as overviews foram geradas
+        """
+        if not self._valid:
+            return False
+        
+        levels = levels or default_overview_levels(self._width, self._height)
+        if not build_overviews(self._source, levels, resampling, external,
+                               progress_callback, cancel_event):
+            return False
+        
+        # Handles já abertos não enxergam as overviews novas
+        get_dataset_pool().discard(self._source, RASTER)
+        release_thread_datasets(self._source)
+        if self._warped_path:
+            release_thread_datasets(self._warped_path)
+        return True
+    
+    def mapped_band(self, band_index: int = 1) -> Optional[np.ndarray]:
+        """
+        Retorna a banda mapeada em memória, se o arquivo não tiver compressão
+        e a banda estiver contígua (GeoTIFF em faixas, ENVI, EHdr, ...).
+        
+        Args:
+            band_index: Índice da banda (1-based)
+            
+        Returns:
+            Array 2D somente leitura (válido enquanto a camada estiver
+            carregada) ou None se a banda não puder ser mapeada
+        """
+        if band_index in self._mapped:
+            return self._mapped[band_index]
+        if self._handle is None or self._warped_path is not None:
+            return None
+        if not 1 <= band_index <= self._handle.dataset.RasterCount:
+            return None
+        
+        with self._lock:
+            mapped = map_band(self._handle.dataset, band_index)
+        if mapped is not None:
+            print(f"[DEBUG] Banda {band_index} de {self._name} mapeada em memória")
+        self._mapped[band_index] = mapped
+        return mapped
+    
     def read_band(self, band_index: int = 1) -> Optional[np.ndarray]:
         """
         Lê os dados de uma banda.
@@ -384,20 +1169,389 @@ class RasterLayer(Layer):
             band_index: Índice da banda (1-based)
             
         Returns:
-            Array numpy com os dados da banda ou None se erro
+            Array numpy somente leitura (a própria banda mapeada em memória,
+            ou uma cópia mantida no CacheManager) ou None se erro
         """
         try:
             if self._dataset is None:
                 return None
             
-            band = self._dataset.GetRasterBand(band_index)
-            data = band.ReadAsArray()
+            mapped = self.mapped_band(band_index)
+            if mapped is not None:
+                return mapped
+            
+            cache = get_cache_manager()
+            cache_key = ('raster_band', self._cache_id, band_index)
+            data = cache.get(cache_key)
+            if data is not None:
+                return data
+            
+            with self._lock:
+                band = self._dataset.GetRasterBand(band_index)
+                data = band.ReadAsArray()
+            if data is not None:
+                # Compartilhado entre renderizações: protege contra escrita
+                data.flags.writeable = False
+                cache.put(cache_key, data)
             return data
             
         except Exception as e:
             print(f"Erro ao ler banda {band_index}: {e}")
             return None
     
+    def sample(self, xs, ys, method: str = 'bilinear', band_index: int = 1) -> Optional[np.ndarray]:
+        """
+        Amostra a banda em um conjunto de pontos (ex: cota de pontos de levantamento).
+        
+        Args:
+            xs, ys: Coordenadas dos pontos no CRS da camada
+            method: 'nearest', 'bilinear' ou 'cubic'
+            band_index: Índice da banda (1-based)
+            
+        Returns:
+            Array float64 (NaN fora do raster ou em nodata) ou None se erro
+        """
+        if self._dataset is None or not 1 <= band_index <= len(self._bands):
+            return None
+        try:
+            with self._lock:
+                band = self._dataset.GetRasterBand(band_index)
+                return sample_band(band, self._geotransform, xs, ys, method,
+                                   self._bands[band_index - 1]['nodata'])
+        except Exception as e:
+            print(f"Erro ao amostrar {self._name}: {e}")
+            return None
+    
+    def block_cache_stats(self) -> dict:
+        """
+        Retorna as estatísticas do cache de blocos desta camada.
+        
+        Returns:
+            Dicionário com hits, misses e hit_rate
+        """
+        if self._blocks is None:
+            return {'hits': 0, 'misses': 0, 'hit_rate': 0.0}
+        return self._blocks.stats()
+    
+    @property
+    def disk_cache(self) -> bool:
+        """Retorna se o cache de estatísticas em disco está ativo"""
+        return self._disk_cache
+    
+    @disk_cache.setter
+    def disk_cache(self, value: bool):
+        """Ativa/desativa o cache de estatísticas em disco"""
+        self._disk_cache = value
+    
+    @property
+    def color_ramp(self) -> Optional[ColorRamp]:
+        """Retorna a rampa de cores da banda 1 (None = tons de cinza)"""
+        return self._color_ramp
+    
+    @color_ramp.setter
+    def color_ramp(self, ramp):
+        """Define a rampa de cores (ColorRamp, nome de rampa ou None)"""
+        if isinstance(ramp, str):
+            named = get_color_ramp(ramp)
+            if named is None:
+                print(f"Aviso: Rampa de cores desconhecida: {ramp}")
+                return
+            ramp = named
+        self._color_ramp = ramp
+    
+    @property
+    def sidecar_cache(self) -> Optional[SidecarCache]:
+        """Retorna o cache em disco da camada (None se desativado ou não carregada)"""
+        if not self._disk_cache:
+            return None
+        return self._sidecar
+    
+    def prepare(self, progress_callback=None):
+        """
+        Calcula (ou lê do cache em disco) as estatísticas da primeira banda,
+        para que o primeiro render já tenha o realce de contraste.
+        
+        Args:
+            progress_callback: Não utilizado (cálculo sobre amostra)
+        """
+        if self._bands:
+            self.band_statistics(1)
+    
+    def band_statistics(self, band_index: int = 1) -> Optional[BandStatistics]:
+        """
+        Retorna as estatísticas da banda (nodata excluído), calculadas uma vez
+        sobre uma overview ou amostra e mantidas em memória e no cache em disco.
+        
+        Args:
+            band_index: Índice da banda (1-based)
+            
+        Returns:
+            BandStatistics ou None se não puderem ser calculadas
+        """
+        if band_index in self._statistics:
+            return self._statistics[band_index]
+        if self._dataset is None or not 1 <= band_index <= len(self._bands):
+            return None
+        
+        key = f'band_{band_index}_stats'
+        sidecar = self.sidecar_cache
+        stats = None
+        if sidecar is not None:
+            saved = sidecar.load_metadata(key)
+            if saved is not None:
+                try:
+                    stats = BandStatistics.from_dict(saved)
+                except TypeError:
+                    stats = None
+        
+        mapped = self.mapped_band(band_index) if stats is None else None
+        if mapped is not None:
+            data, approximate = sample_array(mapped)
+            stats = compute_statistics(data, self._bands[band_index - 1]['nodata'], approximate)
+            if stats is not None and sidecar is not None:
+                sidecar.save_metadata(key, stats.to_dict())
+        
+        if stats is None:
+            try:
+                with self._lock:
+                    # Estatísticas do arquivo original (o VRT reprojetado tem bordas vazias)
+                    source = self._handle.dataset if self._handle is not None else self._dataset
+                    if band_index > source.RasterCount:
+                        return None
+                    band = source.GetRasterBand(band_index)
+                    stats = compute_band_statistics(band, self._bands[band_index - 1]['nodata'])
+            except Exception as e:
+                print(f"Erro ao calcular estatísticas da banda {band_index}: {e}")
+                return None
+            if stats is not None and sidecar is not None:
+                sidecar.save_metadata(key, stats.to_dict())
+        
+        if stats is not None:
+            print(f"[DEBUG] Estatísticas de {self._name} banda {band_index}: "
+                  f"{stats.minimum:.3g}..{stats.maximum:.3g} (2-98%: {stats.p2:.3g}..{stats.p98:.3g})")
+        self._statistics[band_index] = stats
+        return stats
+    
+    def display_range(self, band_index: int = 1) -> Optional[Tuple[float, float]]:
+        """
+        Retorna o intervalo (mínimo, máximo) usado no realce de contraste.
+        Estável entre renderizações (não depende da janela visível).
+        
+        Args:
+            band_index: Índice da banda (1-based)
+            
+        Returns:
+            Percentis 2-98% das estatísticas da banda, ou mínimo/máximo dos
+            metadados, ou None se desconhecido
+        """
+        if not 1 <= band_index <= len(self._bands):
+            return None
+        stats = self.band_statistics(band_index)
+        if stats is not None:
+            return stats.stretch_range
+        band = self._bands[band_index - 1]
+        if band['min'] is None or band['max'] is None:
+            return None
+        return band['min'], band['max']
+    
+    def read_window(self, extent: Tuple[float, float, float, float],
+                    width: int, height: int,
+                    band_index: int = 1) -> Optional[RasterWindow]:
+        """
+        Lê apenas a parte do raster visível na extensão, na resolução da tela.
+        
+        A janela de pixels é ajustada à grade do raster e lida da overview
+        mais grosseira que ainda cobre a resolução do canvas, montada a partir
+        dos blocos em cache (ver raster_blocks). Se nem a overview chega perto
+        da resolução da tela (ex: raster sem overviews visto de longe), a
+        janela é lida decimada para o tamanho do canvas, sem passar pelos
+        blocos. Bandas mapeadas em memória (mapped_band) são amostradas por
+        uma view com passo, sem cópia. O renderizador escala os dados para
+        canvas_rect.
+        
+        Args:
+            extent: Extensão visível (minx, miny, maxx, maxy)
+            width: Largura do canvas em pixels
+            height: Altura do canvas em pixels
+            band_index: Índice da banda (1-based)
+            
+        Returns:
+            RasterWindow ou None se o raster não intersecta a extensão
+        """
+        try:
+            placement = self._level_window(extent, width, height, band_index)
+            if placement is None:
+                return None
+            
+            (level, level_band, (lx0, ly0, lx1, ly1), canvas_rect, pixel_window,
+             (buf_xsize, buf_ysize)) = placement
+            mapped = self.mapped_band(band_index) if level == 0 else None
+            if mapped is not None:
+                # View com passo da resolução da tela (sem cópia em resolução cheia)
+                step_x = max(1, (lx1 - lx0) // buf_xsize)
+                step_y = max(1, (ly1 - ly0) // buf_ysize)
+                data = mapped[ly0:ly1:step_y, lx0:lx1:step_x]
+                if step_x > 1 or step_y > 1:
+                    # Cada amostra cobre step pixels; a última pode passar de lx1/ly1
+                    canvas_x, canvas_y, canvas_w, canvas_h = canvas_rect
+                    canvas_rect = (canvas_x, canvas_y,
+                                   canvas_w * data.shape[1] * step_x / (lx1 - lx0),
+                                   canvas_h * data.shape[0] * step_y / (ly1 - ly0))
+            elif (lx1 - lx0 > BLOCK_READ_MAX_DOWNSAMPLE * buf_xsize or
+                  ly1 - ly0 > BLOCK_READ_MAX_DOWNSAMPLE * buf_ysize):
+                # Blocos em resolução cheia seriam muito maiores que a tela
+                with self._lock:
+                    data = level_band.ReadAsArray(lx0, ly0, lx1 - lx0, ly1 - ly0,
+                                                  buf_xsize=buf_xsize, buf_ysize=buf_ysize)
+            else:
+                data = self._blocks.read(level_band, band_index, level,
+                                         lx0, ly0, lx1 - lx0, ly1 - ly0)
+            if data is None:
+                return None
+            return RasterWindow(data, canvas_rect, pixel_window,
+                                self._bands[band_index - 1]['nodata'])
+        
+        except Exception as e:
+            print(f"Erro ao ler janela do raster {self._name}: {e}")
+            return None
+    
+    def read_terrain_window(self, extent: Tuple[float, float, float, float],
+                            width: int, height: int) -> Optional[RasterWindow]:
+        """
+        Calcula o produto de terreno (terrain_product) da banda 1 para a
+        janela visível, no mesmo nível de overview que read_window usaria.
+        Os blocos calculados ficam no cache de blocos raster; se o nível ainda
+        é muito mais fino que a tela, o produto é calculado sobre uma leitura
+        decimada do tamanho do canvas.
+        
+        Args:
+            extent: Extensão visível (minx, miny, maxx, maxy)
+            width: Largura do canvas em pixels
+            height: Altura do canvas em pixels
+            
+        Returns:
+            RasterWindow float32 (NaN = sem dado) ou None
+        """
+        if not self._terrain_product:
+            return None
+        try:
+            placement = self._level_window(extent, width, height, 1)
+            if placement is None:
+                return None
+            
+            (level, _, (lx0, ly0, lx1, ly1), canvas_rect, pixel_window,
+             (buf_xsize, buf_ysize)) = placement
+            if (lx1 - lx0 > BLOCK_READ_MAX_DOWNSAMPLE * buf_xsize or
+                    ly1 - ly0 > BLOCK_READ_MAX_DOWNSAMPLE * buf_ysize):
+                data = self.terrain_engine.compute_decimated(
+                    self._terrain_product, lx0, ly0, lx1 - lx0, ly1 - ly0,
+                    buf_xsize, buf_ysize, level, self._terrain_scale(), **self._terrain_params)
+            else:
+                data = self.terrain_engine.read_window(
+                    self._terrain_product, lx0, ly0, lx1 - lx0, ly1 - ly0, level,
+                    self._terrain_scale(), **self._terrain_params)
+            if data is None:
+                return None
+            return RasterWindow(data, canvas_rect, pixel_window, None)
+        
+        except Exception as e:
+            print(f"Erro ao calcular {self._terrain_product} de {self._name}: {e}")
+            return None
+    
+    def _level_window(self, extent: Tuple[float, float, float, float],
+                      width: int, height: int, band_index: int):
+        """
+        Escolhe o nível de overview para o canvas e calcula a janela nele.
+        
+        Returns:
+            Tupla (nível, banda do nível, (x0, y0, x1, y1) no nível,
+            (x, y, w, h) no canvas, janela nativa, (largura, altura) da janela
+            do nível na resolução da tela) ou None se fora da extensão
+        """
+        placement = self.window_for_extent(extent, width, height)
+        if placement is None:
+            return None
+        
+        (xoff, yoff, xsize, ysize), canvas_rect, (buf_xsize, buf_ysize) = placement
+        with self._lock:
+            band = self._dataset.GetRasterBand(band_index)
+            level = choose_overview_level(band, min(xsize / buf_xsize, ysize / buf_ysize))
+            level_band = overview_band(band, level)
+            level_width, level_height = level_band.XSize, level_band.YSize
+        
+        # Janela no nível escolhido, ajustada à sua grade
+        fx = self._width / level_width
+        fy = self._height / level_height
+        lx0, ly0 = math.floor(xoff / fx), math.floor(yoff / fy)
+        lx1 = min(level_width, math.ceil((xoff + xsize) / fx))
+        ly1 = min(level_height, math.ceil((yoff + ysize) / fy))
+        
+        # Posição no canvas da janela do nível (pode exceder levemente a nativa)
+        canvas_x, canvas_y, canvas_w, canvas_h = canvas_rect
+        scale_x, scale_y = canvas_w / xsize, canvas_h / ysize
+        canvas_rect = (canvas_x + (lx0 * fx - xoff) * scale_x,
+                       canvas_y + (ly0 * fy - yoff) * scale_y,
+                       (lx1 - lx0) * fx * scale_x,
+                       (ly1 - ly0) * fy * scale_y)
+        screen_size = (max(1, min(lx1 - lx0, math.ceil(canvas_rect[2]))),
+                       max(1, min(ly1 - ly0, math.ceil(canvas_rect[3]))))
+        return (level, level_band, (lx0, ly0, lx1, ly1), canvas_rect,
+                (xoff, yoff, xsize, ysize), screen_size)
+    
+    def window_for_extent(self, extent: Tuple[float, float, float, float],
+                          width: int, height: int):
+        """
+        Calcula a janela de pixels do raster correspondente a uma extensão.
+        
+        Args:
+            extent: Extensão visível (minx, miny, maxx, maxy)
+            width: Largura do canvas em pixels
+            height: Altura do canvas em pixels
+            
+        Returns:
+            Tupla ((xoff, yoff, xsize, ysize), (x, y, w, h) no canvas,
+            (buf_xsize, buf_ysize)) ou None se não houver interseção
+        """
+        if self._dataset is None or not self._geotransform:
+            return None
+        
+        x0, dx, rot_x, y0, rot_y, dy = self._geotransform
+        if rot_x or rot_y:
+            print(f"Aviso: Raster {self._name} rotacionado; a rotação é ignorada na leitura por janela")
+        
+        minx, miny, maxx, maxy = extent
+        if maxx <= minx or maxy <= miny:
+            return None
+        
+        # Coordenadas de pixel (fracionárias) dos cantos da extensão
+        col_a, col_b = (minx - x0) / dx, (maxx - x0) / dx
+        row_a, row_b = (maxy - y0) / dy, (miny - y0) / dy
+        col_start = max(0, math.floor(min(col_a, col_b)))
+        col_end = min(self._width, math.ceil(max(col_a, col_b)))
+        row_start = max(0, math.floor(min(row_a, row_b)))
+        row_end = min(self._height, math.ceil(max(row_a, row_b)))
+        if col_end <= col_start or row_end <= row_start:
+            return None
+        
+        # Extensão da janela ajustada à grade do raster
+        wx_a, wx_b = x0 + col_start * dx, x0 + col_end * dx
+        wy_a, wy_b = y0 + row_start * dy, y0 + row_end * dy
+        scale_x = width / (maxx - minx)
+        scale_y = height / (maxy - miny)
+        canvas_x = (min(wx_a, wx_b) - minx) * scale_x
+        canvas_y = (maxy - max(wy_a, wy_b)) * scale_y
+        canvas_w = abs(wx_b - wx_a) * scale_x
+        canvas_h = abs(wy_b - wy_a) * scale_y
+        
+        xsize = col_end - col_start
+        ysize = row_end - row_start
+        buf_xsize = max(1, min(xsize, math.ceil(canvas_w)))
+        buf_ysize = max(1, min(ysize, math.ceil(canvas_h)))
+        
+        return ((col_start, row_start, xsize, ysize),
+                (canvas_x, canvas_y, canvas_w, canvas_h),
+                (buf_xsize, buf_ysize))
+    
     def read_region(self, xoff: int, yoff: int, xsize: int, ysize: int, 
                     band_index: int = 1) -> Optional[np.ndarray]:
         """
@@ -411,15 +1565,26 @@ class RasterLayer(Layer):
             band_index: Índice da banda (1-based)
             
         Returns:
-            Array numpy com os dados da região ou None se erro
+            Array numpy com os dados da região (view somente leitura da banda
+            mapeada em memória, ou montado a partir dos blocos em cache) ou
+            None se erro
         """
         try:
             if self._dataset is None:
                 return None
             
-            band = self._dataset.GetRasterBand(band_index)
-            data = band.ReadAsArray(xoff, yoff, xsize, ysize)
-            return data
+            mapped = self.mapped_band(band_index)
+            if mapped is not None:
+                # Mesmo recorte aos limites do raster que o leitor de blocos
+                x0, y0 = max(0, xoff), max(0, yoff)
+                x1, y1 = min(self._width, xoff + xsize), min(self._height, yoff + ysize)
+                if x1 <= x0 or y1 <= y0:
+                    return None
+                return mapped[y0:y1, x0:x1]
+            
+            with self._lock:
+                band = self._dataset.GetRasterBand(band_index)
+            return self._blocks.read(band, band_index, 0, xoff, yoff, xsize, ysize)
             
         except Exception as e:
             print(f"Erro ao ler região: {e}")
@@ -0,0 +1,357 @@
+"""
+Carregamento Assíncrono de Camadas - Abre e prepara camadas fora da thread da GUI
+
+A abertura do arquivo, a leitura de metadados e a primeira decodificação de
+geometrias (armazenamento colunar + índice espacial) rodam em um QThreadPool.
+A GUI recebe sinais de progresso e é notificada quando a camada está pronta
+para o primeiro render; até lá o frame anterior continua sendo exibido.
+A listagem das tabelas de um arquivo (que em KML/DXF lê o arquivo inteiro)
+também roda no pool.
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from .datasource_pool import list_vector_sublayers
+from .source_optimizer import optimize_vector_source
+
+
+class _LoadTaskSignals(QObject):
+    """Sinais emitidos por uma tarefa de carregamento (QRunnable não é QObject)"""
+    progress = pyqtSignal(str, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str, str)
+
+
+class LayerLoadTask(QRunnable):
+    """Tarefa que carrega e prepara uma camada em uma thread do pool"""
+
+    def __init__(self, layer):
+        """
+        Inicializa a tarefa.
+
+        Args:
+            layer: Camada (VectorLayer ou RasterLayer) ainda não carregada
+        """
+        super().__init__()
+        self.layer = layer
+        self.signals = _LoadTaskSignals()
+
+    def run(self):
+        """Executa load() e prepare() emitindo progresso (0-100)"""
+        name = self.layer.name
+        try:
+            self.signals.progress.emit(name, 5)
+            if not self.layer.load():
+                self.signals.failed.emit(name, f"Não foi possível carregar: {name}")
+                return
+            self.signals.progress.emit(name, 20)
+
+            def on_progress(done: int, total: int):
+                if total > 0:
+                    self.signals.progress.emit(name, 20 + int(75 * min(done, total) / total))
+
+            self.layer.prepare(progress_callback=on_progress)
+            self.signals.progress.emit(name, 100)
+            self.signals.finished.emit(self.layer)
+
+        except Exception as e:
+            print(f"[ERRO] Falha ao carregar camada {name} em segundo plano: {e}")
+            import traceback
+            traceback.print_exc()
+            self.signals.failed.emit(name, str(e))
+
+
+class SublayerScanTask(QRunnable):
+    """Tarefa que lista as camadas (tabelas) de um arquivo vetorial"""
+
+    def __init__(self, source: str):
+        """
+        Inicializa a tarefa.
+
+        Args:
+            source: Caminho do arquivo vetorial
+        """
+        super().__init__()
+        self.source = source
+        self.signals = _LoadTaskSignals()
+
+    def run(self):
+        """Abre o arquivo e lista as camadas; finished recebe (fonte, camadas)"""
+        try:
+            sublayers = list_vector_sublayers(self.source)
+            if not sublayers:
+                self.signals.failed.emit(self.source,
+                                         f"Não foi possível abrir: {Path(self.source).name}")
+                return
+            self.signals.finished.emit((self.source, sublayers))
+
+        except Exception as e:
+            print(f"[ERRO] Falha ao listar camadas de {self.source}: {e}")
+            self.signals.failed.emit(self.source, str(e))
+
+
+class SourceOptimizeTask(QRunnable):
+    """Tarefa que converte uma fonte vetorial para um formato indexado"""
+
+    def __init__(self, source: str, fmt: str):
+        """
+        Inicializa a tarefa.
+
+        Args:
+            source: Caminho da fonte
+            fmt: 'fgb' ou 'gpkg'
+        """
+        super().__init__()
+        self.source = source
+        self.fmt = fmt
+        self.signals = _LoadTaskSignals()
+
+    def run(self):
+        """Executa a conversão emitindo progresso; finished recebe (fonte, saída)"""
+        name = Path(self.source).stem
+        try:
+            output = optimize_vector_source(
+                self.source, self.fmt,
+                progress_callback=lambda done, total: self.signals.progress.emit(name, done))
+            if output is None:
+                self.signals.failed.emit(self.source, f"Não foi possível otimizar: {name}")
+                return
+            self.signals.finished.emit((self.source, output))
+
+        except Exception as e:
+            print(f"[ERRO] Falha ao otimizar {self.source}: {e}")
+            self.signals.failed.emit(self.source, str(e))
+
+
+class OverviewBuildTask(QRunnable):
+    """Tarefa que gera as overviews de uma camada raster"""
+
+    def __init__(self, layer, levels: Optional[List[int]], resampling: str):
+        """
+        Inicializa a tarefa.
+
+        Args:
+            layer: RasterLayer carregada
+            levels: Fatores de redução (None = padrão)
+            resampling: Método de reamostragem
+        """
+        super().__init__()
+        self.layer = layer
+        self.levels = levels
+        self.resampling = resampling
+        self.cancel_event = threading.Event()
+        self.signals = _LoadTaskSignals()
+
+    def run(self):
+        """Executa build_overviews(); finished recebe a camada"""
+        name = self.layer.name
+        try:
+            ok = self.layer.build_overviews(
+                self.levels, self.resampling,
+                progress_callback=lambda done, total: self.signals.progress.emit(name, done),
+                cancel_event=self.cancel_event)
+            if not ok:
+                message = "Cancelado" if self.cancel_event.is_set() else \
+                    f"Não foi possível gerar overviews: {name}"
+                self.signals.failed.emit(name, message)
+                return
+            self.signals.finished.emit(self.layer)
+
+        except Exception as e:
+            print(f"[ERRO] Falha ao gerar overviews de {name}: {e}")
+            self.signals.failed.emit(name, str(e))
+
+
+class LayerLoader(QObject):
+    """
+    Gerencia o carregamento de camadas em um pool de threads.
+
+    Signals:
+        layer_loading_progress(nome, percentual)
+        layer_loaded(camada) - camada pronta para o primeiro render
+        layer_failed(nome, mensagem)
+        sublayers_listed(fonte, camadas) - resultado de list_vector_sublayers
+        sublayers_failed(fonte, mensagem)
+        source_optimized(fonte, arquivo otimizado)
+        source_optimize_failed(fonte, mensagem)
+        overviews_built(camada) - overviews geradas (recarregar a camada)
+        overviews_failed(nome, mensagem)
+    """
+
+    layer_loading_progress = pyqtSignal(str, int)
+    layer_loaded = pyqtSignal(object)
+    layer_failed = pyqtSignal(str, str)
+    sublayers_listed = pyqtSignal(str, object)
+    sublayers_failed = pyqtSignal(str, str)
+    source_optimized = pyqtSignal(str, str)
+    source_optimize_failed = pyqtSignal(str, str)
+    overviews_built = pyqtSignal(object)
+    overviews_failed = pyqtSignal(str, str)
+
+    def __init__(self, max_workers: Optional[int] = None, parent=None):
+        """
+        Inicializa o carregador.
+
+        Args:
+            max_workers: Número máximo de threads (None = padrão do Qt)
+            parent: QObject pai
+        """
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        if max_workers:
+            self._pool.setMaxThreadCount(max_workers)
+        # Mantém as tarefas vivas até terminarem (os sinais pertencem a elas)
+        self._pending: Dict[str, LayerLoadTask] = {}
+        self._scanning: Dict[str, SublayerScanTask] = {}
+        self._optimizing: Dict[str, SourceOptimizeTask] = {}
+        self._building: Dict[str, OverviewBuildTask] = {}
+
+    def load(self, layer) -> bool:
+        """
+        Agenda o carregamento de uma camada.
+
+        Args:
+            layer: Camada a carregar
+
+        Returns:
+            False se já existe um carregamento em andamento com o mesmo nome
+        """
+        if layer.name in self._pending:
+            print(f"Aviso: Camada '{layer.name}' já está sendo carregada")
+            return False
+
+        task = LayerLoadTask(layer)
+        task.signals.progress.connect(self.layer_loading_progress)
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+        self._pending[layer.name] = task
+        self._pool.start(task)
+        return True
+
+    def list_sublayers(self, source: str) -> bool:
+        """
+        Agenda a listagem das camadas de um arquivo vetorial.
+
+        Args:
+            source: Caminho do arquivo
+
+        Returns:
+            False se o arquivo já está sendo listado
+        """
+        if source in self._scanning:
+            return False
+
+        task = SublayerScanTask(source)
+        task.signals.finished.connect(self._on_sublayers_listed)
+        task.signals.failed.connect(self._on_sublayers_failed)
+        self._scanning[source] = task
+        self._pool.start(task)
+        return True
+
+    def optimize_source(self, source: str, fmt: str = 'fgb') -> bool:
+        """
+        Agenda a conversão de uma fonte para FlatGeobuf/GeoPackage indexado.
+
+        Args:
+            source: Caminho da fonte
+            fmt: 'fgb' ou 'gpkg'
+
+        Returns:
+            False se a fonte já está sendo otimizada
+        """
+        if source in self._optimizing:
+            return False
+
+        task = SourceOptimizeTask(source, fmt)
+        task.signals.progress.connect(self.layer_loading_progress)
+        task.signals.finished.connect(self._on_optimized)
+        task.signals.failed.connect(self._on_optimize_failed)
+        self._optimizing[source] = task
+        self._pool.start(task)
+        return True
+
+    def build_overviews(self, layer, levels: Optional[List[int]] = None,
+                        resampling: str = 'AVERAGE') -> bool:
+        """
+        Agenda a geração de overviews de uma camada raster.
+
+        Args:
+            layer: RasterLayer carregada
+            levels: Fatores de redução (None = padrão)
+            resampling: Método de reamostragem
+
+        Returns:
+            False se as overviews dessa camada já estão sendo geradas
+        """
+        if layer.name in self._building:
+            return False
+
+        task = OverviewBuildTask(layer, levels, resampling)
+        task.signals.progress.connect(self.layer_loading_progress)
+        task.signals.finished.connect(self._on_overviews_built)
+        task.signals.failed.connect(self._on_overviews_failed)
+        self._building[layer.name] = task
+        self._pool.start(task)
+        return True
+
+    def cancel_overviews(self, layer_name: str) -> bool:
+        """Pede o cancelamento da geração de overviews (False se não há)"""
+        task = self._building.get(layer_name)
+        if task is None:
+            return False
+        task.cancel_event.set()
+        return True
+
+    def is_loading(self, layer_name: str) -> bool:
+        """Retorna se a camada ainda está sendo carregada"""
+        return layer_name in self._pending
+
+    def wait_for_done(self, timeout_ms: int = -1) -> bool:
+        """Aguarda todas as tarefas terminarem (útil ao encerrar a aplicação)"""
+        return self._pool.waitForDone(timeout_ms)
+
+    def _on_finished(self, layer):
+        """Tarefa concluída (executado na thread da GUI)"""
+        self._pending.pop(layer.name, None)
+        self.layer_loaded.emit(layer)
+
+    def _on_failed(self, layer_name: str, message: str):
+        """Tarefa falhou (executado na thread da GUI)"""
+        self._pending.pop(layer_name, None)
+        self.layer_failed.emit(layer_name, message)
+
+    def _on_sublayers_listed(self, result: tuple):
+        """Listagem concluída (executado na thread da GUI)"""
+        source, sublayers = result
+        self._scanning.pop(source, None)
+        self.sublayers_listed.emit(source, sublayers)
+
+    def _on_sublayers_failed(self, source: str, message: str):
+        """Listagem falhou (executado na thread da GUI)"""
+        self._scanning.pop(source, None)
+        self.sublayers_failed.emit(source, message)
+
+    def _on_optimized(self, result: tuple):
+        """Conversão concluída (executado na thread da GUI)"""
+        source, output = result
+        self._optimizing.pop(source, None)
+        self.source_optimized.emit(source, output)
+
+    def _on_optimize_failed(self, source: str, message: str):
+        """Conversão falhou (executado na thread da GUI)"""
+        self._optimizing.pop(source, None)
+        self.source_optimize_failed.emit(source, message)
+
+    def _on_overviews_built(self, layer):
+        """Overviews geradas (executado na thread da GUI)"""
+        self._building.pop(layer.name, None)
+        self.overviews_built.emit(layer)
+
+    def _on_overviews_failed(self, layer_name: str, message: str):
+        """Geração de overviews falhou ou foi cancelada (thread da GUI)"""
+        self._building.pop(layer_name, None)
+        self.overviews_failed.emit(layer_name, message)
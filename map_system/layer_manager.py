@@ -4,6 +4,7 @@ Módulo de Gerenciamento de Camadas - Controla a ordem e visibilidade de camadas
 
 from typing import List, Optional
 from .layer import Layer
+from .cache_manager import get_cache_manager
 
 
 class LayerManager:
@@ -51,6 +52,31 @@ class LayerManager:
         print(f"Camada '{layer.name}' adicionada na posição {self._layer_ids[layer.name]}")
         return True
     
+    def replace_layer(self, layer: Layer) -> bool:
+        """
+        Substitui a camada de mesmo nome mantendo sua posição, visibilidade
+        e opacidade (ex: após converter a fonte para um formato otimizado).
+        
+        Args:
+            layer: Nova camada
+            
+        Returns:
+            True se substituída, False se não existe camada com esse nome
+        """
+        if layer.name not in self._layer_ids:
+            return False
+        
+        idx = self._layer_ids[layer.name]
+        old_layer = self._layers[idx]
+        layer.visible = old_layer.visible
+        layer.opacity = old_layer.opacity
+        get_cache_manager().invalidate_owner(old_layer.cache_id)
+        old_layer.close()
+        self._layers[idx] = layer
+        
+        print(f"Camada '{layer.name}' substituída")
+        return True
+    
     def remove_layer(self, layer_name: str) -> bool:
         """
         Remove uma camada do gerenciador.
@@ -65,6 +91,8 @@ class LayerManager:
             return False
         
         idx = self._layer_ids[layer_name]
+        get_cache_manager().invalidate_owner(self._layers[idx].cache_id)
+        self._layers[idx].close()
         del self._layers[idx]
         self._rebuild_layer_ids()
         
@@ -83,6 +111,8 @@ class LayerManager:
         """
         if 0 <= index < len(self._layers):
             layer_name = self._layers[index].name
+            get_cache_manager().invalidate_owner(self._layers[index].cache_id)
+            self._layers[index].close()
             del self._layers[index]
             self._rebuild_layer_ids()
             print(f"Camada '{layer_name}' removida")
@@ -275,6 +305,10 @@ class LayerManager:
     
     def clear(self):
         """Remove todas as camadas"""
+        cache = get_cache_manager()
+        for layer in self._layers:
+            cache.invalidate_owner(layer.cache_id)
+            layer.close()
         self._layers.clear()
         self._layer_ids.clear()
         print("Todas as camadas removidas")
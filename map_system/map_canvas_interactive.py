@@ -11,6 +11,7 @@ from PyQt6.QtCore import pyqtSignal
 
 from .layer_manager import LayerManager
 from .renderer import RenderContext, SimpleRenderer
+from .cache_manager import get_cache_manager, new_owner_id
 from .map_tool import MapToolManager, MouseEvent, MapToolType
 
 
@@ -54,7 +55,8 @@ class MapCanvasInteractive:
         self._tk_image = None
         
         # Cache de renderização por camada
-        self._layer_cache = {}  # {layer_name: (extent, image)}
+        # As imagens ficam no CacheManager global: ('render', id do canvas, nome) -> (extent, image)
+        self._cache_id = new_owner_id()
         self._cache_enabled = True
         
         # Overlay para desenhos temporários
@@ -210,8 +212,7 @@ class MapCanvasInteractive:
         success = self.layer_manager.remove_layer(layer_name)
         if success:
             # Remove do cache
-            if layer_name in self._layer_cache:
-                del self._layer_cache[layer_name]
+            get_cache_manager().remove(('render', self._cache_id, layer_name))
             self.refresh()
         return success
     
@@ -324,7 +325,7 @@ class MapCanvasInteractive:
     
     def _clear_cache(self):
         """Limpa o cache de renderização"""
-        self._layer_cache.clear()
+        get_cache_manager().invalidate_owner(self._cache_id)
     
     def _get_cached_layer_image(self, layer, context: RenderContext) -> Optional[Image.Image]:
         """
@@ -340,8 +341,9 @@ class MapCanvasInteractive:
         if not self._cache_enabled:
             return self._renderer.render(layer, context)
         
-        cache_key = layer.name
-        cached_data = self._layer_cache.get(cache_key)
+        cache = get_cache_manager()
+        cache_key = ('render', self._cache_id, layer.name)
+        cached_data = cache.get(cache_key)
         
         # Verifica se o cache é válido (mesma extensão)
         if cached_data is not None:
@@ -352,7 +354,7 @@ class MapCanvasInteractive:
         # Renderiza e armazena no cache
         layer_image = self._renderer.render(layer, context)
         if layer_image:
-            self._layer_cache[cache_key] = (self._extent, layer_image)
+            cache.put(cache_key, (self._extent, layer_image))
         
         return layer_image
     
@@ -206,7 +206,40 @@ class IdentifyTool(MapTool):
                 world_pos = self.canvas.pixel_to_world(event.x, event.y)
                 if world_pos:
                     print(f"Identificando features em: {world_pos}")
-                    # TODO: Implementar identificação de features
+                    self.identify(world_pos, event)
+    
+    def identify(self, world_pos: Tuple[float, float], event: MouseEvent,
+                 tolerance_px: int = 3, max_results: int = 10) -> List[dict]:
+        """
+        Procura features vetoriais próximas ao ponto e imprime seus atributos.
+        
+        Args:
+            world_pos: Coordenadas do clique no mapa
+            event: Evento do mouse (usado para calcular a tolerância em unidades do mapa)
+            tolerance_px: Tolerância em pixels
+            max_results: Máximo de features por camada
+            
+        Returns:
+            Lista de dicionários {'layer', 'attributes'}
+        """
+        if not hasattr(self.canvas, 'layer_manager'):
+            return []
+        
+        x, y = world_pos
+        corner = self.canvas.pixel_to_world(event.x + tolerance_px, event.y + tolerance_px)
+        dx = abs(corner[0] - x) if corner else 0.0
+        dy = abs(corner[1] - y) if corner else 0.0
+        
+        results = []
+        for layer in self.canvas.layer_manager.get_visible_layers():
+            if not hasattr(layer, 'query_bbox'):
+                continue
+            indices = layer.query_bbox((x - dx, y - dy, x + dx, y + dy))
+            for index in indices[:max_results].tolist():
+                attributes = layer.get_attributes(index)
+                results.append({'layer': layer.name, 'attributes': attributes})
+                print(f"  {layer.name}: {attributes}")
+        return results
     
     def mouse_move(self, event: MouseEvent):
         pass
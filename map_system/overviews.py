@@ -0,0 +1,108 @@
+"""
+Overviews Raster - Construção de pirâmides de resolução reduzida
+
+Sem overviews, uma vista afastada de um GeoTIFF grande precisa decimar dados
+em resolução nativa. Este módulo gera as overviews com GDAL BuildOverviews,
+internas ao arquivo ou em um .ovr externo, com progresso e cancelamento.
+"""
+
+import os
+import threading
+from typing import Callable, List, Optional
+
+from osgeo import gdal
+
+
+# Rasters com o maior lado acima disto e sem overviews recebem a sugestão
+OVERVIEW_MIN_RASTER_SIZE = 4096
+
+# A pirâmide para quando o menor lado do nível fica abaixo disto
+OVERVIEW_MIN_LEVEL_SIZE = 256
+
+RESAMPLING_METHODS = ('NEAREST', 'AVERAGE', 'BILINEAR', 'CUBIC', 'MODE', 'GAUSS')
+
+
+def default_overview_levels(width: int, height: int) -> List[int]:
+    """
+    Calcula fatores de redução em potências de 2 (2, 4, 8, ...).
+
+    Args:
+        width: Largura do raster em pixels
+        height: Altura do raster em pixels
+
+    Returns:
+        Lista de fatores até o menor lado ficar abaixo de OVERVIEW_MIN_LEVEL_SIZE
+    """
+    levels = []
+    factor = 2
+    while min(width, height) / factor >= OVERVIEW_MIN_LEVEL_SIZE // 2 and \
+            max(width, height) / factor >= OVERVIEW_MIN_LEVEL_SIZE:
+        levels.append(factor)
+        factor *= 2
+    return levels or [2]
+
+
+def build_overviews(source: str, levels: List[int], resampling: str = 'AVERAGE',
+                    external: bool = True,
+                    progress_callback: Optional[Callable[[int, int], None]] = None,
+                    cancel_event: Optional[threading.Event] = None) -> bool:
+    """
+    Gera overviews para um arquivo raster.
+
+    Usa um dataset próprio (não o do pool): handles abertos por camadas só
+    enxergam as overviews novas depois de reabertos.
+
+    Args:
+        source: Caminho do raster
+        levels: Fatores de redução (ex: [2, 4, 8])
+        resampling: Método de reamostragem (ver RESAMPLING_METHODS)
+        external: True grava <source>.ovr; False grava dentro do arquivo
+        progress_callback: Função chamada com (percentual, 100)
+        cancel_event: Quando sinalizado, interrompe a construção
+
+    Returns:
+        True se concluído, False se cancelado ou em caso de erro
+    """
+    resampling = resampling.upper()
+    if resampling not in RESAMPLING_METHODS:
+        print(f"Erro: Método de reamostragem desconhecido: {resampling}")
+        return False
+
+    ovr_path = str(source) + '.ovr'
+    ovr_existed = os.path.exists(ovr_path)
+
+    def on_progress(complete, message, data):
+        if progress_callback:
+            progress_callback(int(complete * 100), 100)
+        # Retornar 0 faz o GDAL abortar
+        return 0 if cancel_event is not None and cancel_event.is_set() else 1
+
+    try:
+        # Somente leitura faz o GDAL gravar as overviews em um .ovr externo
+        dataset = gdal.Open(str(source), gdal.GA_ReadOnly if external else gdal.GA_Update)
+        if dataset is None:
+            print(f"Erro: Não foi possível abrir {source}")
+            return False
+
+        result = dataset.BuildOverviews(resampling, list(levels), callback=on_progress)
+        dataset = None
+        if result != 0 or (cancel_event is not None and cancel_event.is_set()):
+            raise RuntimeError("construção interrompida")
+
+        print(f"Overviews {levels} ({resampling}) geradas para {source}")
+        return True
+
+    except Exception as e:
+        cancelled = cancel_event is not None and cancel_event.is_set()
+        if cancelled:
+            print(f"[DEBUG] Construção de overviews cancelada: {source}")
+        else:
+            print(f"Erro ao gerar overviews de {source}: {e}")
+        # Não deixa um .ovr parcial para trás
+        dataset = None
+        if external and not ovr_existed and os.path.exists(ovr_path):
+            try:
+                os.remove(ovr_path)
+            except OSError:
+                pass
+        return False
@@ -0,0 +1,136 @@
+"""
+Decodificação Paralela - Geometrias de camadas grandes decodificadas em processos
+
+A camada é dividida em blocos de features consecutivas (posições na ordem de
+leitura). Cada processo do pool abre seu próprio handle OGR, decodifica o bloco
+para PackedGeometry e devolve os arrays por memória compartilhada, evitando a
+serialização (pickle) de centenas de MB. O processo principal junta os blocos
+na ordem original, de modo que índices continuam alinhados com a tabela de
+atributos. O código dos workers fica em decode_worker (só NumPy e OGR).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context, shared_memory
+from typing import Callable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .decode_worker import decode_chunk
+from .geometry_store import PackedGeometry
+
+
+# Camadas com menos features que isto são decodificadas no próprio processo
+# (o custo de iniciar os workers não compensa)
+PARALLEL_DECODE_MIN_FEATURES = 200000
+
+# Tamanho mínimo de bloco e blocos por worker (balanceamento de carga)
+MIN_CHUNK_FEATURES = 25000
+CHUNKS_PER_WORKER = 4
+
+
+def split_ranges(total: int, workers: int) -> List[Tuple[int, int]]:
+    """
+    Divide [0, total) em blocos (início, quantidade).
+
+    Args:
+        total: Número de features
+        workers: Número de processos
+
+    Returns:
+        Lista de blocos em ordem
+    """
+    chunk_count = max(1, min(workers * CHUNKS_PER_WORKER, total // MIN_CHUNK_FEATURES))
+    bounds = np.linspace(0, total, chunk_count + 1).astype(np.int64)
+    return [(int(start), int(stop - start))
+            for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def decode_parallel(source: str, sublayer: Union[str, int, None], total: int,
+                    workers: Optional[int] = None, keep_z: bool = False,
+                    progress_callback: Optional[Callable[[int, int], None]] = None
+                    ) -> Optional[PackedGeometry]:
+    """
+    Decodifica todas as geometrias de uma camada usando vários processos.
+
+    Args:
+        source: Caminho do arquivo vetorial
+        sublayer: Nome ou índice da camada OGR (None = primeira)
+        total: Número de features da camada
+        workers: Número de processos (None = número de CPUs)
+        keep_z: Se True, preserva a coordenada Z
+        progress_callback: Função chamada com (lidas, total) a cada bloco concluído
+
+    Returns:
+        PackedGeometry completo ou None se a decodificação paralela falhar
+        (o chamador deve então decodificar no próprio processo)
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = split_ranges(total, workers)
+    if len(ranges) < 2:
+        return None
+
+    print(f"[DEBUG] Decodificando {total} features em {len(ranges)} blocos "
+          f"com {min(workers, len(ranges))} processos")
+
+    chunks: List[Optional[PackedGeometry]] = [None] * len(ranges)
+    blocks = []
+    futures = {}
+    try:
+        # 'spawn': o processo principal tem threads (Qt, GDAL) e fork não é seguro
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                                 mp_context=get_context('spawn')) as executor:
+            futures = {
+                executor.submit(decode_chunk, str(source), sublayer, start, count, keep_z): i
+                for i, (start, count) in enumerate(ranges)
+            }
+            done = 0
+            for future in as_completed(futures):
+                i = futures[future]
+                block, chunks[i] = _attach_shared_memory(future.result())
+                blocks.append(block)
+                done += ranges[i][1]
+                if progress_callback:
+                    progress_callback(done, total)
+
+        # Única cópia: das views sobre a memória compartilhada para o resultado
+        return PackedGeometry.concatenate(chunks)
+
+    except Exception as e:
+        print(f"Aviso: Decodificação paralela falhou ({e}), usando um único processo")
+        return None
+
+    finally:
+        # As views precisam ser liberadas antes de fechar os blocos
+        chunks = None
+        for block in blocks:
+            block.close()
+        # Remove os blocos de todos os workers concluídos (inclusive após falhas)
+        for future in futures:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                _unlink_block(future.result()[0])
+
+
+def _attach_shared_memory(descriptor: tuple) -> tuple:
+    """
+    Abre um bloco compartilhado e cria views sobre seus arrays (sem cópia).
+
+    Returns:
+        Tupla (bloco, PackedGeometry); o bloco deve ser fechado depois que as
+        views deixarem de ser usadas
+    """
+    name, layout = descriptor
+    block = shared_memory.SharedMemory(name=name)
+    arrays = {array_name: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+              for array_name, dtype, shape, offset in layout}
+    return block, PackedGeometry(**arrays)
+
+
+def _unlink_block(name: str):
+    """Remove um bloco de memória compartilhada"""
+    try:
+        block = shared_memory.SharedMemory(name=name)
+        block.close()
+        block.unlink()
+    except FileNotFoundError:
+        pass
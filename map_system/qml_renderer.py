@@ -5,8 +5,9 @@ Renderiza mapas diretamente com Qt Graphics, sem PIL
 
 from abc import ABC, abstractmethod
 from typing import Tuple, Optional
-from PyQt6.QtCore import QUrl, Qt, QSize, QRect
-from PyQt6.QtGui import QImage, QPainter, QPen, QBrush, QColor
+import numpy as np
+from PyQt6.QtCore import QUrl, Qt, QSize, QRect, QRectF, QPoint
+from PyQt6.QtGui import QImage, QPainter, QPen, QBrush, QColor, QPolygon
 from PyQt6.QtWidgets import QWidget, QVBoxLayout
 from PyQt6.QtQuick import QQuickItem, QQuickPaintedItem
 
@@ -15,6 +16,9 @@ try:
 except ImportError:
     raise ImportError("GDAL não está instalado. Instale com: pip install gdal")
 
+from .geometry_store import GEOM_NONE, POINT_TYPES, LINE_TYPES, POLYGON_TYPES
+from .raster_display import RGBABuffer, read_display_rgba
+
 
 class RenderContext:
     """Contexto de renderização - idêntico ao da versão PIL"""
@@ -38,6 +42,61 @@ class RenderContext:
         px = int((x - self.minx) * self.scale_x)
         py = int((self.maxy - y) * self.scale_y)
         return px, py
+    
+    def world_to_pixel_array(self, coords: np.ndarray) -> np.ndarray:
+        """Converte um array (n, 2) de coordenadas para pixels de forma vetorizada"""
+        pixels = np.empty(coords.shape, dtype=np.int64)
+        pixels[:, 0] = (coords[:, 0] - self.minx) * self.scale_x
+        pixels[:, 1] = (self.maxy - coords[:, 1]) * self.scale_y
+        return pixels
+
+
+class PackedStyle:
+    """Canetas e pincel de uma renderização, criados uma vez por frame"""
+    
+    def __init__(self, fill: QColor, outline: QColor, outline_width: int = 1,
+                 point_size: int = 3):
+        self.brush = QBrush(fill)
+        self.pen = QPen(outline)
+        self.line_pen = QPen(outline, outline_width)
+        self.point_size = point_size
+
+
+def draw_packed_feature(painter: QPainter, packed, index: int, context: RenderContext,
+                        style: PackedStyle):
+    """
+    Desenha uma feature do armazenamento colunar (sem objetos OGR).
+    Compartilhado pelos renderizadores Qt.
+    
+    Args:
+        painter: QPainter ativo
+        packed: PackedGeometry da camada
+        index: Índice da feature
+        context: Contexto de renderização
+        style: Canetas e pincel do frame
+    """
+    geom_type = packed.geom_types[index]
+    if geom_type == GEOM_NONE:
+        return
+    
+    size = style.point_size
+    for rings in packed.feature_parts(index):
+        pixels = context.world_to_pixel_array(rings[0])
+        
+        if geom_type in POINT_TYPES:
+            px, py = pixels[0].tolist()
+            painter.setBrush(style.brush)
+            painter.setPen(style.pen)
+            painter.drawEllipse(px - size, py - size, size * 2, size * 2)
+        elif geom_type in LINE_TYPES:
+            if len(pixels) >= 2:
+                painter.setPen(style.line_pen)
+                painter.drawPolyline(QPolygon([QPoint(px, py) for px, py in pixels.tolist()]))
+        elif geom_type in POLYGON_TYPES:
+            if len(pixels) >= 3:
+                painter.setBrush(style.brush)
+                painter.setPen(style.pen)
+                painter.drawPolygon(QPolygon([QPoint(px, py) for px, py in pixels.tolist()]))
 
 
 class QtMapCanvas(QQuickPaintedItem):
@@ -101,6 +160,8 @@ class QtSimpleRenderer(QtImageRenderer):
         self._default_color = QColor(100, 100, 255, 180)
         self._default_outline_color = QColor(0, 0, 0, 255)
         self._default_outline_width = 1
+        # Memória dos rasters, reutilizada entre frames e entregue ao QImage
+        self._raster_buffer = RGBABuffer()
     
     def supports_layer_type(self, layer_type: str) -> bool:
         return layer_type in ["vector", "raster"]
@@ -127,47 +188,48 @@ class QtSimpleRenderer(QtImageRenderer):
         painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
         painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, True)
         
-        # Renderiza features
-        for feature in layer.features:
-            geom = feature['geometry']
-            if geom:
-                self._draw_geometry(painter, geom, context)
+        # Streaming ou vista pequena de fonte indexada: lê do OGR apenas a extensão visível
+        if layer.reads_from_source(context.extent):
+            for feature in layer.iter_features(context.extent, columns=[]):
+                if feature['geometry']:
+                    self._draw_geometry(painter, feature['geometry'], context)
+            painter.end()
+            return img
+        
+        # Geometria generalizada para a escala; desenha só as features visíveis
+        packed = layer.geometry_for_scale(context.scale_x)
+        if packed is not None:
+            style = PackedStyle(self._default_color, self._default_outline_color,
+                                self._default_outline_width)
+            for index in layer.query_bbox(context.extent).tolist():
+                draw_packed_feature(painter, packed, index, context, style)
         
         painter.end()
         return img
     
     def _render_raster(self, layer, context: RenderContext) -> Optional[QImage]:
-        """Renderiza camada raster"""
+        """Renderiza camada raster (apenas a janela visível, na resolução da tela)"""
         try:
-            import numpy as np
-            
-            # Lê primeira banda
-            data = layer.read_band(1)
-            if data is None:
-                return None
             
-            # Normaliza
-            data_min = np.nanmin(data)
-            data_max = np.nanmax(data)
-            if data_max > data_min:
-                data_norm = ((data - data_min) / (data_max - data_min) * 255).astype(np.uint8)
-            else:
-                data_norm = np.zeros_like(data, dtype=np.uint8)
+            img = QImage(context.width, context.height, QImage.Format.Format_ARGB32_Premultiplied)
+            img.fill(QColor(0, 0, 0, 0))
             
-            # Cria QImage diretamente do numpy array
-            height, width = data_norm.shape
-            bytes_per_line = 3 * width
-            rgb_data = np.stack([data_norm, data_norm, data_norm], axis=2)
+            result = read_display_rgba(layer, context.extent, context.width,
+                                       context.height, self._raster_buffer)
+            if result is None:
+                return img
             
-            from PyQt6.QtCore import QByteArray
-            img = QImage(rgb_data.tobytes(), width, height, 
-                        bytes_per_line, QImage.Format.Format_RGB888)
+            # QImage sobre o próprio buffer (sem cópia); desenhado antes do
+            # buffer ser reutilizado no próximo frame
+            rgba, canvas_rect = result
+            height, width = rgba.shape[:2]
+            tile = QImage(rgba.data, width, height, rgba.strides[0], QImage.Format.Format_RGBA8888)
             
-            # Redimensiona se necessário
-            if img.size() != QSize(context.width, context.height):
-                img = img.scaledToSize(QSize(context.width, context.height), 
-                                      Qt.AspectRatioMode.IgnoreAspectRatio,
-                                      Qt.TransformationMode.SmoothTransformation)
+            # O QPainter escala e posiciona a janela no canvas
+            painter = QPainter(img)
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+            painter.drawImage(QRectF(*canvas_rect), tile)
+            painter.end()
             
             return img
         
@@ -219,9 +281,6 @@ class QtSimpleRenderer(QtImageRenderer):
         if point_count < 2:
             return
         
-        from PyQt6.QtCore import QPoint
-        from PyQt6.QtGui import QPolygon
-        
         points = QPolygon()
         for i in range(point_count):
             x, y = geom.GetX(i), geom.GetY(i)
@@ -241,9 +300,6 @@ class QtSimpleRenderer(QtImageRenderer):
         if point_count < 3:
             return
         
-        from PyQt6.QtCore import QPoint
-        from PyQt6.QtGui import QPolygon
-        
         points = QPolygon()
         for i in range(point_count):
             x, y = ring.GetX(i), ring.GetY(i)
@@ -287,10 +343,19 @@ class QtVectorRenderer(QtImageRenderer):
         painter = QPainter(img)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
         
-        for feature in layer.features:
-            geom = feature['geometry']
-            if geom:
-                self._draw_geometry(painter, geom, context)
+        if layer.reads_from_source(context.extent):
+            for feature in layer.iter_features(context.extent, columns=[]):
+                if feature['geometry']:
+                    self._draw_geometry(painter, feature['geometry'], context)
+            painter.end()
+            return img
+        
+        packed = layer.geometry_for_scale(context.scale_x)
+        if packed is not None:
+            style = PackedStyle(self.fill_color, self.outline_color,
+                                self.outline_width, self.point_size)
+            for index in layer.query_bbox(context.extent).tolist():
+                draw_packed_feature(painter, packed, index, context, style)
         
         painter.end()
         return img
@@ -340,9 +405,6 @@ class QtVectorRenderer(QtImageRenderer):
         if point_count < 2:
             return
         
-        from PyQt6.QtCore import QPoint
-        from PyQt6.QtGui import QPolygon
-        
         points = QPolygon()
         for i in range(point_count):
             x, y = geom.GetX(i), geom.GetY(i)
@@ -362,9 +424,6 @@ class QtVectorRenderer(QtImageRenderer):
         if point_count < 3:
             return
         
-        from PyQt6.QtCore import QPoint
-        from PyQt6.QtGui import QPolygon
-        
         points = QPolygon()
         for i in range(point_count):
             x, y = ring.GetX(i), ring.GetY(i)
@@ -0,0 +1,404 @@
+"""
+Cache de Blocos Raster - Janelas montadas a partir de blocos em memória
+
+Cada banda (e cada overview) é dividida em blocos alinhados ao tamanho de
+bloco natural do dataset (tiles de GeoTIFF, faixas, etc.). Os blocos lidos
+ficam no CacheManager global do processo, dentro do mesmo orçamento das
+geometrias e imagens, de modo que navegar sobre um MDE reutiliza os blocos já
+decodificados em vez de lê-los do disco novamente.
+
+As chaves são ('raster_block', dono, banda, nível, bloco_x, bloco_y), onde o
+nível 0 é a resolução nativa e o nível k é a overview k-1 da banda.
+
+O ParallelBlockReader lê os blocos ausentes de uma janela em paralelo; como o
+GDAL libera o GIL durante E/S e descompressão, MDTs em DEFLATE/LZW são
+decodificados em todos os núcleos. Todas as camadas (e o motor de terreno)
+dividem um único pool de threads do processo, e cada thread abre um handle
+GDAL por arquivo (handles não são thread-safe). Cada bloco é copiado para a
+janela assim que chega; janelas grandes demais para o cache são lidas sem
+guardar os blocos, para não expulsar o que acabou de ser lido.
+"""
+
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .cache_manager import CacheManager, get_cache_manager
+from .datasource_pool import get_dataset_pool
+
+
+# Blocos naturais muito pequenos (ex: faixas de 1 linha) são agrupados até
+# este tamanho mínimo por lado; faixas da largura do raster são divididas
+MIN_CACHE_BLOCK = 256
+STRIP_BLOCK_WIDTH = 1024
+
+# Acima deste fator (pixels do nível por pixel de tela) a janela é lida
+# decimada pelo GDAL em vez de montada a partir de blocos em resolução cheia
+BLOCK_READ_MAX_DOWNSAMPLE = 2.0
+
+# Janelas cujos blocos passam desta fração do orçamento do cache são montadas
+# sem guardar os blocos (eles expulsariam uns aos outros)
+BLOCK_CACHE_MAX_WINDOW_FRACTION = 0.25
+
+# Pool compartilhado (criado sob demanda) e handles GDAL por (thread, caminho),
+# do menos para o mais recentemente usado
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_thread_datasets: 'OrderedDict[Tuple[int, str], object]' = OrderedDict()
+_thread_datasets_lock = threading.Lock()
+
+
+def get_raster_pool() -> ThreadPoolExecutor:
+    """
+    Retorna o pool de threads raster do processo (uma thread por CPU).
+
+    As tarefas do pool não devem esperar por outras tarefas do mesmo pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                       thread_name_prefix='raster')
+        return _pool
+
+
+def thread_dataset(source: str):
+    """
+    Retorna o dataset GDAL de um arquivo aberto pela thread atual.
+
+    Os handles contam no limite de arquivos do DatasetPool: acima do que o
+    pool deixa livre (e de um handle por CPU), os usados há mais tempo são
+    fechados; quem ainda lê por um deles o mantém até terminar.
+
+    Args:
+        source: Caminho do arquivo (ou VRT em /vsimem/)
+
+    Returns:
+        gdal.Dataset exclusivo da thread atual
+    """
+    key = (threading.get_ident(), str(source))
+    with _thread_datasets_lock:
+        dataset = _thread_datasets.get(key)
+        if dataset is not None:
+            _thread_datasets.move_to_end(key)
+            return dataset
+
+    from osgeo import gdal
+    dataset = gdal.Open(str(source), gdal.GA_ReadOnly)
+    if dataset is None:
+        raise IOError(f"Não foi possível abrir {source}")
+
+    pool = get_dataset_pool()
+    limit = max(os.cpu_count() or 1, pool.max_open - pool.open_count)
+    with _thread_datasets_lock:
+        _thread_datasets[key] = dataset
+        while len(_thread_datasets) > limit:
+            _thread_datasets.popitem(last=False)
+    return dataset
+
+
+def release_thread_datasets(source: str) -> int:
+    """
+    Fecha os handles de um arquivo abertos por todas as threads.
+    Leituras em andamento mantêm seu handle até terminar.
+
+    Args:
+        source: Caminho do arquivo
+
+    Returns:
+        Número de handles liberados
+    """
+    source = str(source)
+    with _thread_datasets_lock:
+        keys = [key for key in _thread_datasets if key[1] == source]
+        for key in keys:
+            del _thread_datasets[key]
+    return len(keys)
+
+
+def overview_band(band, level: int):
+    """
+    Retorna a banda do nível pedido (0 = nativa, k = overview k-1).
+
+    Args:
+        band: gdal.Band em resolução nativa
+        level: Nível da pirâmide
+
+    Returns:
+        gdal.Band do nível ou None se não existir
+    """
+    if level == 0:
+        return band
+    if level - 1 >= band.GetOverviewCount():
+        return None
+    return band.GetOverview(level - 1)
+
+
+def choose_overview_level(band, downsample: float) -> int:
+    """
+    Escolhe a overview mais grosseira cuja resolução ainda é pelo menos a pedida.
+
+    Args:
+        band: gdal.Band em resolução nativa
+        downsample: Pixels nativos por pixel de tela (> 1 ao afastar o zoom)
+
+    Returns:
+        Nível (0 = nativa)
+    """
+    level = 0
+    best_factor = 1.0
+    for i in range(band.GetOverviewCount()):
+        overview = band.GetOverview(i)
+        if overview is None or overview.XSize == 0:
+            continue
+        factor = band.XSize / overview.XSize
+        if best_factor < factor <= downsample:
+            level, best_factor = i + 1, factor
+    return level
+
+
+def cache_block_size(band) -> Tuple[int, int]:
+    """
+    Calcula o tamanho de bloco do cache para uma banda.
+
+    Múltiplo inteiro do bloco natural (mantém o alinhamento), com pelo menos
+    MIN_CACHE_BLOCK pixels por lado e limitado ao tamanho da banda.
+
+    Args:
+        band: gdal.Band (nativa ou overview)
+
+    Returns:
+        Tupla (largura, altura) do bloco em pixels
+    """
+    block_w, block_h = band.GetBlockSize()
+    width, height = band.XSize, band.YSize
+    block_w, block_h = max(1, block_w), max(1, block_h)
+
+    if block_w >= width and width > STRIP_BLOCK_WIDTH:
+        # Faixas da largura inteira: divide em colunas
+        block_w = STRIP_BLOCK_WIDTH
+    else:
+        block_w *= max(1, -(-MIN_CACHE_BLOCK // block_w))
+    block_h *= max(1, -(-MIN_CACHE_BLOCK // block_h))
+    return min(block_w, width), min(block_h, height)
+
+
+class BlockReader:
+    """
+    Lê janelas de um raster montando-as a partir de blocos em cache.
+    Uma instância por camada; os blocos ficam no CacheManager global.
+    """
+
+    def __init__(self, owner: int, lock=None, cache: Optional[CacheManager] = None):
+        """
+        Inicializa o leitor.
+
+        Args:
+            owner: Identificador de cache da camada (new_owner_id())
+            lock: Lock do dataset, adquirido apenas ao ler blocos do disco
+            cache: Cache de blocos (None = get_block_cache())
+        """
+        self._owner = owner
+        self._lock = lock if lock is not None else threading.RLock()
+        self._cache = cache if cache is not None else get_block_cache()
+        self._hits = 0
+        self._misses = 0
+
+    def read(self, band, band_index: int, level: int,
+             xoff: int, yoff: int, xsize: int, ysize: int) -> Optional[np.ndarray]:
+        """
+        Lê uma janela de um nível da banda.
+
+        Args:
+            band: gdal.Band do nível (ver overview_band)
+            band_index: Índice da banda (1-based), usado na chave do cache
+            level: Nível da pirâmide, usado na chave do cache
+            xoff, yoff, xsize, ysize: Janela em pixels do nível
+
+        Returns:
+            Array (ysize, xsize) novo (pode ser alterado) ou None se erro
+        """
+        from osgeo import gdal
+
+        with self._lock:
+            block_w, block_h = cache_block_size(band)
+            width, height = band.XSize, band.YSize
+            itemsize = max(1, gdal.GetDataTypeSize(band.DataType) // 8)
+
+        xend = min(width, xoff + xsize)
+        yend = min(height, yoff + ysize)
+        xoff, yoff = max(0, xoff), max(0, yoff)
+        if xend <= xoff or yend <= yoff:
+            return None
+
+        positions = [(bx, by)
+                     for by in range(yoff // block_h, (yend - 1) // block_h + 1)
+                     for bx in range(xoff // block_w, (xend - 1) // block_w + 1)]
+        # Janela grande demais para o orçamento: não guarda os blocos
+        store = (len(positions) * block_w * block_h * itemsize <=
+                 BLOCK_CACHE_MAX_WINDOW_FRACTION * self._cache.budget_mb * 1024 * 1024)
+
+        result = None
+        for bx, by, block in self._blocks(band, band_index, level, positions,
+                                          block_w, block_h, store):
+            if block is None:
+                return None
+            if result is None:
+                result = np.empty((yend - yoff, xend - xoff), dtype=block.dtype)
+
+            # Interseção do bloco com a janela
+            bx0, by0 = bx * block_w, by * block_h
+            x0, x1 = max(xoff, bx0), min(xend, bx0 + block.shape[1])
+            y0, y1 = max(yoff, by0), min(yend, by0 + block.shape[0])
+            result[y0 - yoff:y1 - yoff, x0 - xoff:x1 - xoff] = \
+                block[y0 - by0:y1 - by0, x0 - bx0:x1 - bx0]
+        return result
+
+    def _blocks(self, band, band_index: int, level: int, positions: List[Tuple[int, int]],
+                block_w: int, block_h: int, store: bool = True
+                ) -> Iterator[Tuple[int, int, Optional[np.ndarray]]]:
+        """Gera (bx, by, bloco) para cada posição (bloco None se a leitura falhar)"""
+        for bx, by in positions:
+            yield bx, by, self._block(band, band_index, level, bx, by, block_w, block_h, store)
+
+    def close(self):
+        """Libera recursos do leitor (os blocos em cache são mantidos)"""
+
+    def _block(self, band, band_index: int, level: int, bx: int, by: int,
+               block_w: int, block_h: int, store: bool = True) -> Optional[np.ndarray]:
+        """Obtém um bloco do cache ou o lê do disco (store: guarda no cache)"""
+        key = ('raster_block', self._owner, band_index, level, bx, by)
+        block = self._cache.get(key)
+        if block is not None:
+            self._hits += 1
+            return block
+
+        self._misses += 1
+        with self._lock:
+            x0, y0 = bx * block_w, by * block_h
+            block = band.ReadAsArray(x0, y0,
+                                     min(block_w, band.XSize - x0),
+                                     min(block_h, band.YSize - y0))
+        if block is None:
+            return None
+        if store:
+            # Compartilhado entre leituras: protege contra escrita
+            block.flags.writeable = False
+            self._cache.put(key, block)
+        return block
+
+    def invalidate(self) -> int:
+        """Remove do cache todos os blocos da camada"""
+        return self._cache.invalidate_owner(self._owner)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Retorna as estatísticas de blocos desta camada.
+
+        Returns:
+            Dicionário com hits, misses e hit_rate
+        """
+        lookups = self._hits + self._misses
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': self._hits / lookups if lookups else 0.0,
+        }
+
+
+class ParallelBlockReader(BlockReader):
+    """
+    BlockReader que lê os blocos ausentes de uma janela no pool raster.
+    Cada thread do pool usa seu próprio handle do arquivo (thread_dataset); o
+    dataset compartilhado da camada só é usado para consultar a geometria da
+    banda. No máximo 2 blocos por worker ficam em leitura ao mesmo tempo.
+    """
+
+    def __init__(self, owner: int, source: str, lock=None,
+                 cache: Optional[CacheManager] = None, workers: Optional[int] = None):
+        """
+        Inicializa o leitor (handles são abertos sob demanda).
+
+        Args:
+            owner: Identificador de cache da camada (new_owner_id())
+            source: Caminho que cada thread abre (arquivo ou VRT em /vsimem/)
+            lock: Lock do dataset compartilhado
+            cache: Cache de blocos (None = get_block_cache())
+            workers: Leituras simultâneas (None = número de CPUs)
+        """
+        super().__init__(owner, lock, cache)
+        self._source = str(source)
+        self._workers = workers or os.cpu_count() or 1
+
+    def close(self):
+        """Fecha os handles do arquivo abertos pelas threads (o pool é compartilhado)"""
+        release_thread_datasets(self._source)
+
+    def _read_block(self, band_index: int, level: int, bx: int, by: int,
+                    block_w: int, block_h: int) -> Optional[np.ndarray]:
+        """Lê um bloco com o handle da thread atual (executado no pool)"""
+        band = overview_band(thread_dataset(self._source).GetRasterBand(band_index), level)
+        x0, y0 = bx * block_w, by * block_h
+        return band.ReadAsArray(x0, y0,
+                                min(block_w, band.XSize - x0),
+                                min(block_h, band.YSize - y0))
+
+    def _blocks(self, band, band_index: int, level: int, positions: List[Tuple[int, int]],
+                block_w: int, block_h: int, store: bool = True
+                ) -> Iterator[Tuple[int, int, Optional[np.ndarray]]]:
+        """Gera os blocos do cache e depois os ausentes, lidos em paralelo"""
+        missing = []
+        for bx, by in positions:
+            block = self._cache.get(('raster_block', self._owner, band_index, level, bx, by))
+            if block is None:
+                missing.append((bx, by))
+            else:
+                self._hits += 1
+                yield bx, by, block
+
+        if len(missing) < 2 or self._workers == 1:
+            # Sem ganho com o pool: lê pelo dataset compartilhado
+            for bx, by in missing:
+                yield bx, by, self._block(band, band_index, level, bx, by,
+                                          block_w, block_h, store)
+            return
+
+        self._misses += len(missing)
+        pool = get_raster_pool()
+        pending = iter(missing)
+        in_flight = deque()
+        try:
+            while True:
+                while len(in_flight) < 2 * self._workers:
+                    position = next(pending, None)
+                    if position is None:
+                        break
+                    in_flight.append((position, pool.submit(
+                        self._read_block, band_index, level, *position, block_w, block_h)))
+                if not in_flight:
+                    return
+
+                (bx, by), future = in_flight.popleft()
+                block = future.result()
+                if block is not None and store:
+                    # Compartilhado entre leituras: protege contra escrita
+                    block.flags.writeable = False
+                    self._cache.put(('raster_block', self._owner, band_index, level, bx, by),
+                                    block)
+                yield bx, by, block
+        finally:
+            # Janela abandonada (erro ou bloco ausente): descarta o que não começou
+            for _, future in in_flight:
+                future.cancel()
+
+
+def get_block_cache() -> CacheManager:
+    """
+    Retorna o cache dos blocos raster: o CacheManager global do processo,
+    para que blocos, geometrias e imagens dividam um único orçamento.
+    """
+    return get_cache_manager()
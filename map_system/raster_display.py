@@ -0,0 +1,229 @@
+"""
+Módulo de Exibição Raster - Conversão de janelas raster em pixels RGBA
+
+Funções compartilhadas pelos renderizadores PIL e Qt: aplicam a rampa de
+cores da camada (tons de cinza por padrão) ou compõem bandas RGB com realce
+por banda, sempre tornando transparentes os pixels nodata/NaN. O resultado é
+escrito em um buffer RGBA reutilizado entre frames, que o renderizador Qt
+entrega ao QImage sem cópia.
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .color_ramp import COLOR_RAMPS, ColorRamp, valid_mask
+from .terrain import HILLSHADE, product_range
+
+
+class RGBABuffer:
+    """
+    Buffer RGBA reutilizado entre frames.
+
+    As linhas têm 4 * largura bytes (alinhadas em 32 bits, como o QImage
+    exige), então o array pode ser usado diretamente como memória do QImage.
+    Não deve ser compartilhado entre threads.
+    """
+
+    def __init__(self):
+        """Inicializa o buffer vazio (cresce sob demanda)"""
+        self._buffer = np.empty(0, dtype=np.uint8)
+
+    def get(self, height: int, width: int) -> np.ndarray:
+        """
+        Retorna uma view (altura, largura, 4) uint8 contígua sobre o buffer.
+
+        O conteúdo anterior não é limpo; a view vale até a próxima chamada.
+        """
+        size = height * width * 4
+        if self._buffer.size < size:
+            self._buffer = np.empty(size, dtype=np.uint8)
+        return self._buffer[:size].reshape(height, width, 4)
+
+
+def window_to_rgba(data: np.ndarray, nodata: Optional[float] = None,
+                   value_range: Optional[Tuple[float, float]] = None,
+                   ramp: Optional[ColorRamp] = None,
+                   out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Converte uma banda em pixels RGBA pela LUT da rampa de cores.
+
+    Args:
+        data: Array 2D da banda
+        nodata: Valor nodata (pixels transparentes)
+        value_range: (mínimo, máximo) do realce; None = calculado na própria janela
+        ramp: Rampa de cores (None = tons de cinza)
+        out: Buffer (altura, largura, 4) uint8 de saída (None = novo)
+
+    Returns:
+        Array (altura, largura, 4) uint8 contíguo
+    """
+    if value_range is None:
+        value_range = _window_range(data, nodata)
+        if value_range is None:
+            if out is None:
+                return np.zeros(data.shape + (4,), dtype=np.uint8)
+            out[...] = 0
+            return out
+
+    ramp = ramp or COLOR_RAMPS['grayscale']
+    return ramp.apply(data, value_range, nodata, out)
+
+
+def composite_to_rgba(bands: Sequence[np.ndarray], nodata: Sequence[Optional[float]],
+                      value_ranges: Sequence[Optional[Tuple[float, float]]],
+                      alpha: Optional[np.ndarray] = None,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Compõe três bandas em RGB, com realce independente por banda.
+
+    Args:
+        bands: Arrays 2D (vermelho, verde, azul) de mesmo formato
+        nodata: Valor nodata de cada banda
+        value_ranges: (mínimo, máximo) de cada banda; None = calculado na janela
+        alpha: Banda alfa opcional (0-255)
+        out: Buffer (altura, largura, 4) uint8 de saída (None = novo)
+
+    Returns:
+        Array (altura, largura, 4) uint8; transparente onde qualquer banda é nodata/NaN
+    """
+    if out is None:
+        out = np.empty(bands[0].shape + (4,), dtype=np.uint8)
+
+    for channel, (data, band_nodata, value_range) in enumerate(zip(bands, nodata, value_ranges)):
+        if value_range is None:
+            value_range = _window_range(data, band_nodata) or (0.0, 1.0)
+        stretch_to_uint8(data, value_range, out[..., channel])
+
+    if alpha is not None:
+        np.copyto(out[..., 3], alpha, casting='unsafe')
+    else:
+        out[..., 3] = 255
+    for data, band_nodata in zip(bands, nodata):
+        if band_nodata is not None or data.dtype.kind == 'f':
+            out[..., 3][~valid_mask(data, band_nodata)] = 0
+    return out
+
+
+def stretch_to_uint8(data: np.ndarray, value_range: Tuple[float, float],
+                     out: np.ndarray) -> np.ndarray:
+    """
+    Realce linear de uma banda para 0-255, escrito em `out` (pode ser um canal).
+
+    Bandas de 8/16 bits usam uma LUT indexada pelos próprios valores; as demais
+    passam por um único temporário float32.
+
+    Args:
+        data: Array 2D da banda
+        value_range: (mínimo, máximo) mapeados para 0 e 255
+        out: Array uint8 de saída com o formato de data
+
+    Returns:
+        out
+    """
+    vmin, vmax = value_range
+    if data.dtype.isnative and data.dtype.kind in 'iu' and data.dtype.itemsize <= 2:
+        lut = _stretch_lut(data.dtype.str, float(vmin), float(vmax))
+        np.take(lut, data.view(f'u{data.dtype.itemsize}'), out=out)
+        return out
+
+    scale = 255.0 / (vmax - vmin) if vmax > vmin else 0.0
+    scaled = np.subtract(data, vmin, dtype=np.float32)
+    scaled *= scale
+    scaled += 0.5
+    np.clip(scaled, 0, 255, out=scaled)
+    np.nan_to_num(scaled, copy=False)
+    np.copyto(out, scaled, casting='unsafe')
+    return out
+
+
+@lru_cache(maxsize=32)
+def _stretch_lut(dtype_str: str, vmin: float, vmax: float) -> np.ndarray:
+    """LUT de realce com uma entrada por valor possível do tipo (ordem sem sinal)"""
+    dtype = np.dtype(dtype_str)
+    values = np.arange(2 ** (8 * dtype.itemsize), dtype=np.int64)
+    values = values.astype(f'u{dtype.itemsize}').view(dtype).astype(np.float64)
+    scale = 255.0 / (vmax - vmin) if vmax > vmin else 0.0
+    lut = np.clip((values - vmin) * scale + 0.5, 0, 255).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def _window_range(data: np.ndarray, nodata: Optional[float]) -> Optional[Tuple[float, float]]:
+    """Mínimo e máximo dos pixels válidos da janela (None se não houver)"""
+    valid = valid_mask(data, nodata)
+    if not valid.any():
+        return None
+    values = data[valid]
+    return float(values.min()), float(values.max())
+
+
+def read_display_rgba(layer, extent: Tuple[float, float, float, float],
+                      width: int, height: int,
+                      buffer: Optional[RGBABuffer] = None
+                      ) -> Optional[Tuple[np.ndarray, Tuple[float, float, float, float]]]:
+    """
+    Lê a janela visível de uma RasterLayer e a converte em RGBA.
+
+    Usa o produto de terreno da camada (terrain_product) se ativo, a
+    composição RGB (rgb_bands) se houver, ou a banda 1 com a rampa de cores.
+
+    Args:
+        layer: RasterLayer carregada
+        extent: Extensão visível (minx, miny, maxx, maxy)
+        width: Largura do canvas em pixels
+        height: Altura do canvas em pixels
+        buffer: Buffer reutilizado para o resultado (None = array novo)
+
+    Returns:
+        Tupla (array RGBA, (x, y, largura, altura) no canvas) ou None se nada
+        visível
+    """
+    product = layer.terrain_product
+    if product:
+        window = layer.read_terrain_window(extent, width, height)
+        if window is None:
+            return None
+        out = buffer.get(*window.data.shape) if buffer is not None else None
+        # Sombreamento em tons de cinza; declividade/orientação com a rampa da camada
+        ramp = layer.color_ramp if product != HILLSHADE else None
+        rgba = window_to_rgba(window.data, None,
+                              product_range(product, **layer.terrain_params), ramp, out)
+        return rgba, window.canvas_rect
+
+    rgb_bands = layer.rgb_bands
+    if not rgb_bands:
+        window = layer.read_window(extent, width, height, 1)
+        if window is None:
+            return None
+        out = buffer.get(*window.data.shape) if buffer is not None else None
+        rgba = window_to_rgba(window.data, window.nodata, layer.display_range(1),
+                              layer.color_ramp, out)
+        if layer.alpha_band:
+            # Ex: área fora do raster em um VRT reprojetado
+            alpha_window = layer.read_window(extent, width, height, layer.alpha_band)
+            if alpha_window is not None and alpha_window.data.shape == window.data.shape:
+                np.minimum(rgba[..., 3], alpha_window.data, out=rgba[..., 3], casting='unsafe')
+        return rgba, window.canvas_rect
+
+    windows = [layer.read_window(extent, width, height, band) for band in rgb_bands]
+    if any(window is None for window in windows):
+        return None
+    shape = windows[0].data.shape
+    if any(window.data.shape != shape for window in windows):
+        print(f"Aviso: Bandas de {layer.name} com overviews diferentes; composição ignorada")
+        return None
+
+    alpha = None
+    if layer.alpha_band:
+        alpha_window = layer.read_window(extent, width, height, layer.alpha_band)
+        if alpha_window is not None and alpha_window.data.shape == shape:
+            alpha = alpha_window.data
+
+    out = buffer.get(*shape) if buffer is not None else None
+    rgba = composite_to_rgba([window.data for window in windows],
+                             [window.nodata for window in windows],
+                             [layer.display_range(band) for band in rgb_bands],
+                             alpha, out)
+    return rgba, windows[0].canvas_rect
@@ -0,0 +1,135 @@
+"""
+Acesso Raster Mapeado em Memória - Bandas sem compressão como np.memmap
+
+Em GeoTIFFs sem compressão gravados em faixas contíguas, e em formatos
+brutos (ENVI, EHdr/BIL, .img com .hdr, ...), os pixels de cada banda estão
+no arquivo exatamente na ordem de um array numpy. Nesses casos a banda é
+exposta como um array somente leitura mapeado em memória: janelas e
+amostras viram fatias (views) do array, sem cópia e sem passar pelo cache de
+blocos do GDAL; o sistema operacional pagina apenas o que for tocado.
+
+- GTiff: os offsets das faixas (metadados 'TIFF' BLOCK_OFFSET_*) são
+  conferidos e a banda é aberta com np.memmap (INTERLEAVE=PIXEL vira uma
+  view com passo entre pixels).
+- Formatos brutos: GetVirtualMemAutoArray (mmap do próprio GDAL, Linux).
+
+Tiles, compressão, NBITS e faixas não contíguas retornam None (a leitura
+continua pelo GDAL).
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+
+def _numpy_dtype(band) -> Optional[np.dtype]:
+    """Tipo numpy equivalente ao tipo GDAL da banda"""
+    try:
+        from osgeo import gdal_array
+        return np.dtype(gdal_array.GDALTypeCodeToNumericTypeCode(band.DataType))
+    except Exception:
+        return None
+
+
+def _tiff_byte_order(path: str) -> Optional[str]:
+    """Ordem de bytes do TIFF ('<' ou '>') lida do cabeçalho"""
+    with open(path, 'rb') as f:
+        header = f.read(2)
+    if header == b'II':
+        return '<'
+    if header == b'MM':
+        return '>'
+    return None
+
+
+def _map_gtiff_band(dataset, band_index: int) -> Optional[np.ndarray]:
+    """Mapeia uma banda de GeoTIFF sem compressão em faixas contíguas"""
+    path = dataset.GetDescription()
+    if not os.path.isfile(path):
+        return None
+    if dataset.GetMetadataItem('COMPRESSION', 'IMAGE_STRUCTURE'):
+        return None
+
+    band = dataset.GetRasterBand(band_index)
+    if band.GetMetadataItem('NBITS', 'IMAGE_STRUCTURE'):
+        return None
+    width, height = dataset.RasterXSize, dataset.RasterYSize
+    block_width, block_height = band.GetBlockSize()
+    if block_width != width:
+        return None  # Tiles: linhas do raster não são contíguas
+
+    dtype = _numpy_dtype(band)
+    byte_order = _tiff_byte_order(path)
+    if dtype is None or byte_order is None:
+        return None
+    dtype = dtype.newbyteorder(byte_order)
+
+    pixel_interleaved = (dataset.RasterCount > 1 and
+                         dataset.GetMetadataItem('INTERLEAVE', 'IMAGE_STRUCTURE') == 'PIXEL')
+    samples = dataset.RasterCount if pixel_interleaved else 1
+    strip_bytes = block_height * width * samples * dtype.itemsize
+
+    # Todas as faixas precisam estar em sequência no arquivo
+    first = None
+    strip_count = (height + block_height - 1) // block_height
+    for strip in range(strip_count):
+        offset = band.GetMetadataItem(f'BLOCK_OFFSET_0_{strip}', 'TIFF')
+        if not offset or int(offset) == 0:
+            return None  # Faixa não gravada (arquivo esparso)
+        if first is None:
+            first = int(offset)
+        elif int(offset) != first + strip * strip_bytes:
+            return None
+
+    if first + height * width * samples * dtype.itemsize > os.path.getsize(path):
+        return None
+
+    if not pixel_interleaved:
+        return np.memmap(path, dtype=dtype, mode='r', offset=first, shape=(height, width))
+    pixels = np.memmap(path, dtype=dtype, mode='r', offset=first,
+                       shape=(height, width, samples))
+    return pixels[:, :, band_index - 1]
+
+
+def _map_raw_band(dataset, band_index: int) -> Optional[np.ndarray]:
+    """Mapeia uma banda de formato bruto pelo GetVirtualMemAutoArray do GDAL"""
+    from osgeo import gdal
+
+    band = dataset.GetRasterBand(band_index)
+    try:
+        # Sem USE_DEFAULT_IMPLEMENTATION: só drivers com mmap real do arquivo
+        array = band.GetVirtualMemAutoArray(gdal.GF_Read)
+    except Exception:
+        return None
+    if array is None or array.shape != (dataset.RasterYSize, dataset.RasterXSize):
+        return None
+    return array
+
+
+def map_band(dataset, band_index: int) -> Optional[np.ndarray]:
+    """
+    Expõe uma banda como array mapeado em memória, se o layout permitir.
+
+    O array depende do dataset aberto: não deve ser usado após fechá-lo.
+
+    Args:
+        dataset: gdal.Dataset aberto (em resolução nativa)
+        band_index: Índice da banda (1-based)
+
+    Returns:
+        Array 2D somente leitura (altura, largura) ou None se a banda não
+        estiver armazenada de forma contígua e sem compressão
+    """
+    try:
+        if dataset.GetDriver().ShortName == 'GTiff':
+            array = _map_gtiff_band(dataset, band_index)
+        else:
+            array = _map_raw_band(dataset, band_index)
+    except Exception as e:
+        print(f"Aviso: Não foi possível mapear a banda {band_index} em memória: {e}")
+        return None
+
+    if array is not None:
+        array.flags.writeable = False
+    return array
@@ -0,0 +1,163 @@
+"""
+Estatísticas de Bandas Raster - Calculadas uma vez a partir de uma amostra
+
+Mínimo, máximo, média, desvio padrão, histograma e percentis 2-98% de uma
+banda são calculados sobre a overview mais detalhada que caiba na amostra (ou
+sobre uma leitura decimada da banda), sempre excluindo nodata/NaN. O resultado
+é salvo no cache em disco da camada e usado pelos renderizadores para o
+realce de contraste, de modo que nenhum frame percorre a banda inteira.
+"""
+
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .raster_display import valid_mask
+
+
+# Número máximo de pixels lidos para estimar as estatísticas
+STATS_SAMPLE_PIXELS = 1_000_000
+
+HISTOGRAM_BINS = 256
+
+# Percentis usados no realce de contraste
+STRETCH_PERCENTILES = (2.0, 98.0)
+
+
+@dataclass
+class BandStatistics:
+    """Estatísticas de uma banda (aproximadas se calculadas sobre amostra)"""
+    minimum: float
+    maximum: float
+    mean: float
+    std: float
+    p2: float
+    p98: float
+    histogram: List[int] = field(default_factory=list)
+    sample_pixels: int = 0
+    approximate: bool = True
+
+    @property
+    def stretch_range(self) -> Tuple[float, float]:
+        """Intervalo do realce 2-98% (mínimo/máximo se os percentis coincidirem)"""
+        if self.p98 > self.p2:
+            return self.p2, self.p98
+        return self.minimum, self.maximum
+
+    def to_dict(self) -> dict:
+        """Converte para um dicionário serializável em JSON"""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BandStatistics':
+        """Cria a partir de um dicionário salvo com to_dict()"""
+        return cls(**data)
+
+
+def read_band_sample(band, max_pixels: int = STATS_SAMPLE_PIXELS) -> Tuple[np.ndarray, bool]:
+    """
+    Lê uma amostra da banda com no máximo max_pixels pixels.
+
+    Usa a overview mais detalhada que caiba na amostra; sem overviews, lê a
+    banda decimada (buf_xsize/buf_ysize).
+
+    Args:
+        band: gdal.Band em resolução nativa
+        max_pixels: Tamanho máximo da amostra
+
+    Returns:
+        Tupla (array 2D, aproximada); aproximada é False se a banda inteira foi lida
+    """
+    width, height = band.XSize, band.YSize
+    if width * height <= max_pixels:
+        return band.ReadAsArray(), False
+
+    best = None
+    for i in range(band.GetOverviewCount()):
+        overview = band.GetOverview(i)
+        if overview is None:
+            continue
+        pixels = overview.XSize * overview.YSize
+        if pixels <= max_pixels and (best is None or pixels > best.XSize * best.YSize):
+            best = overview
+    if best is not None:
+        return best.ReadAsArray(), True
+
+    factor = (width * height / max_pixels) ** 0.5
+    buf_xsize = max(1, int(width / factor))
+    buf_ysize = max(1, int(height / factor))
+    return band.ReadAsArray(0, 0, width, height,
+                            buf_xsize=buf_xsize, buf_ysize=buf_ysize), True
+
+
+def sample_array(data: np.ndarray, max_pixels: int = STATS_SAMPLE_PIXELS) -> Tuple[np.ndarray, bool]:
+    """
+    Decima um array já em memória (ex: banda mapeada) com passo fixo.
+
+    Args:
+        data: Array 2D da banda
+        max_pixels: Tamanho máximo da amostra
+
+    Returns:
+        Tupla (view decimada, aproximada); em um array mapeado só as linhas
+        amostradas são lidas do disco
+    """
+    height, width = data.shape
+    if width * height <= max_pixels:
+        return data, False
+    step = int(np.ceil((width * height / max_pixels) ** 0.5))
+    return data[::step, ::step], True
+
+
+def compute_statistics(data: np.ndarray, nodata: Optional[float] = None,
+                       approximate: bool = True) -> Optional[BandStatistics]:
+    """
+    Calcula as estatísticas de um array excluindo nodata/NaN.
+
+    Args:
+        data: Array 2D (amostra ou banda inteira)
+        nodata: Valor nodata da banda
+        approximate: Se os dados são uma amostra
+
+    Returns:
+        BandStatistics ou None se não houver pixels válidos
+    """
+    values = data[valid_mask(data, nodata)].astype(np.float64, copy=False)
+    if values.size == 0:
+        return None
+
+    minimum, maximum = float(values.min()), float(values.max())
+    p2, p98 = np.percentile(values, STRETCH_PERCENTILES)
+    histogram, _ = np.histogram(values, bins=HISTOGRAM_BINS,
+                                range=(minimum, maximum if maximum > minimum else minimum + 1))
+    return BandStatistics(
+        minimum=minimum,
+        maximum=maximum,
+        mean=float(values.mean()),
+        std=float(values.std()),
+        p2=float(p2),
+        p98=float(p98),
+        histogram=histogram.tolist(),
+        sample_pixels=int(values.size),
+        approximate=approximate,
+    )
+
+
+def compute_band_statistics(band, nodata: Optional[float] = None,
+                            max_pixels: int = STATS_SAMPLE_PIXELS) -> Optional[BandStatistics]:
+    """
+    Lê uma amostra da banda e calcula suas estatísticas.
+
+    Args:
+        band: gdal.Band em resolução nativa
+        nodata: Valor nodata da banda
+        max_pixels: Tamanho máximo da amostra
+
+    Returns:
+        BandStatistics ou None se a leitura falhar ou não houver pixels válidos
+    """
+    data, approximate = read_band_sample(band, max_pixels)
+    if data is None:
+        return None
+    return compute_statistics(data, nodata, approximate)
@@ -0,0 +1,118 @@
+"""
+Reprojeção Raster - VRT reprojetado sob demanda
+
+Um raster em outro CRS é aberto através de um VRT reprojetado (gdal.Warp com
+formato VRT): nada é gravado em disco e cada janela lida é reprojetada na
+hora, na resolução pedida (o VRT expõe as overviews da fonte). A reprojeção
+usa várias threads (NUM_THREADS) e os blocos reprojetados ficam no cache de
+blocos raster, sendo reaproveitados ao navegar.
+
+O VRT fica em /vsimem/, de modo que outras threads podem abrir seus próprios
+handles pelo caminho (ex: motor de terreno).
+"""
+
+import itertools
+from typing import Optional
+
+from osgeo import gdal, osr
+
+
+# Erro máximo (em pixels) da aproximação da transformação
+WARP_MAX_ERROR = 0.125
+
+_vrt_ids = itertools.count(1)
+
+
+def spatial_reference(crs: str) -> Optional[osr.SpatialReference]:
+    """
+    Interpreta um CRS (WKT, 'EPSG:4326', PROJ, ...).
+
+    Args:
+        crs: Definição do CRS
+
+    Returns:
+        osr.SpatialReference ou None se inválido
+    """
+    if not crs:
+        return None
+    srs = osr.SpatialReference()
+    try:
+        if srs.SetFromUserInput(crs) != 0:
+            return None
+    except Exception:
+        return None
+    # Ordem x/y (leste, norte) independentemente do CRS
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return srs
+
+
+def needs_reprojection(source_crs: Optional[str], target_crs: Optional[str]) -> bool:
+    """
+    Indica se um raster em source_crs precisa ser reprojetado para target_crs.
+
+    Returns:
+        False se algum CRS é desconhecido ou se ambos são equivalentes
+    """
+    source = spatial_reference(source_crs)
+    target = spatial_reference(target_crs)
+    if source is None or target is None:
+        return False
+    return not source.IsSame(target)
+
+
+def new_vrt_path() -> str:
+    """Retorna um caminho único em /vsimem/ para um VRT reprojetado"""
+    return f'/vsimem/map_system/warped_{next(_vrt_ids)}.vrt'
+
+
+def create_warped_vrt(dataset, target_crs: str, vrt_path: str,
+                      resampling: str = 'bilinear'):
+    """
+    Cria um VRT que reprojeta o dataset para target_crs sob demanda.
+
+    Sem nodata na fonte, o VRT ganha uma banda alfa para que a área fora do
+    raster reprojetado fique transparente.
+
+    Args:
+        dataset: gdal.Dataset de origem
+        target_crs: CRS de destino
+        vrt_path: Caminho do VRT (normalmente de new_vrt_path())
+        resampling: Reamostragem ('near', 'bilinear', 'cubic', ...)
+
+    Returns:
+        gdal.Dataset do VRT ou None em caso de erro
+    """
+    target = spatial_reference(target_crs)
+    if target is None:
+        print(f"Erro: CRS de destino inválido: {target_crs}")
+        return None
+
+    try:
+        has_nodata = dataset.GetRasterBand(1).GetNoDataValue() is not None
+        warped = gdal.Warp(
+            vrt_path, dataset,
+            format='VRT',
+            dstSRS=target.ExportToWkt(),
+            resampleAlg=resampling,
+            errorThreshold=WARP_MAX_ERROR,
+            multithread=True,
+            warpOptions=['NUM_THREADS=ALL_CPUS', 'INIT_DEST=NO_DATA'],
+            dstAlpha=not has_nodata,
+        )
+        if warped is None:
+            return None
+        # Grava o XML em /vsimem/ para que outras threads possam abri-lo
+        warped.FlushCache()
+        return warped
+
+    except Exception as e:
+        print(f"Erro ao criar VRT reprojetado: {e}")
+        return None
+
+
+def remove_warped_vrt(vrt_path: str):
+    """Remove o VRT de /vsimem/"""
+    try:
+        gdal.Unlink(vrt_path)
+    except Exception:
+        pass
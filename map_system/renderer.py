@@ -13,6 +13,9 @@ try:
 except ImportError:
     raise ImportError("GDAL não está instalado. Instale com: pip install gdal")
 
+from .geometry_store import GEOM_NONE, POINT_TYPES, LINE_TYPES, POLYGON_TYPES
+from .raster_display import RGBABuffer, read_display_rgba
+
 
 class RenderContext:
     """
@@ -58,6 +61,57 @@ class RenderContext:
         px = int((x - self.minx) * self.scale_x)
         py = int((self.maxy - y) * self.scale_y)  # Inverte Y
         return px, py
+    
+    def world_to_pixel_array(self, coords: np.ndarray) -> np.ndarray:
+        """
+        Converte um array de coordenadas para pixels de forma vetorizada.
+        
+        Args:
+            coords: Array (n, 2) com coordenadas x, y
+            
+        Returns:
+            Array (n, 2) de inteiros com coordenadas em pixels
+        """
+        pixels = np.empty(coords.shape, dtype=np.int64)
+        pixels[:, 0] = (coords[:, 0] - self.minx) * self.scale_x
+        pixels[:, 1] = (self.maxy - coords[:, 1]) * self.scale_y  # Inverte Y
+        return pixels
+
+
+def draw_packed_feature(draw: ImageDraw.ImageDraw, packed, index: int, context: RenderContext,
+                        fill, outline, outline_width: int = 1, point_size: int = 3):
+    """
+    Desenha uma feature do armazenamento colunar (sem objetos OGR).
+    Compartilhado pelos renderizadores PIL; apenas o anel externo dos
+    polígonos é desenhado, como em _draw_polygon.
+    
+    Args:
+        draw: ImageDraw de destino
+        packed: PackedGeometry da camada
+        index: Índice da feature
+        context: Contexto de renderização
+        fill: Cor de preenchimento RGBA
+        outline: Cor da borda RGBA
+        outline_width: Largura das linhas em pixels
+        point_size: Raio dos pontos em pixels
+    """
+    geom_type = packed.geom_types[index]
+    if geom_type == GEOM_NONE:
+        return
+    
+    for rings in packed.feature_parts(index):
+        pixels = context.world_to_pixel_array(rings[0])
+        
+        if geom_type in POINT_TYPES:
+            px, py = pixels[0]
+            draw.ellipse([px-point_size, py-point_size, px+point_size, py+point_size],
+                        fill=fill, outline=outline)
+        elif geom_type in LINE_TYPES:
+            if len(pixels) >= 2:
+                draw.line(pixels.ravel().tolist(), fill=outline, width=outline_width)
+        elif geom_type in POLYGON_TYPES:
+            if len(pixels) >= 3:
+                draw.polygon(pixels.ravel().tolist(), fill=fill, outline=outline)
 
 
 class Renderer(ABC):
@@ -105,6 +159,8 @@ class SimpleRenderer(Renderer):
         self._default_color = (100, 100, 255, 180)  # RGBA
         self._default_outline_color = (0, 0, 0, 255)
         self._default_outline_width = 1
+        # Memória dos rasters, reutilizada entre frames
+        self._raster_buffer = RGBABuffer()
     
     def supports_layer_type(self, layer_type: str) -> bool:
         """Verifica se suporta o tipo de camada"""
@@ -136,41 +192,43 @@ class SimpleRenderer(Renderer):
         img = Image.new('RGBA', (context.width, context.height), (0, 0, 0, 0))
         draw = ImageDraw.Draw(img)
         
-        # Renderiza cada feature
-        for feature in layer.features:
-            geom = feature['geometry']
-            if geom is None:
-                continue
-            
-            self._draw_geometry(draw, geom, context)
+        # Streaming ou vista pequena de fonte indexada: lê do OGR apenas a extensão visível
+        if layer.reads_from_source(context.extent):
+            for feature in layer.iter_features(context.extent, columns=[]):
+                self._draw_geometry(draw, feature['geometry'], context)
+            return img
+        
+        # Geometria generalizada para a escala; desenha só as features visíveis
+        packed = layer.geometry_for_scale(context.scale_x)
+        if packed is None:
+            return img
+        
+        for index in layer.query_bbox(context.extent).tolist():
+            draw_packed_feature(draw, packed, index, context, self._default_color,
+                                self._default_outline_color, self._default_outline_width)
         
         return img
     
     def _render_raster(self, layer, context: RenderContext) -> Optional[Image.Image]:
-        """Renderiza uma camada raster"""
+        """Renderiza uma camada raster (apenas a janela visível, na resolução da tela)"""
         try:
-            # Lê a primeira banda
-            data = layer.read_band(1)
-            if data is None:
-                return None
+            img = Image.new('RGBA', (context.width, context.height), (0, 0, 0, 0))
             
-            # Normaliza para 0-255
-            data_min = np.nanmin(data)
-            data_max = np.nanmax(data)
-            if data_max > data_min:
-                data_norm = ((data - data_min) / (data_max - data_min) * 255).astype(np.uint8)
-            else:
-                data_norm = np.zeros_like(data, dtype=np.uint8)
+            result = read_display_rgba(layer, context.extent, context.width,
+                                       context.height, self._raster_buffer)
+            if result is None:
+                return img
             
-            # Cria imagem
-            img = Image.fromarray(data_norm, mode='L')
+            rgba, canvas_rect = result
+            tile = Image.fromarray(rgba, mode='RGBA')
             
-            # Redimensiona para o tamanho do contexto se necessário
-            if img.size != (context.width, context.height):
-                img = img.resize((context.width, context.height), Image.BILINEAR)
-            
-            # Converte para RGBA
-            img = img.convert('RGBA')
+            # Posiciona a janela no canvas (pode estar parcialmente fora)
+            x, y, w, h = canvas_rect
+            left, top = int(round(x)), int(round(y))
+            size = (max(1, int(round(x + w)) - left), max(1, int(round(y + h)) - top))
+            if tile.size != size:
+                tile = tile.resize(size, Image.BILINEAR)
+            img.paste(tile, (left, top))
             
             return img
             
@@ -297,13 +355,20 @@ class VectorRenderer(Renderer):
         img = Image.new('RGBA', (context.width, context.height), (0, 0, 0, 0))
         draw = ImageDraw.Draw(img)
         
-        # Renderiza cada feature
-        for feature in layer.features:
-            geom = feature['geometry']
-            if geom is None:
-                continue
-            
-            self._draw_geometry(draw, geom, context)
+        # Streaming ou vista pequena de fonte indexada: lê do OGR apenas a extensão visível
+        if layer.reads_from_source(context.extent):
+            for feature in layer.iter_features(context.extent, columns=[]):
+                self._draw_geometry(draw, feature['geometry'], context)
+            return img
+        
+        # Geometria generalizada para a escala; desenha só as features visíveis
+        packed = layer.geometry_for_scale(context.scale_x)
+        if packed is None:
+            return img
+        
+        for index in layer.query_bbox(context.extent).tolist():
+            draw_packed_feature(draw, packed, index, context, self.fill_color,
+                                self.outline_color, self.outline_width, self.point_size)
         
         return img
     
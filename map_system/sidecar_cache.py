@@ -0,0 +1,377 @@
+"""
+Módulo de Cache em Disco - Geometrias decodificadas salvas ao lado da fonte
+
+Ao lado de `dados.shp` é criado o diretório `dados.shp.mapcache/`, com um
+subdiretório por camada OGR contendo os arrays de PackedGeometry (e demais
+arrays derivados, como os retângulos envolventes) em arquivos .npy e um
+manifest.json. Cada gravação cria uma nova versão (`v-*/`) e só então troca
+o arquivo `current`, que aponta para ela, com os.replace: leitores veem a
+versão antiga ou a nova, nunca nenhuma ou uma pela metade. Versões antigas
+são apagadas depois da troca (se ainda estiverem mapeadas, por exemplo no
+Windows, ficam para a próxima gravação). O manifesto registra tamanho e data de modificação da fonte
+(e dos arquivos auxiliares do shapefile); se não conferirem, o cache é
+descartado e reconstruído. Na reabertura os arrays são mapeados em memória
+(mmap), sem decodificar o arquivo novamente. Valores pequenos (ex:
+estatísticas de bandas raster) ficam no próprio manifesto, em 'metadata'.
+
+Se o diretório da fonte não for gravável, o cache vai para
+~/.cache/map_system/.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .geometry_store import PackedGeometry
+
+
+SIDECAR_SUFFIX = '.mapcache'
+FORMAT_VERSION = 2
+
+# Arquivo com o nome do subdiretório da versão atual
+CURRENT_POINTER = 'current'
+
+# Arquivos que fazem parte da fonte (alterar qualquer um invalida o cache)
+COMPANION_EXTENSIONS = {
+    '.shp': ('.shx', '.dbf', '.prj', '.cpg'),
+}
+
+_GEOMETRY_ARRAYS = ('coords', 'ring_offsets', 'part_offsets',
+                    'feature_offsets', 'geom_types', 'fids')
+
+
+def source_signature(source: str) -> Dict[str, List[int]]:
+    """
+    Calcula a assinatura da fonte: {arquivo: [tamanho, mtime_ns]}.
+
+    Args:
+        source: Caminho do arquivo de dados
+
+    Returns:
+        Dicionário com a fonte e seus arquivos auxiliares existentes
+    """
+    path = Path(source)
+    files = [path]
+    for extension in COMPANION_EXTENSIONS.get(path.suffix.lower(), ()):
+        for candidate in (path.with_suffix(extension), path.with_suffix(extension.upper())):
+            if candidate.exists():
+                files.append(candidate)
+                break
+
+    signature = {}
+    for file in files:
+        stat = file.stat()
+        signature[file.name] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def _fallback_root() -> Path:
+    """Diretório alternativo para caches de fontes em diretórios somente leitura"""
+    return Path.home() / '.cache' / 'map_system'
+
+
+class SidecarCache:
+    """
+    Cache persistente dos arrays (e metadados) de uma camada.
+    Cada instância corresponde a uma camada OGR de uma fonte (ou a um raster).
+    """
+
+    def __init__(self, source: str, layer_name: str = 'default'):
+        """
+        Inicializa o cache (nada é lido ou escrito aqui).
+
+        Args:
+            source: Caminho do arquivo de dados
+            layer_name: Nome da camada OGR dentro da fonte
+        """
+        self._source = os.path.abspath(source)
+        self._layer_name = layer_name
+        self._manifest: Optional[dict] = None
+        # Subdiretório da versão do manifesto lido
+        self._version: Optional[Path] = None
+
+    @property
+    def directory(self) -> Path:
+        """Retorna o diretório do cache desta camada (ao lado da fonte ou alternativo)"""
+        safe_name = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in self._layer_name)
+        local = Path(self._source + SIDECAR_SUFFIX) / safe_name
+        if local.exists() or os.access(os.path.dirname(self._source), os.W_OK):
+            return local
+
+        digest = hashlib.sha1(self._source.encode('utf-8')).hexdigest()[:16]
+        return _fallback_root() / (digest + SIDECAR_SUFFIX) / safe_name
+
+    def is_valid(self) -> bool:
+        """Retorna se existe um cache compatível com a fonte atual"""
+        return self._read_manifest() is not None
+
+    def load_geometry(self) -> Optional[PackedGeometry]:
+        """
+        Mapeia as geometrias salvas em memória.
+
+        Returns:
+            PackedGeometry com arrays somente leitura (mmap) ou None se o cache
+            não existir, estiver desatualizado ou corrompido
+        """
+        manifest = self._read_manifest()
+        if manifest is None or 'coords' not in manifest['arrays']:
+            return None
+
+        try:
+            arrays = {name: self._map_array(name) for name in _GEOMETRY_ARRAYS}
+            z = self._map_array('z') if 'z' in manifest['arrays'] else None
+            packed = PackedGeometry(z=z, **arrays)
+            _check_geometry(packed)
+            return packed
+
+        except Exception as e:
+            if self._current_version() != self._version:
+                # Outra gravação publicou uma versão nova durante a leitura
+                self._manifest = None
+                self._version = None
+                return None
+            print(f"Aviso: Cache em disco inválido para {self._source}, será reconstruído: {e}")
+            self.invalidate()
+            return None
+
+    def save_geometry(self, packed: PackedGeometry) -> bool:
+        """
+        Salva as geometrias, substituindo qualquer conteúdo anterior do cache.
+
+        Args:
+            packed: Geometrias decodificadas da fonte
+
+        Returns:
+            True se salvo com sucesso
+        """
+        arrays = {name: getattr(packed, name) for name in _GEOMETRY_ARRAYS}
+        if packed.z is not None:
+            arrays['z'] = packed.z
+        return self._write(arrays, replace=True)
+
+    def load_array(self, name: str) -> Optional[np.ndarray]:
+        """
+        Mapeia um array auxiliar salvo (ex: 'bounds').
+
+        Args:
+            name: Nome do array
+
+        Returns:
+            Array somente leitura (mmap) ou None
+        """
+        manifest = self._read_manifest()
+        if manifest is None or name not in manifest['arrays']:
+            return None
+        try:
+            return self._map_array(name)
+        except Exception as e:
+            print(f"Aviso: Array '{name}' do cache em disco ilegível: {e}")
+            return None
+
+    def save_array(self, name: str, array: np.ndarray) -> bool:
+        """
+        Acrescenta um array auxiliar a um cache válido.
+
+        Args:
+            name: Nome do array
+            array: Dados
+
+        Returns:
+            True se salvo; False se não há cache válido ou a escrita falhou
+        """
+        if self._read_manifest() is None:
+            return False
+        return self._write({name: array}, replace=False)
+
+    def load_metadata(self, name: str) -> Optional[dict]:
+        """
+        Lê um valor salvo no manifesto (ex: 'band_1_stats').
+
+        Args:
+            name: Nome do valor
+
+        Returns:
+            Dicionário salvo ou None se não existir
+        """
+        manifest = self._read_manifest()
+        if manifest is None:
+            return None
+        return manifest.get('metadata', {}).get(name)
+
+    def save_metadata(self, name: str, value: dict) -> bool:
+        """
+        Salva um valor serializável em JSON no manifesto, criando o cache se
+        necessário (os arrays existentes são preservados).
+
+        Args:
+            name: Nome do valor
+            value: Dicionário serializável em JSON
+
+        Returns:
+            True se salvo com sucesso
+        """
+        replace = self._read_manifest() is None
+        return self._write({}, replace=replace, metadata={name: value})
+
+    def invalidate(self):
+        """Remove o cache desta camada do disco"""
+        self._manifest = None
+        self._version = None
+        directory = self.directory
+        try:
+            # Sem o ponteiro o cache já é inexistente para os leitores
+            os.remove(directory / CURRENT_POINTER)
+        except OSError:
+            pass
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def _current_version(self) -> Optional[Path]:
+        """Retorna o subdiretório apontado por 'current' (None se não houver)"""
+        try:
+            with open(self.directory / CURRENT_POINTER, 'r', encoding='utf-8') as f:
+                name = f.read().strip()
+        except OSError:
+            return None
+        if not name or os.sep in name or '/' in name:
+            return None
+        return self.directory / name
+
+    def _read_manifest(self) -> Optional[dict]:
+        """Lê o manifesto e confere versão e assinatura da fonte"""
+        if self._manifest is not None:
+            return self._manifest
+
+        version = self._current_version()
+        if version is None:
+            return None
+        manifest_path = version / 'manifest.json'
+        if not manifest_path.exists():
+            return None  # Versão substituída e apagada por outra gravação
+
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if (manifest.get('version') != FORMAT_VERSION or
+                    manifest.get('source') != source_signature(self._source)):
+                print(f"[DEBUG] Cache em disco desatualizado: {self.directory}")
+                self.invalidate()
+                return None
+        except Exception as e:
+            print(f"Aviso: Manifesto do cache em disco corrompido ({manifest_path}): {e}")
+            self.invalidate()
+            return None
+
+        self._manifest = manifest
+        self._version = version
+        return manifest
+
+    def _map_array(self, name: str) -> np.ndarray:
+        """Abre um .npy do cache em modo mmap somente leitura"""
+        return np.load(self._version / f'{name}.npy', mmap_mode='r', allow_pickle=False)
+
+    def _write(self, arrays: Dict[str, np.ndarray], replace: bool,
+               metadata: Optional[dict] = None) -> bool:
+        """
+        Escreve arrays e o manifesto em um diretório temporário, o renomeia
+        para uma nova versão e troca o ponteiro 'current' atomicamente, para
+        que um leitor nunca veja um cache ausente ou pela metade.
+        """
+        target = self.directory
+        staging = version = pointer_tmp = None
+        try:
+            target.mkdir(parents=True, exist_ok=True)
+            staging = Path(tempfile.mkdtemp(prefix='.tmp-', dir=target))
+
+            names = set(arrays)
+            merged_metadata = {}
+            if not replace and self._manifest is not None:
+                merged_metadata.update(self._manifest.get('metadata', {}))
+            merged_metadata.update(metadata or {})
+            if not replace and self._version is not None:
+                # Preserva os arrays já existentes (hard link quando possível)
+                for existing in self._manifest['arrays']:
+                    if existing not in names:
+                        _link_or_copy(self._version / f'{existing}.npy',
+                                      staging / f'{existing}.npy')
+                        names.add(existing)
+
+            for name, array in arrays.items():
+                np.save(staging / f'{name}.npy', np.ascontiguousarray(array), allow_pickle=False)
+
+            manifest = {
+                'version': FORMAT_VERSION,
+                'source': source_signature(self._source),
+                'arrays': sorted(names),
+            }
+            if merged_metadata:
+                manifest['metadata'] = merged_metadata
+            with open(staging / 'manifest.json', 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+
+            # Publica a versão: renomeia o diretório e troca o ponteiro
+            version = target / ('v-' + staging.name[len('.tmp-'):])
+            os.rename(staging, version)
+            pointer_fd, pointer_tmp = tempfile.mkstemp(prefix='.tmp-', dir=target)
+            with os.fdopen(pointer_fd, 'w', encoding='utf-8') as f:
+                f.write(version.name)
+            os.replace(pointer_tmp, target / CURRENT_POINTER)
+            self._manifest = manifest
+            self._version = version
+            _remove_stale_versions(target, version.name)
+            return True
+
+        except Exception as e:
+            print(f"Aviso: Não foi possível gravar o cache em disco ({target}): {e}")
+            for leftover in (staging, version):
+                if leftover is not None and leftover != self._version:
+                    shutil.rmtree(leftover, ignore_errors=True)
+            if pointer_tmp is not None and os.path.exists(pointer_tmp):
+                os.remove(pointer_tmp)
+            return False
+
+
+def _remove_stale_versions(directory: Path, current: str):
+    """
+    Apaga versões anteriores e arquivos do formato antigo de um cache.
+    Diretórios temporários (gravações em andamento) são preservados; falhas
+    (ex: arquivo ainda mapeado no Windows) são ignoradas.
+    """
+    for entry in directory.iterdir():
+        if entry.name in (current, CURRENT_POINTER) or entry.name.startswith('.tmp-'):
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry, ignore_errors=True)
+        else:
+            try:
+                entry.unlink()
+            except OSError:
+                pass
+
+
+def _link_or_copy(source: Path, destination: Path):
+    """Cria um hard link (ou copia, se o sistema de arquivos não suportar)"""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _check_geometry(packed: PackedGeometry):
+    """Confere a consistência dos offsets (detecta arquivos truncados)"""
+    count = len(packed.geom_types)
+    if len(packed.fids) != count or len(packed.feature_offsets) != count + 1:
+        raise ValueError("número de features inconsistente")
+    if packed.feature_offsets[-1] != len(packed.part_offsets) - 1:
+        raise ValueError("offsets de partes inconsistentes")
+    if packed.part_offsets[-1] != len(packed.ring_offsets) - 1:
+        raise ValueError("offsets de anéis inconsistentes")
+    if packed.ring_offsets[-1] != len(packed.coords):
+        raise ValueError("offsets de coordenadas inconsistentes")
+    if packed.z is not None and len(packed.z) != len(packed.coords):
+        raise ValueError("coordenadas Z inconsistentes")
@@ -0,0 +1,141 @@
+"""
+Otimização de Fontes Vetoriais - Conversão para formatos com índice espacial
+
+FlatGeobuf (R-tree Hilbert empacotado) e GeoPackage (tabela RTree) permitem
+que o próprio OGR leia apenas as features que intersectam a extensão visível.
+Em camadas nesses formatos, vistas aproximadas (e o modo streaming opcional)
+são renderizadas empurrando a extensão do RenderContext para o índice nativo
+(VectorLayer.reads_from_source); este módulo converte shapefiles e outros
+formatos sem índice para um deles.
+"""
+
+import os
+from pathlib import Path
+from typing import Callable, Optional
+
+from osgeo import gdal, ogr
+
+
+# Drivers OGR cujo índice espacial nativo é usado para filtrar por extensão
+INDEXED_DRIVERS = ('FlatGeobuf', 'GPKG')
+
+# Formato -> (driver OGR, extensão do arquivo)
+OPTIMIZED_FORMATS = {
+    'fgb': ('FlatGeobuf', '.fgb'),
+    'gpkg': ('GPKG', '.gpkg'),
+}
+
+
+def has_native_spatial_index(datasource, ogr_layer) -> bool:
+    """
+    Verifica se a camada está em um formato com índice espacial nativo utilizável.
+
+    Args:
+        datasource: ogr.DataSource aberto
+        ogr_layer: Camada OGR do datasource
+
+    Returns:
+        True se o driver é FlatGeobuf/GeoPackage e o filtro espacial é rápido
+        (ex: GeoPackage sem tabela RTree retorna False)
+    """
+    driver_name = datasource.GetDriver().GetName()
+    return (driver_name in INDEXED_DRIVERS and
+            bool(ogr_layer.TestCapability(ogr.OLCFastSpatialFilter)))
+
+
+def optimized_path(source: str, fmt: str = 'fgb') -> str:
+    """
+    Retorna o caminho do arquivo otimizado ao lado da fonte.
+    Se a fonte já tem a extensão do formato (ex: GeoPackage sem tabela RTree),
+    a saída recebe o sufixo '.indexed' para não sobrescrever a fonte.
+    """
+    extension = OPTIMIZED_FORMATS[fmt][1]
+    path = Path(source).with_suffix(extension)
+    if path.resolve() == Path(source).resolve():
+        path = path.with_name(f"{path.stem}.indexed{extension}")
+    return str(path)
+
+
+def optimize_vector_source(source: str, fmt: str = 'fgb',
+                           output_path: Optional[str] = None,
+                           progress_callback: Optional[Callable[[int, int], None]] = None,
+                           overwrite: bool = False) -> Optional[str]:
+    """
+    Converte uma fonte vetorial para FlatGeobuf ou GeoPackage com índice espacial.
+
+    FlatGeobuf comporta uma única camada; fontes com várias camadas são
+    convertidas para GeoPackage. Se o arquivo de saída já existir e for mais
+    novo que a fonte, é reaproveitado.
+
+    Args:
+        source: Caminho da fonte (ex: shapefile)
+        fmt: 'fgb' ou 'gpkg'
+        output_path: Caminho de saída (None = mesmo nome com a nova extensão)
+        progress_callback: Função chamada com (percentual, 100)
+        overwrite: Se True, converte mesmo que a saída pareça atualizada
+
+    Returns:
+        Caminho do arquivo otimizado ou None em caso de erro
+    """
+    if fmt not in OPTIMIZED_FORMATS:
+        print(f"Erro: Formato de otimização desconhecido: {fmt}")
+        return None
+
+    try:
+        datasource = ogr.Open(source)
+        if datasource is None:
+            print(f"Erro: Não foi possível abrir {source}")
+            return None
+        layer_count = datasource.GetLayerCount()
+        if datasource.GetDriver().GetName() == OPTIMIZED_FORMATS[fmt][0] and all(
+                has_native_spatial_index(datasource, datasource.GetLayer(i))
+                for i in range(layer_count)):
+            print(f"[DEBUG] Fonte já possui índice espacial nativo: {source}")
+            return source
+        datasource = None
+
+        if fmt == 'fgb' and layer_count > 1:
+            print(f"Aviso: {source} tem {layer_count} camadas; usando GeoPackage")
+            fmt = 'gpkg'
+
+        driver_name = OPTIMIZED_FORMATS[fmt][0]
+        output_path = output_path or optimized_path(source, fmt)
+        if Path(output_path).resolve() == Path(source).resolve():
+            print(f"Erro: A saída otimizada não pode substituir a própria fonte: {source}")
+            return None
+        if (not overwrite and os.path.exists(output_path) and
+                os.path.getmtime(output_path) >= os.path.getmtime(source)):
+            print(f"[DEBUG] Fonte otimizada já existe: {output_path}")
+            return output_path
+
+        def on_progress(complete, message, data):
+            if progress_callback:
+                progress_callback(int(complete * 100), 100)
+            return 1
+
+        # Converte para um arquivo temporário e renomeia no final, para que
+        # uma conversão interrompida não deixe um arquivo parcial no lugar
+        root, extension = os.path.splitext(output_path)
+        temp_path = root + '.tmp' + extension
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        result = gdal.VectorTranslate(
+            temp_path, source,
+            format=driver_name,
+            layerCreationOptions=['SPATIAL_INDEX=YES'],
+            callback=on_progress,
+        )
+        if result is None:
+            print(f"Erro: Conversão de {source} para {driver_name} falhou")
+            return None
+        # Fecha o dataset (grava índice e cabeçalhos)
+        result = None
+
+        os.replace(temp_path, output_path)
+        print(f"Fonte otimizada: {source} -> {output_path}")
+        return output_path
+
+    except Exception as e:
+        print(f"Erro ao otimizar fonte {source}: {e}")
+        return None
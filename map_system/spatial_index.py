@@ -0,0 +1,181 @@
+"""
+Módulo de Índice Espacial - R-tree empacotado com Sort-Tile-Recursive (STR)
+
+A árvore é construída em lote a partir dos retângulos envolventes das
+features e armazenada em arrays NumPy por nível, de forma que as consultas
+são vetorizadas (um teste de interseção por nível, sem recursão em Python).
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+class STRTree:
+    """
+    R-tree estático carregado em lote (Sort-Tile-Recursive).
+    Similar ao QgsSpatialIndex do QGIS, porém imutável.
+    """
+
+    def __init__(self, bounds: np.ndarray, node_capacity: int = 16):
+        """
+        Constrói a árvore.
+
+        Args:
+            bounds: Array (n, 4) com (minx, miny, maxx, maxy) por item.
+                    Itens com NaN (sem geometria) são ignorados.
+            node_capacity: Número máximo de filhos por nó
+        """
+        self._node_capacity = max(2, int(node_capacity))
+        self._item_bounds = np.asarray(bounds, dtype=np.float64)
+
+        valid = np.flatnonzero(np.isfinite(self._item_bounds).all(axis=1))
+        self._item_order = valid[self._str_order(self._item_bounds[valid])]
+
+        # Cada nível: (bounds dos nós, início dos filhos, quantidade de filhos)
+        # O nível 0 aponta para posições em _item_order
+        self._levels = []
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self._item_order)
+
+    @property
+    def nbytes(self) -> int:
+        """Retorna os bytes ocupados pelos nós (os bounds dos itens não são contados)"""
+        total = self._item_order.nbytes
+        for node_bounds, child_start, child_count in self._levels:
+            total += node_bounds.nbytes + child_start.nbytes + child_count.nbytes
+        return total
+
+    @property
+    def depth(self) -> int:
+        """Retorna o número de níveis de nós internos"""
+        return len(self._levels)
+
+    def query(self, extent: Tuple[float, float, float, float]) -> np.ndarray:
+        """
+        Retorna os índices dos itens cujo retângulo intersecta a extensão.
+
+        Args:
+            extent: Extensão (minx, miny, maxx, maxy)
+
+        Returns:
+            Array de índices em ordem crescente (preserva a ordem de desenho)
+        """
+        if not self._levels:
+            return np.empty(0, dtype=np.int64)
+
+        minx, miny, maxx, maxy = extent
+
+        # Começa pelo nível raiz (todos os nós do nível mais alto)
+        node_bounds, child_start, child_count = self._levels[-1]
+        candidates = np.arange(len(node_bounds))
+
+        for level in range(len(self._levels) - 1, -1, -1):
+            node_bounds, child_start, child_count = self._levels[level]
+            nb = node_bounds[candidates]
+            hit = candidates[(nb[:, 0] <= maxx) & (nb[:, 2] >= minx) &
+                             (nb[:, 1] <= maxy) & (nb[:, 3] >= miny)]
+            if len(hit) == 0:
+                return np.empty(0, dtype=np.int64)
+            candidates = _expand_ranges(child_start[hit], child_count[hit])
+
+        # candidates agora são posições em _item_order: teste exato por item
+        items = self._item_order[candidates]
+        ib = self._item_bounds[items]
+        items = items[(ib[:, 0] <= maxx) & (ib[:, 2] >= minx) &
+                      (ib[:, 1] <= maxy) & (ib[:, 3] >= miny)]
+        items.sort()
+        return items
+
+    def _build(self):
+        """Agrupa itens em folhas e nós em níveis superiores até a raiz"""
+        count = len(self._item_order)
+        if count == 0:
+            return
+
+        child_bounds = self._item_bounds[self._item_order]
+        while True:
+            node_bounds, child_start, child_count = self._pack_level(child_bounds)
+            self._levels.append((node_bounds, child_start, child_count))
+            if len(node_bounds) <= self._node_capacity:
+                break
+
+            # Ordena os nós deste nível por STR antes de agrupá-los no próximo
+            order = self._str_order(node_bounds)
+            self._levels[-1] = (node_bounds[order], child_start[order], child_count[order])
+            child_bounds = node_bounds[order]
+
+    def _pack_level(self, child_bounds: np.ndarray):
+        """Agrupa filhos consecutivos em nós de até node_capacity filhos"""
+        count = len(child_bounds)
+        child_start = np.arange(0, count, self._node_capacity, dtype=np.int64)
+        child_count = np.minimum(self._node_capacity, count - child_start)
+
+        node_bounds = np.empty((len(child_start), 4), dtype=np.float64)
+        node_bounds[:, 0] = np.minimum.reduceat(child_bounds[:, 0], child_start)
+        node_bounds[:, 1] = np.minimum.reduceat(child_bounds[:, 1], child_start)
+        node_bounds[:, 2] = np.maximum.reduceat(child_bounds[:, 2], child_start)
+        node_bounds[:, 3] = np.maximum.reduceat(child_bounds[:, 3], child_start)
+        return node_bounds, child_start, child_count
+
+    def _str_order(self, bounds: np.ndarray) -> np.ndarray:
+        """
+        Calcula a ordem Sort-Tile-Recursive: ordena por X em fatias verticais
+        e, dentro de cada fatia, por Y.
+        """
+        count = len(bounds)
+        if count == 0:
+            return np.empty(0, dtype=np.int64)
+
+        cx = (bounds[:, 0] + bounds[:, 2]) * 0.5
+        cy = (bounds[:, 1] + bounds[:, 3]) * 0.5
+
+        leaf_count = -(-count // self._node_capacity)
+        slice_count = int(np.ceil(np.sqrt(leaf_count)))
+        slice_size = slice_count * self._node_capacity
+
+        by_x = np.argsort(cx, kind='stable')
+        slice_id = np.arange(count) // slice_size
+        return by_x[np.lexsort((cy[by_x], slice_id))]
+
+
+def compute_feature_bounds(packed) -> np.ndarray:
+    """
+    Calcula o retângulo envolvente de cada feature de um PackedGeometry.
+
+    Args:
+        packed: PackedGeometry
+
+    Returns:
+        Array (n, 4) com (minx, miny, maxx, maxy); NaN para features vazias
+    """
+    count = len(packed)
+    bounds = np.full((count, 4), np.nan, dtype=np.float64)
+    if count == 0 or len(packed.coords) == 0:
+        return bounds
+
+    first_ring = packed.part_offsets[packed.feature_offsets]
+    coord_offsets = packed.ring_offsets[first_ring]
+    starts = coord_offsets[:-1]
+    non_empty = coord_offsets[1:] > starts
+
+    # reduceat nas features não vazias: cada segmento vai até o próximo início
+    idx = starts[non_empty]
+    xs = packed.coords[:, 0]
+    ys = packed.coords[:, 1]
+    bounds[non_empty, 0] = np.minimum.reduceat(xs, idx)
+    bounds[non_empty, 1] = np.minimum.reduceat(ys, idx)
+    bounds[non_empty, 2] = np.maximum.reduceat(xs, idx)
+    bounds[non_empty, 3] = np.maximum.reduceat(ys, idx)
+    return bounds
+
+
+def _expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Expande pares (início, quantidade) em um array com todos os índices"""
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    shift = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return shift + np.arange(total, dtype=np.int64)
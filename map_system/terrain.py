@@ -0,0 +1,510 @@
+"""
+Análise de Terreno - Sombreamento, declividade e orientação de MDTs
+
+Os produtos são calculados com o operador de Horn (janela 3x3) por kernels
+NumPy vetorizados, bloco a bloco: cada bloco é lido com uma borda (halo) de um
+pixel, de modo que o resultado é idêntico ao do raster inteiro e a memória
+usada não depende do tamanho do MDT. Os blocos são processados em paralelo
+no pool raster do processo (NumPy e GDAL liberam o GIL), cada thread com seu
+próprio handle GDAL (ver raster_blocks.thread_dataset).
+
+A saída vai para o pipeline de renderização (blocos mantidos no cache de
+blocos raster, inclusive por nível de overview) ou para um GeoTIFF. Vistas
+muito mais grosseiras que o nível disponível (ex: MDT sem overviews visto
+de longe) são calculadas sobre uma leitura decimada do tamanho da tela.
+"""
+
+import math
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .cache_manager import CacheManager
+from .raster_blocks import (BLOCK_CACHE_MAX_WINDOW_FRACTION, get_block_cache,
+                            get_raster_pool, overview_band, release_thread_datasets,
+                            thread_dataset)
+
+
+HILLSHADE = 'hillshade'
+SLOPE = 'slope'
+ASPECT = 'aspect'
+TERRAIN_PRODUCTS = (HILLSHADE, SLOPE, ASPECT)
+
+DEFAULT_TILE_SIZE = 1024
+
+# Intervalo de valores de cada produto (usado no realce da renderização)
+PRODUCT_RANGES = {
+    HILLSHADE: (0.0, 255.0),
+    SLOPE: (0.0, 90.0),
+    ASPECT: (0.0, 360.0),
+}
+
+# Declividade em %: 100% = 45 graus; valores acima saturam a rampa
+SLOPE_PERCENT_RANGE = (0.0, 100.0)
+
+
+def product_range(product: str, **params) -> Tuple[float, float]:
+    """
+    Retorna o intervalo de exibição de um produto com os parâmetros dados.
+
+    Args:
+        product: HILLSHADE, SLOPE ou ASPECT
+        **params: Parâmetros do produto (percent altera a unidade da declividade)
+
+    Returns:
+        Tupla (mínimo, máximo)
+    """
+    if product == SLOPE and params.get('percent', False):
+        return SLOPE_PERCENT_RANGE
+    return PRODUCT_RANGES[product]
+
+
+# ==========================================
+# KERNELS
+# ==========================================
+
+def horn_gradients(z: np.ndarray, cell_x: float, cell_y: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcula dz/dx e dz/dy pelo operador de Horn.
+
+    Args:
+        z: Elevações (altura + 2, largura + 2), com halo de um pixel
+        cell_x: Tamanho do pixel em X (unidades horizontais por pixel, > 0)
+        cell_y: Tamanho do pixel em Y (> 0)
+
+    Returns:
+        Tupla (dzdx, dzdy) float32 (altura, largura); dzdy positivo para o sul
+    """
+    a, b, c = z[:-2, :-2], z[:-2, 1:-1], z[:-2, 2:]
+    d, f = z[1:-1, :-2], z[1:-1, 2:]
+    g, h, i = z[2:, :-2], z[2:, 1:-1], z[2:, 2:]
+
+    dzdx = (c + 2 * f + i) - (a + 2 * d + g)
+    dzdx /= 8 * cell_x
+    dzdy = (g + 2 * h + i) - (a + 2 * b + c)
+    dzdy /= 8 * cell_y
+    return dzdx, dzdy
+
+
+def slope(z: np.ndarray, cell_x: float, cell_y: float, z_factor: float = 1.0,
+          percent: bool = False) -> np.ndarray:
+    """
+    Declividade em graus (ou percentual).
+
+    Args:
+        z: Elevações com halo de um pixel
+        cell_x, cell_y: Tamanho do pixel
+        z_factor: Fator aplicado às elevações (ex: conversão de unidades)
+        percent: Se True, retorna a declividade em %
+
+    Returns:
+        Array float32 (altura, largura)
+    """
+    dzdx, dzdy = horn_gradients(z, cell_x, cell_y)
+    rise = np.hypot(dzdx, dzdy)
+    rise *= z_factor
+    if percent:
+        rise *= 100
+        return rise
+    return np.degrees(np.arctan(rise, out=rise), out=rise)
+
+
+def aspect(z: np.ndarray, cell_x: float, cell_y: float) -> np.ndarray:
+    """
+    Orientação da encosta em graus a partir do norte, sentido horário.
+
+    Args:
+        z: Elevações com halo de um pixel
+        cell_x, cell_y: Tamanho do pixel
+
+    Returns:
+        Array float32 (altura, largura) em [0, 360); NaN em áreas planas
+    """
+    dzdx, dzdy = horn_gradients(z, cell_x, cell_y)
+    # Direção de descida: -gradiente; y da grade cresce para o sul
+    result = np.degrees(np.arctan2(-dzdx, dzdy))
+    result = np.mod(result, 360.0, out=result)
+    result[(dzdx == 0) & (dzdy == 0)] = np.nan
+    return result.astype(np.float32, copy=False)
+
+
+def hillshade(z: np.ndarray, cell_x: float, cell_y: float, z_factor: float = 1.0,
+              azimuth: float = 315.0, altitude: float = 45.0) -> np.ndarray:
+    """
+    Sombreamento do relevo (0-255).
+
+    Args:
+        z: Elevações com halo de um pixel
+        cell_x, cell_y: Tamanho do pixel
+        z_factor: Exagero vertical
+        azimuth: Direção da luz em graus a partir do norte (315 = noroeste)
+        altitude: Altura da luz acima do horizonte em graus
+
+    Returns:
+        Array float32 (altura, largura)
+    """
+    dzdx, dzdy = horn_gradients(z, cell_x, cell_y)
+    dzdx *= z_factor
+    dzdy *= z_factor
+
+    # Vetor de luz em (leste, sul, cima) e normal da superfície (-dzdx, -dzdy, 1)
+    az = math.radians(azimuth)
+    alt = math.radians(altitude)
+    light_x = math.sin(az) * math.cos(alt)
+    light_y = -math.cos(az) * math.cos(alt)
+    light_z = math.sin(alt)
+
+    shade = dzdx * -light_x
+    shade -= dzdy * light_y
+    shade += light_z
+    norm = np.hypot(dzdx, dzdy, out=dzdx)
+    norm *= norm
+    norm += 1
+    np.sqrt(norm, out=norm)
+    shade /= norm
+    np.clip(shade, 0, 1, out=shade)
+    shade *= 255
+    return shade
+
+
+_KERNELS = {
+    HILLSHADE: lambda z, cx, cy, p: hillshade(z, cx, cy, p.get('z_factor', 1.0),
+                                              p.get('azimuth', 315.0), p.get('altitude', 45.0)),
+    SLOPE: lambda z, cx, cy, p: slope(z, cx, cy, p.get('z_factor', 1.0), p.get('percent', False)),
+    ASPECT: lambda z, cx, cy, p: aspect(z, cx, cy),
+}
+
+
+# ==========================================
+# MOTOR POR BLOCOS
+# ==========================================
+
+def iter_tiles(width: int, height: int, tile_size: int) -> Iterator[Tuple[int, int, int, int]]:
+    """Gera os blocos (xoff, yoff, xsize, ysize) que cobrem a grade"""
+    for yoff in range(0, height, tile_size):
+        for xoff in range(0, width, tile_size):
+            yield xoff, yoff, min(tile_size, width - xoff), min(tile_size, height - yoff)
+
+
+class TerrainEngine:
+    """
+    Calcula produtos de terreno de um MDT por blocos, em paralelo.
+    Similar aos algoritmos do gdaldem, mas sem carregar o raster inteiro.
+    """
+
+    def __init__(self, source: str, band_index: int = 1, tile_size: int = DEFAULT_TILE_SIZE,
+                 workers: Optional[int] = None, owner: Optional[int] = None,
+                 cache: Optional[CacheManager] = None):
+        """
+        Inicializa o motor (o MDT é aberto sob demanda, um handle por thread).
+
+        Args:
+            source: Caminho do MDT
+            band_index: Banda de elevação (1-based)
+            tile_size: Lado dos blocos em pixels
+            workers: Blocos calculados simultaneamente (None = número de CPUs)
+            owner: Identificador de cache (ex: RasterLayer.cache_id); None
+                   desativa o cache de blocos
+            cache: Cache dos blocos calculados (None = get_block_cache())
+        """
+        self._source = str(source)
+        self._band_index = band_index
+        self._tile_size = max(16, int(tile_size))
+        self._workers = workers or os.cpu_count() or 1
+        self._owner = owner
+        self._cache = cache if cache is not None else get_block_cache()
+
+    def close(self):
+        """Fecha os handles do MDT abertos pelas threads (o pool é compartilhado)"""
+        release_thread_datasets(self._source)
+
+    def _dataset(self):
+        """Dataset GDAL da thread atual (objetos GDAL não são thread-safe)"""
+        return thread_dataset(self._source)
+
+    def grid(self, level: int = 0) -> Tuple[int, int, float, float]:
+        """
+        Retorna (largura, altura, tamanho do pixel X, tamanho do pixel Y) do nível.
+
+        Args:
+            level: 0 = resolução nativa, k = overview k-1
+        """
+        dataset = self._dataset()
+        band = overview_band(dataset.GetRasterBand(self._band_index), level)
+        geotransform = dataset.GetGeoTransform()
+        factor_x = dataset.RasterXSize / band.XSize
+        factor_y = dataset.RasterYSize / band.YSize
+        return (band.XSize, band.YSize,
+                abs(geotransform[1]) * factor_x, abs(geotransform[5]) * factor_y)
+
+    def compute_tile(self, product: str, xoff: int, yoff: int, xsize: int, ysize: int,
+                     level: int = 0, scale: float = 1.0, **params) -> np.ndarray:
+        """
+        Calcula um produto para uma janela do MDT.
+
+        Args:
+            product: HILLSHADE, SLOPE ou ASPECT
+            xoff, yoff, xsize, ysize: Janela em pixels do nível
+            level: Nível da pirâmide (0 = nativa)
+            scale: Unidades horizontais por unidade vertical (ex: 111120 para
+                   MDT em graus com elevação em metros)
+            **params: z_factor, azimuth, altitude, percent
+
+        Returns:
+            Array float32 (ysize, xsize); NaN onde o MDT é nodata
+        """
+        dataset = self._dataset()
+        band = overview_band(dataset.GetRasterBand(self._band_index), level)
+        width, height = band.XSize, band.YSize
+        _, _, cell_x, cell_y = self.grid(level)
+
+        # Janela com halo de 1 pixel, limitada ao raster
+        x0, y0 = max(0, xoff - 1), max(0, yoff - 1)
+        x1, y1 = min(width, xoff + xsize + 1), min(height, yoff + ysize + 1)
+        z = band.ReadAsArray(x0, y0, x1 - x0, y1 - y0).astype(np.float32, copy=False)
+
+        nodata = dataset.GetRasterBand(self._band_index).GetNoDataValue()
+        if nodata is not None and not np.isnan(nodata):
+            z[z == nodata] = np.nan
+
+        # Nas bordas do raster o halo repete a última linha/coluna
+        pad = ((yoff - y0 == 0) * 1, (yoff + ysize + 1 - y1),
+               (xoff - x0 == 0) * 1, (xoff + xsize + 1 - x1))
+        if any(pad):
+            z = np.pad(z, ((pad[0], pad[1]), (pad[2], pad[3])), mode='edge')
+
+        result = _KERNELS[product](z, cell_x * scale, cell_y * scale, params)
+        # NaN se propaga: pixels cuja janela 3x3 toca nodata ficam NaN
+        return result.astype(np.float32, copy=False)
+
+    def compute_decimated(self, product: str, xoff: int, yoff: int, xsize: int, ysize: int,
+                          buf_xsize: int, buf_ysize: int, level: int = 0,
+                          scale: float = 1.0, **params) -> Optional[np.ndarray]:
+        """
+        Calcula um produto sobre a janela lida decimada (média) para buf_xsize x
+        buf_ysize células, com o tamanho de célula ajustado à decimação.
+
+        A borda de uma célula é lida com janela fracionária do GDAL; nas bordas
+        do raster repete a última linha/coluna. O resultado não é guardado no
+        cache (depende da resolução da vista).
+
+        Args:
+            product: HILLSHADE, SLOPE ou ASPECT
+            xoff, yoff, xsize, ysize: Janela em pixels do nível
+            buf_xsize, buf_ysize: Tamanho do resultado (resolução da tela)
+            level: Nível da pirâmide (0 = nativa)
+            scale: Unidades horizontais por unidade vertical
+            **params: Parâmetros do produto
+
+        Returns:
+            Array float32 (buf_ysize, buf_xsize); NaN onde o MDT é nodata
+        """
+        from osgeo import gdal
+
+        dataset = self._dataset()
+        band = overview_band(dataset.GetRasterBand(self._band_index), level)
+        width, height = band.XSize, band.YSize
+        _, _, cell_x, cell_y = self.grid(level)
+
+        xend, yend = min(width, xoff + xsize), min(height, yoff + ysize)
+        xoff, yoff = max(0, xoff), max(0, yoff)
+        if xend <= xoff or yend <= yoff:
+            return None
+        step_x = (xend - xoff) / buf_xsize
+        step_y = (yend - yoff) / buf_ysize
+
+        # Halo de uma célula decimada onde o raster continua
+        left = int(xoff - step_x >= 0)
+        right = int(xend + step_x <= width)
+        top = int(yoff - step_y >= 0)
+        bottom = int(yend + step_y <= height)
+        z = band.ReadAsArray(xoff - left * step_x, yoff - top * step_y,
+                             (xend - xoff) + (left + right) * step_x,
+                             (yend - yoff) + (top + bottom) * step_y,
+                             buf_xsize=buf_xsize + left + right,
+                             buf_ysize=buf_ysize + top + bottom,
+                             resample_alg=gdal.GRIORA_Average)
+        if z is None:
+            return None
+        z = z.astype(np.float32, copy=False)
+
+        nodata = dataset.GetRasterBand(self._band_index).GetNoDataValue()
+        if nodata is not None and not np.isnan(nodata):
+            z[z == nodata] = np.nan
+
+        pad = (1 - top, 1 - bottom, 1 - left, 1 - right)
+        if any(pad):
+            z = np.pad(z, ((pad[0], pad[1]), (pad[2], pad[3])), mode='edge')
+
+        result = _KERNELS[product](z, cell_x * step_x * scale, cell_y * step_y * scale, params)
+        return result.astype(np.float32, copy=False)
+
+    def read_window(self, product: str, xoff: int, yoff: int, xsize: int, ysize: int,
+                    level: int = 0, scale: float = 1.0, **params) -> Optional[np.ndarray]:
+        """
+        Monta uma janela do produto a partir de blocos calculados em paralelo.
+
+        Blocos já calculados vêm do cache de blocos (se o motor tem dono); os
+        novos só são guardados se a janela cabe em uma fração do orçamento.
+
+        Args:
+            product: HILLSHADE, SLOPE ou ASPECT
+            xoff, yoff, xsize, ysize: Janela em pixels do nível
+            level: Nível da pirâmide (0 = nativa)
+            scale: Unidades horizontais por unidade vertical
+            **params: Parâmetros do produto
+
+        Returns:
+            Array float32 (ysize, xsize) ou None se a janela está fora do raster
+        """
+        width, height, _, _ = self.grid(level)
+        xend, yend = min(width, xoff + xsize), min(height, yoff + ysize)
+        xoff, yoff = max(0, xoff), max(0, yoff)
+        if xend <= xoff or yend <= yoff:
+            return None
+
+        size = self._tile_size
+        param_key = (scale,) + tuple(sorted(params.items()))
+        result = np.empty((yend - yoff, xend - xoff), dtype=np.float32)
+
+        def place(tx: int, ty: int, tile: np.ndarray):
+            tx0, ty0 = tx * size, ty * size
+            x0, x1 = max(xoff, tx0), min(xend, tx0 + tile.shape[1])
+            y0, y1 = max(yoff, ty0), min(yend, ty0 + tile.shape[0])
+            result[y0 - yoff:y1 - yoff, x0 - xoff:x1 - xoff] = \
+                tile[y0 - ty0:y1 - ty0, x0 - tx0:x1 - tx0]
+
+        missing = []
+        for ty in range(yoff // size, (yend - 1) // size + 1):
+            for tx in range(xoff // size, (xend - 1) // size + 1):
+                key = ('terrain', self._owner, product, param_key, level, tx, ty)
+                tile = self._cache.get(key) if self._owner is not None else None
+                if tile is None:
+                    missing.append((tx, ty, key))
+                else:
+                    place(tx, ty, tile)
+
+        # Janela grande demais para o orçamento: não guarda os blocos
+        store = self._owner is not None and (
+            len(missing) * size * size * 4 <=
+            BLOCK_CACHE_MAX_WINDOW_FRACTION * self._cache.budget_mb * 1024 * 1024)
+
+        # No máximo 2 blocos por worker em cálculo; cada um é copiado ao chegar
+        pending = iter(missing)
+        in_flight: Dict = {}
+        try:
+            while True:
+                while len(in_flight) < 2 * self._workers:
+                    tile_key = next(pending, None)
+                    if tile_key is None:
+                        break
+                    tx, ty, _ = tile_key
+                    future = get_raster_pool().submit(
+                        self.compute_tile, product, tx * size, ty * size,
+                        min(size, width - tx * size), min(size, height - ty * size),
+                        level, scale, **params)
+                    in_flight[future] = tile_key
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    tx, ty, key = in_flight.pop(future)
+                    tile = future.result()
+                    if store:
+                        tile.flags.writeable = False
+                        self._cache.put(key, tile)
+                    place(tx, ty, tile)
+        finally:
+            for future in in_flight:
+                future.cancel()
+        return result
+
+    def write_geotiff(self, product: str, output_path: str, scale: float = 1.0,
+                      progress_callback: Optional[Callable[[int, int], None]] = None,
+                      cancel_event: Optional[threading.Event] = None, **params) -> bool:
+        """
+        Grava o produto do MDT inteiro em um GeoTIFF com blocos, sem carregá-lo
+        na memória: no máximo 2 blocos por thread ficam em processamento.
+
+        Args:
+            product: HILLSHADE, SLOPE ou ASPECT
+            output_path: Caminho do GeoTIFF de saída
+            scale: Unidades horizontais por unidade vertical
+            progress_callback: Função chamada com (blocos gravados, total)
+            cancel_event: Quando sinalizado, interrompe e remove a saída
+            **params: Parâmetros do produto
+
+        Returns:
+            True se gravado com sucesso
+        """
+        from osgeo import gdal
+
+        if product not in TERRAIN_PRODUCTS:
+            print(f"Erro: Produto de terreno desconhecido: {product}")
+            return False
+
+        output = None
+        try:
+            source = self._dataset()
+            width, height = source.RasterXSize, source.RasterYSize
+            block = min(self._tile_size, 512) // 16 * 16 or 16
+            output = gdal.GetDriverByName('GTiff').Create(
+                str(output_path), width, height, 1, gdal.GDT_Float32,
+                options=['TILED=YES', f'BLOCKXSIZE={block}', f'BLOCKYSIZE={block}',
+                         'COMPRESS=DEFLATE', 'PREDICTOR=3', 'BIGTIFF=IF_SAFER'])
+            output.SetGeoTransform(source.GetGeoTransform())
+            output.SetProjection(source.GetProjection())
+            out_band = output.GetRasterBand(1)
+            out_band.SetNoDataValue(float('nan'))
+
+            tiles = list(iter_tiles(width, height, self._tile_size))
+            pending = iter(tiles)
+            in_flight: Dict = {}
+            done = 0
+            max_in_flight = 2 * self._workers
+
+            while True:
+                while len(in_flight) < max_in_flight:
+                    window = next(pending, None)
+                    if window is None:
+                        break
+                    future = get_raster_pool().submit(self.compute_tile, product, *window,
+                                                      scale=scale, **params)
+                    in_flight[future] = window
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    xoff, yoff, _, _ = in_flight.pop(future)
+                    # Apenas a thread chamadora escreve no dataset de saída
+                    out_band.WriteArray(future.result(), xoff, yoff)
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, len(tiles))
+
+                if cancel_event is not None and cancel_event.is_set():
+                    for future in in_flight:
+                        future.cancel()
+                    raise RuntimeError("cancelado")
+
+            out_band.FlushCache()
+            out_band = None
+            output = None
+            print(f"Produto {product} gravado: {output_path} ({len(tiles)} blocos)")
+            return True
+
+        except Exception as e:
+            print(f"Erro ao gravar {product} em {output_path}: {e}")
+            out_band = None
+            output = None
+            if os.path.exists(output_path):
+                try:
+                    os.remove(output_path)
+                except OSError:
+                    pass
+            return False
@@ -0,0 +1,61 @@
+"""
+Testes do armazenamento colunar de geometrias (PackedGeometryBuilder)
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from map_system.geometry_store import PackedGeometryBuilder
+
+
+def point_wkb(x: float, y: float) -> bytes:
+    return struct.pack('<BIdd', 1, 1, x, y)
+
+
+def polygon_wkb(*rings) -> bytes:
+    wkb = struct.pack('<BII', 1, 3, len(rings))
+    for ring in rings:
+        wkb += struct.pack('<I', len(ring)) + np.asarray(ring, dtype='<f8').tobytes()
+    return wkb
+
+
+SQUARE = [(0, 0), (1, 0), (1, 1), (0, 0)]
+
+
+def truncated_polygon() -> bytes:
+    # Dois anéis declarados: o primeiro completo, o segundo sem as coordenadas
+    ring = struct.pack('<I', len(SQUARE)) + np.asarray(SQUARE, dtype='<f8').tobytes()
+    return struct.pack('<BII', 1, 3, 2) + ring + struct.pack('<I', 5)
+
+
+@pytest.mark.parametrize('keep_z', [False, True])
+def test_invalid_polygon_does_not_shift_next_feature(keep_z):
+    builder = PackedGeometryBuilder(keep_z=keep_z)
+    builder.add_wkb(1, polygon_wkb(SQUARE))
+    builder.add_wkb(2, truncated_polygon())
+    builder.add_wkb(3, point_wkb(7, 7))
+    packed = builder.finish()
+
+    assert packed.feature_count == 3
+    assert packed.feature_parts(1) == []
+    np.testing.assert_array_equal(packed.feature_coords(2), [[7, 7]])
+    np.testing.assert_array_equal(packed.feature_coords(0), SQUARE)
+    assert packed.ring_offsets[-1] == len(packed.coords)
+    if keep_z:
+        assert len(packed.z) == len(packed.coords)
+
+
+def test_invalid_multipolygon_does_not_shift_next_feature():
+    member = truncated_polygon()
+    multi = struct.pack('<BII', 1, 6, 2) + polygon_wkb(SQUARE) + member
+
+    builder = PackedGeometryBuilder()
+    builder.add_wkb(1, multi)
+    builder.add_wkb(2, point_wkb(7, 7))
+    packed = builder.finish()
+
+    assert packed.feature_parts(0) == []
+    np.testing.assert_array_equal(packed.feature_coords(1), [[7, 7]])
+    assert packed.ring_offsets.tolist() == [0, 1]